@@ -1,11 +1,15 @@
 import os
+import sys
 import streamlit as st
 from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
-from langchain_community.llms import HuggingFaceHub
-from langchain.chains import LLMChain
-import fitz  # PyMuPDF for PDF extraction
-from transformers import pipeline
+
+# The token-aware chunker, embedding backends and FAISS helpers are shared with the chatbot
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend1"))
+from chunker import ChunkConfig, TokenChunker
+from document_index import DocumentIndex, build_document_index, document_key, iter_pdf_pages
+from embedding import embedding_config_from_env, load_embedder
+from summarizer import MapReduceSummarizer, SummaryConfig, pipeline_summarize_batch
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -32,53 +36,96 @@ uploaded_pdf = st.file_uploader("Upload a PDF document", type="pdf")
 # Text input for user query
 input_text = st.text_input("Ask a question based on the PDF document")
 
-# Function to extract text from a PDF file
-def extract_pdf_text(pdf_file):
-    doc = fitz.open(pdf_file)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-# Function to summarize the PDF content
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-
-def summarize_text(text):
-    return summarizer(text, max_length=500, min_length=100, do_sample=False)[0]['summary_text']
-
-# Function to split text into manageable chunks
-MAX_TOKENS = 5000  # Adjust this limit based on the model's token limit
-
-def split_text(text):
-    # Split the text into chunks of MAX_TOKENS characters
-    return [text[i:i + MAX_TOKENS] for i in range(0, len(text), MAX_TOKENS)]
-
-# Check if the user uploaded a PDF and entered a query
-if uploaded_pdf and input_text:
-    # Extract text from the uploaded PDF
-    pdf_text = extract_pdf_text(uploaded_pdf)
-
-    # Summarize the PDF content to reduce size
-    summarized_text = summarize_text(pdf_text)
-
-    # Split the summarized text into chunks (if necessary)
-    chunks = split_text(summarized_text)
-
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = int(os.getenv("DOC_TOP_K", "4"))  # Chunks of the document given to the LLM per question
+DOC_CACHE_SIZE = int(os.getenv("DOC_CACHE_SIZE", "8"))  # Processed documents kept in memory
+
+@st.cache_resource
+def get_embedder():
+    # EMBEDDING_BACKEND=torch, onnx or onnx-int8, as for the chatbot
+    return load_embedder(EMBEDDING_MODEL, embedding_config_from_env())
+
+@st.cache_resource(max_entries=DOC_CACHE_SIZE)
+def process_document(key: str, _data: bytes) -> DocumentIndex:
+    """Extracts, chunks and embeds a document once per content hash.
+
+    Cached by ``key`` (the SHA-256 of the file), so re-uploads and follow-up
+    questions reuse it; the least recently used documents are evicted beyond
+    DOC_CACHE_SIZE.
+    """
+    embedder = get_embedder()
+    chunker = TokenChunker(embedder.tokenizer, ChunkConfig(embedder.max_seq_length, 32))
+    encode = lambda texts: embedder.encode(list(texts), convert_to_numpy=True)
+    return build_document_index(key, iter_pdf_pages(_data), encode, chunker)
+
+@st.cache_resource
+def get_chain():
     # Setup the Hugging Face model using the Hugging Face Hub
+    from langchain_community.llms import HuggingFaceHub
+    from langchain.chains import LLMChain
     llm = HuggingFaceHub(
         repo_id="mistralai/Mistral-7B-Instruct-v0.3",
         model_kwargs={'temperature': 0.6, 'max_length': 500},
         huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY")  # Use the environment variable
     )
-
     # Create a chain using the prompt template and LLM
-    chain = LLMChain(prompt=prompt, llm=llm)
+    return LLMChain(prompt=prompt, llm=llm)
+
+# The summarization model is loaded on the first summary (not when the page first
+# renders) and kept across Streamlit reruns and sessions
+@st.cache_resource
+def get_summarizer():
+    from transformers import pipeline
+    return pipeline("summarization", model="facebook/bart-large-cnn")
 
-    # Use the first chunk (or the relevant chunk if you have multiple) for the query
-    document_chunk = chunks[0]  # You can enhance this with more sophisticated relevance detection
+# Function to summarize the PDF content; input beyond the model's window is truncated
+def summarize_text(text):
+    return get_summarizer()(text, max_length=500, min_length=100, do_sample=False, truncation=True)[0]['summary_text']
+
+# The summarizer's windows: at most MAX_TOKENS tokens, split on sentence boundaries
+MAX_TOKENS = 1024  # Adjust this limit based on the model's token limit
+CHUNK_OVERLAP = 64
 
-    # Generate a response from the model, providing the summarized document chunk as context
-    response = chain.run(question=input_text, document_text=document_chunk)
+@st.cache_resource
+def get_chunker():
+    return TokenChunker(get_summarizer().tokenizer, ChunkConfig(MAX_TOKENS, CHUNK_OVERLAP))
 
-    # Display the result in the Streamlit app
-    st.write("Answer: ", response)
+# SUMMARY_MODE=map_reduce (default) summarizes every window of a long document and then
+# the partial summaries; "single" passes the whole text in one call, truncated to the window.
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "map_reduce")
+
+@st.cache_resource
+def get_map_reduce_summarizer():
+    config = SummaryConfig(
+        batch_size=int(os.getenv("SUMMARY_BATCH_SIZE", "8")),
+        workers=int(os.getenv("SUMMARY_WORKERS", "1")),
+    )
+    # Kept across reruns, so its per-chunk cache spares unchanged pages of an edited document
+    return MapReduceSummarizer(pipeline_summarize_batch(get_summarizer(), config.batch_size), get_chunker(), config)
+
+@st.cache_data(max_entries=DOC_CACHE_SIZE)
+def summarize_document(key: str, _document: DocumentIndex) -> str:
+    if SUMMARY_MODE == "single":
+        return summarize_text("\n".join(_document.pages))
+    return get_map_reduce_summarizer().summarize(_document.pages)
+
+if uploaded_pdf:
+    # Processed once per distinct file; later questions hit the cache
+    data = uploaded_pdf.getvalue()
+    document = process_document(document_key(data), data)
+
+    if st.checkbox("Show a summary of the document"):
+        st.write(summarize_document(document.key, document))
+
+    if input_text:
+        # Retrieve the chunks of the document most relevant to the question
+        query_embedding = get_embedder().encode([input_text], convert_to_numpy=True)[0]
+        relevant_chunks = document.search(query_embedding, TOP_K)
+        if not relevant_chunks:
+            st.warning("No text could be extracted from this PDF.")
+        else:
+            # Generate a response from the model, providing the relevant chunks as context
+            response = get_chain().run(question=input_text, document_text="\n\n".join(relevant_chunks))
+
+            # Display the result in the Streamlit app
+            st.write("Answer: ", response)
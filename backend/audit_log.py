@@ -0,0 +1,62 @@
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+
+
+class AuditLog:
+    """Append-only JSON-lines log written by a background thread.
+
+    ``record`` only enqueues the event, so callers never wait on disk. At
+    most ``max_pending`` events may be waiting; beyond that new events are
+    dropped (and counted) rather than blocking. Whatever is queued is
+    flushed on ``close``, which also runs at interpreter exit.
+    """
+
+    def __init__(self, path: str, max_pending: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self.written = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(dict(event, time=time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    return
+                # Drain whatever else is waiting before flushing once
+                events = [event]
+                while True:
+                    try:
+                        events.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in events
+                try:
+                    f.writelines(json.dumps(e) + "\n" for e in events if e is not None)
+                    f.flush()
+                    self.written += len(events) - stop
+                except (OSError, TypeError, ValueError) as e:
+                    logging.warning(f"Could not write to audit log '{self.path}': {e}")
+                if stop:
+                    return
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> dict:
+        return {"written": self.written, "dropped": self.dropped, "pending": self._queue.qsize()}
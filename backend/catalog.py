@@ -0,0 +1,228 @@
+"""Compiles the asana CSV into a compact, memory-mapped binary catalog.
+
+Usage (in backend/):
+    python catalog.py yoga_asanas_and_diseases.csv --out asana_catalog
+
+The catalog is a directory of ``.npy`` files plus ``catalog.json``: every
+distinct string (asana names, diseases, contraindications, TF-IDF terms)
+is stored once in a UTF-8 string table, the CSV columns become int32 codes
+into it (-1 for empty cells), and the TF-IDF matrix fitted on the ten
+feature columns is stored as CSR arrays. Serving loads it with
+``numpy.load(mmap_mode="r")``, so workers share the pages and neither
+pandas nor scikit-learn is imported. A catalog whose recorded CSV digest
+no longer matches the CSV is ignored in favour of parsing the CSV.
+"""
+import os
+import json
+import shutil
+import logging
+import argparse
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from recommendation import file_digest
+
+CATALOG_VERSION = 1
+CATALOG_META = "catalog.json"
+FEATURE_COLUMNS = [
+    'Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5',
+    'Should Not Perform Reason 1', 'Should Not Perform Reason 2',
+    'Should Not Perform 3', 'Should Not Perform 4', 'Should Not Perform 5'
+]
+
+
+class StringTable:
+    """Interned strings in one UTF-8 blob; each code is decoded at most once."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._decoded: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        code = int(code)
+        text = self._decoded.get(code)
+        if text is None:
+            start, end = int(self._offsets[code]), int(self._offsets[code + 1])
+            text = self._decoded[code] = bytes(self._blob[start:end]).decode("utf-8")
+        return text
+
+    def decode(self, codes: Sequence[int]) -> List[str]:
+        return ["" if code < 0 else self[code] for code in codes]
+
+
+class AsanaCatalog:
+    """Read-only view of a compiled catalog.
+
+    Behaves like the subset of a DataFrame ``AsanaRecommender`` uses:
+    ``columns`` and ``catalog[column]`` (a list, "" for empty cells, the
+    same ``str`` object for every occurrence of a string).
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, CATALOG_META), "r") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported catalog version {self.meta.get('version')} in '{directory}'.")
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+        self.directory = directory
+        self.strings = StringTable(load("strings"), load("string_offsets"))
+        self.index = load("index")
+        self.codes = load("columns")
+        self.columns: List[str] = ["Index"] + self.meta["columns"]
+        self._column_of = {column: i for i, column in enumerate(self.meta["columns"])}
+        self._tfidf = (load("tfidf_data"), load("tfidf_indices"), load("tfidf_indptr"))
+        self.vocabulary_codes = load("vocabulary")
+        self.idf = load("idf")
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def source_digest(self) -> str:
+        return self.meta["source_sha256"]
+
+    def __getitem__(self, column: str) -> list:
+        if column == "Index":
+            return self.index.tolist()
+        return self.strings.decode(self.codes[:, self._column_of[column]])
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """TF-IDF terms, in feature order."""
+        return [self.strings[code] for code in self.vocabulary_codes]
+
+    def feature_matrix(self) -> sparse.csr_matrix:
+        """The prefitted TF-IDF matrix, backed by the memory-mapped arrays."""
+        data, indices, indptr = self._tfidf
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(self), len(self.idf)), copy=False)
+
+
+def read_csv_frame(csv_path: str):
+    """The CSV as a DataFrame with empty feature cells and an "Index" column filled in."""
+    import pandas as pd
+    try:
+        df = pd.read_csv(csv_path)
+    except Exception as e:
+        raise RuntimeError(f"Could not load CSV file. Please ensure '{csv_path}' exists.") from e
+
+    for feature in FEATURE_COLUMNS:
+        if feature in df.columns:
+            df[feature] = df[feature].fillna("")
+        else:
+            df[feature] = ""
+
+    if "Index" not in df.columns:
+        df["Index"] = df.index
+    return df
+
+
+def fit_features(df):
+    """Fits TF-IDF on the ten feature columns joined by spaces; returns (vectorizer, matrix)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    combined_features = df[FEATURE_COLUMNS[0]]
+    for feature in FEATURE_COLUMNS[1:]:
+        combined_features = combined_features + " " + df[feature]
+    vectorizer = TfidfVectorizer()
+    return vectorizer, vectorizer.fit_transform(combined_features)
+
+
+def compile_catalog(csv_path: str, out_dir: str) -> dict:
+    """Builds the catalog for ``csv_path`` in ``out_dir`` (replaced atomically) and returns its metadata."""
+    df = read_csv_frame(csv_path)
+    vectorizer, features = fit_features(df)
+    features = features.tocsr()
+
+    strings: Dict[str, int] = {}
+
+    def intern(value) -> int:
+        if value is None or value == "" or (isinstance(value, float) and np.isnan(value)):
+            return -1
+        return strings.setdefault(str(value), len(strings))
+
+    columns = [column for column in df.columns if column != "Index"]
+    codes = np.array([[intern(value) for value in df[column].tolist()] for column in columns],
+                     dtype=np.int32).T.reshape(len(df), len(columns))
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    vocabulary = np.array([intern(term) for term in terms], dtype=np.int32)
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    arrays = {
+        "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "string_offsets": offsets,
+        "index": np.asarray(df["Index"].tolist(), dtype=np.int64),
+        "columns": codes,
+        "tfidf_data": features.data,
+        "tfidf_indices": features.indices.astype(np.int32),
+        "tfidf_indptr": features.indptr.astype(np.int64),
+        "vocabulary": vocabulary,
+        "idf": vectorizer.idf_,
+    }
+    meta = {
+        "version": CATALOG_VERSION,
+        "source": os.path.basename(csv_path),
+        "source_sha256": file_digest(csv_path),
+        "rows": len(df),
+        "columns": columns,
+        "strings": len(strings),
+        "terms": len(terms),
+    }
+
+    tmp_dir = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, name + ".npy"), np.ascontiguousarray(values))
+    with open(os.path.join(tmp_dir, CATALOG_META), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return meta
+
+
+def open_catalog(catalog_dir: str, csv_path: str) -> Optional[AsanaCatalog]:
+    """The compiled catalog if it exists and was built from the current CSV, else None."""
+    if not os.path.exists(os.path.join(catalog_dir, CATALOG_META)):
+        return None
+    try:
+        catalog = AsanaCatalog(catalog_dir)
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Ignoring unreadable catalog '{catalog_dir}': {e}")
+        return None
+    if os.path.exists(csv_path) and catalog.source_digest != file_digest(csv_path):
+        logging.warning(f"Catalog '{catalog_dir}' is older than '{csv_path}'; rebuild it with catalog.py.")
+        return None
+    return catalog
+
+
+def load_features(csv_path: str, catalog_dir: Optional[str] = None) -> Tuple[object, sparse.csr_matrix]:
+    """(table, TF-IDF matrix) from the compiled catalog when current, else parsed from the CSV."""
+    catalog = open_catalog(catalog_dir, csv_path) if catalog_dir else None
+    if catalog is not None:
+        return catalog, catalog.feature_matrix()
+    df = read_csv_frame(csv_path)
+    return df, fit_features(df)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", default="yoga_asanas_and_diseases.csv")
+    parser.add_argument("--out", default="asana_catalog")
+    args = parser.parse_args()
+    meta = compile_catalog(args.csv, args.out)
+    print(f"Compiled {meta['rows']} asanas, {meta['strings']} strings and {meta['terms']} TF-IDF terms "
+          f"into '{args.out}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+STOP_WORDS = {"and", "or", "of", "the", "with"}
+
+
+def normalize_disease(name: str) -> str:
+    """Lowercase letters and digits only, so "Nervous System (Brain Fever)" == "NervousSystem(BrainFever)"."""
+    return re.sub(r"[^0-9a-z]+", "", str(name).lower())
+
+
+def disease_words(name: str) -> Set[str]:
+    """Lowercase words, with glued spellings like "NervousSystem" split at the capitals."""
+    spaced = re.sub(r"(?<=[a-z])(?=[A-Z])", " ", str(name))
+    return set(re.findall(r"[0-9a-z]+", spaced.lower())) - STOP_WORDS
+
+
+def trigrams(key: str) -> List[str]:
+    padded = f"^{key}$"
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class DiseaseIndex:
+    """Fuzzy lookup of disease names among the catalog's spellings.
+
+    Names are normalized once and indexed by character trigram. A lookup
+    first tries the normalized name exactly, then scores every name sharing
+    a trigram with it (Dice coefficient of the trigram sets) in one
+    ``numpy.bincount`` over the posting lists, so its cost grows with the
+    number of names sharing trigrams, not with the catalog size times
+    string length. Matches below ``cutoff`` are rejected.
+
+    ``aliases`` are canonical names (the diseases the API accepts); each is
+    resolved once to its dataset spelling and kept in ``self.aliases``.
+    """
+
+    def __init__(self, names: Iterable[str], aliases: Iterable[str] = (), cutoff: float = 0.6):
+        self.cutoff = cutoff
+        self.names: List[str] = []
+        self._by_key: Dict[str, int] = {}
+        postings: Dict[str, List[int]] = {}
+        self._by_word: Dict[str, Set[int]] = {}
+        sizes = []
+        for name in names:
+            key = normalize_disease(name) if name else ""
+            if not key or key in self._by_key:
+                continue
+            name_id = len(self.names)
+            self.names.append(name)
+            self._by_key[key] = name_id
+            grams = trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+            for word in disease_words(name):
+                self._by_word.setdefault(word, set()).add(name_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = np.asarray(sizes, dtype=np.float32)
+
+        self.aliases: Dict[str, Optional[str]] = {alias: self._search(alias) for alias in aliases}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _search(self, name: str) -> Optional[str]:
+        key = normalize_disease(name)
+        if not key:
+            return None
+        name_id = self._by_key.get(key)
+        if name_id is not None:
+            return self.names[name_id]
+        grams = trigrams(key)
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return None
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        scores = 2.0 * shared / (len(grams) + self._sizes)
+        best = int(np.argmax(scores))  # ties go to the name seen first
+        return self.names[best] if scores[best] >= self.cutoff else None
+
+    def lookup(self, name: str) -> Optional[str]:
+        """The dataset spelling closest to ``name``, or None."""
+        if name in self.aliases:
+            return self.aliases[name]
+        return self._search(name)
+
+    def containing(self, name: str) -> List[str]:
+        """Names containing every word of ``name``, e.g. "Knee or Ankle Injury" for "knee injury"."""
+        words = disease_words(name)
+        if not words:
+            return []
+        found = set.intersection(*(self._by_word.get(word, set()) for word in words))
+        return [self.names[name_id] for name_id in sorted(found)]
@@ -1,11 +1,11 @@
 import os
-import difflib
+import sys
 import logging
 import numpy as np
-import pandas as pd
 from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, Depends, status, Query, Header
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from passlib.context import CryptContext
@@ -15,8 +15,14 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine, Column, String, Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+
+# The metrics module is shared with the chat backends
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend1"))
+from instrumentation import instrument_fastapi, register_stats, span
+from password_pool import PasswordWorkerPool, PoolBusy
+from principal_cache import cached_user_lookup, principal_cache_from_env
+from catalog import load_features
+from recommendation import AsanaRecommender, RecommendationCache, build_neighbor_graph, cosine_similarity_matrix
 
 load_dotenv()
 
@@ -45,6 +51,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# METRICS_ENABLED=1 times requests and hot-path stages and serves them on GET /metrics
+instrument_fastapi(app)
+
 # -------------------------------
 # Database Setup (SQLite + SQLAlchemy)
 # -------------------------------
@@ -71,13 +80,32 @@ def get_db():
 # -------------------------------
 # Authentication Setup
 # -------------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is deliberately slow, so it runs on its own bounded pool instead of the request path
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 8)))
+PASSWORD_RETRY_AFTER = os.getenv("PASSWORD_RETRY_AFTER", "1")
+password_pool = PasswordWorkerPool(PASSWORD_WORKERS, PASSWORD_MAX_PENDING)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    with span("bcrypt"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with span("bcrypt"):
+        return pwd_context.hash(password)
+
+async def run_password_job(fn, *args):
+    try:
+        return await password_pool.run(fn, *args)
+    except PoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": PASSWORD_RETRY_AFTER},
+        )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -85,6 +113,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+principal_cache = principal_cache_from_env()
+user_exists = cached_user_lookup(principal_cache, UserModel, SessionLocal)
+
 class User(BaseModel):
     username: str
     password: str
@@ -93,10 +124,11 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-async def get_current_user(
+# A plain def: FastAPI runs it in the threadpool, so a principal cache miss
+# queries users.db without blocking the event loop
+def get_current_user(
     token: Optional[str] = Query(None, description="JWT token as query parameter"),
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
 ):
     if token is None and authorization:
         token = authorization.split("Bearer ")[-1].strip()
@@ -106,15 +138,15 @@ async def get_current_user(
             detail="Could not validate credentials",
         )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        db_user = db.query(UserModel).filter(UserModel.username == username).first()
-        if db_user is None:
+        if not user_exists(username):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
@@ -134,120 +166,128 @@ async def get_current_user(
 # -------------------------------
 # Recommendation Setup
 # -------------------------------
-try:
-    df = pd.read_csv("yoga_asanas_and_diseases.csv")
-except Exception as e:
-    raise RuntimeError("Could not load CSV file. Please ensure 'yoga_asanas_and_diseases.csv' exists.") from e
-
-selected_features = [
-    'Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5',
-    'Should Not Perform Reason 1', 'Should Not Perform Reason 2',
-    'Should Not Perform 3', 'Should Not Perform 4', 'Should Not Perform 5'
+CSV_PATH = "yoga_asanas_and_diseases.csv"
+# Compiled from the CSV with `python catalog.py`; used while it matches the CSV
+CATALOG_PATH = os.getenv("ASANA_CATALOG", "asana_catalog")
+
+# "dense" keeps the full N x N cosine matrix; "sparse" keeps only the top-k
+# neighbors per asana, which scales to much larger catalogs.
+SIMILARITY_MODE = os.getenv("SIMILARITY_MODE", "dense")
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "64"))
+
+VALID_DISEASES = [
+    'Anxiety', 'Digestive Issues', 'Poor Posture', 'Insomnia',
+    'Asthma', 'Fatigue', 'Back Pain', 'Sciatica', 'Depression', 'Stress',
+    'Endocrine Problems (Diabetes/Infertility/Thyroid)', 'Respiratory Diseases',
+    'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
 ]
-for feature in selected_features:
-    if feature in df.columns:
-        df[feature] = df[feature].fillna("")
+
+RECOMMEND_CACHE_CONTROL = os.getenv("RECOMMEND_CACHE_CONTROL", "private, max-age=300")
+MAX_BATCH_LIMIT = 100
+
+class RecommendBatchRequest(BaseModel):
+    diseases: List[str]
+    contraindications: List[str] = []
+    limit: int = 20
+
+def load_recommender(csv_path: str = CSV_PATH) -> AsanaRecommender:
+    table, feature_vectors = load_features(csv_path, CATALOG_PATH)
+    if SIMILARITY_MODE == "sparse":
+        similarity = build_neighbor_graph(feature_vectors, top_k=SIMILARITY_TOP_K)
     else:
-        df[feature] = ""
-
-if "Index" not in df.columns:
-    df["Index"] = df.index
-
-combined_features = (
-    df['Disease 1'] + " " +
-    df['Disease 2'] + " " +
-    df['Disease 3'] + " " +
-    df['Disease 4'] + " " +
-    df['Disease 5'] + " " +
-    df['Should Not Perform Reason 1'] + " " +
-    df['Should Not Perform Reason 2'] + " " +
-    df['Should Not Perform 3'] + " " +
-    df['Should Not Perform 4'] + " " +
-    df['Should Not Perform 5']
-)
+        similarity = cosine_similarity_matrix(feature_vectors)
+
+    # Disease matches and per-asana contraindications are resolved once here
+    return AsanaRecommender(table, similarity, diseases=VALID_DISEASES)
 
-vectorizer = TfidfVectorizer()
-feature_vectors = vectorizer.fit_transform(combined_features)
-similarity = cosine_similarity(feature_vectors)
+# Results are memoized per disease and reloaded when the CSV changes on disk
+recommendation_cache = RecommendationCache(CSV_PATH, load_recommender, diseases=VALID_DISEASES)
+
+register_stats("principal_cache", principal_cache.stats)
+register_stats("password_pool", lambda: {"pending": password_pool.pending, "workers": password_pool.workers})
 
 def suggest_asanas(name: str) -> List[dict]:
-    suggested_asanas = set()
-    results = []
-    for column in ['Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5']:
-        matches = difflib.get_close_matches(name, df[column].tolist(), n=1)
-        if matches:
-            close_match = matches[0]
-            indices = df[df[column] == close_match]['Index'].values
-            if len(indices) > 0:
-                sim_scores = list(enumerate(similarity[indices[0]]))
-                sorted_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-                count = 0
-                for idx, score in sorted_scores:
-                    asana_info = df[df['Index'] == idx]
-                    if not asana_info.empty:
-                        asana_name = asana_info['Asana Name'].values[0] if "Asana Name" in asana_info.columns else f"Asana_{idx}"
-                        reasons = []
-                        for j in range(1, 6):
-                            col_name = f"Should Not Perform Reason {j}"
-                            if col_name in asana_info.columns:
-                                reason = asana_info[col_name].values[0]
-                                if reason:
-                                    reasons.append(reason)
-                        asana_tuple = (asana_name, tuple(reasons))
-                        if asana_tuple not in suggested_asanas:
-                            suggested_asanas.add(asana_tuple)
-                            if count < 20:
-                                results.append({
-                                    "Asana Name": asana_name,
-                                    "Reasons Not to Perform": reasons
-                                })
-                                count += 1
-                if results:
-                    break
-    return results
+    return recommendation_cache.recommender.suggest(name, limit=20)
 
 # -------------------------------
 # API Endpoints for Authentication & Recommendation
 # -------------------------------
+@app.on_event("startup")
+def warm_recommendation_cache():
+    recommendation_cache.warm()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    password_pool.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the AyurYoga Backend (Auth & Recommendation)!"}
 
-@app.post("/register/", response_model=dict)
-def register(user: User, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.username == user.username).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = get_password_hash(user.password)
-    new_user = UserModel(username=user.username, hashed_password=hashed_password)
+def get_user_by_username(db: Session, username: str) -> Optional[UserModel]:
+    with span("db_lookup"):
+        return db.query(UserModel).filter(UserModel.username == username).first()
+
+def add_user(db: Session, username: str, hashed_password: str) -> UserModel:
+    new_user = UserModel(username=username, hashed_password=hashed_password)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    return new_user
+
+@app.post("/register/", response_model=dict)
+async def register(user: User, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(get_user_by_username, db, user.username)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    hashed_password = await run_password_job(get_password_hash, user.password)
+    await run_in_threadpool(add_user, db, user.username, hashed_password)
     return {"message": "User registered successfully"}
 
 @app.post("/login/", response_model=Token)
-def login(user: User, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: User, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(get_user_by_username, db, user.username)
+    if not db_user or not await run_password_job(verify_password, user.password, db_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/recommend/", response_model=List[dict])
-def recommend(disease: str, current_user: str = Depends(get_current_user)):
-    valid_diseases = [
-        'Anxiety', 'Digestive Issues', 'Poor Posture', 'Insomnia',
-        'Asthma', 'Fatigue', 'Back Pain', 'Sciatica', 'Depression', 'Stress',
-        'Endocrine Problems (Diabetes/Infertility/Thyroid)', 'Respiratory Diseases',
-        'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
-    ]
-    if disease not in valid_diseases:
+def recommend(
+    disease: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: str = Depends(get_current_user)
+):
+    if disease not in VALID_DISEASES:
         raise HTTPException(status_code=400, detail="Unsupported disease. Please select a valid one.")
-    suggestions = suggest_asanas(disease)
+    suggestions, etag = recommendation_cache.get(disease)
     if not suggestions:
         raise HTTPException(status_code=404, detail="No asana suggestions found for the selected disease.")
+    headers = {"ETag": etag, "Cache-Control": RECOMMEND_CACHE_CONTROL}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return suggestions
 
+@app.post("/recommend/batch", response_model=dict)
+def recommend_batch(request: RecommendBatchRequest, current_user: str = Depends(get_current_user)):
+    """Merged suggestions for several diseases, without asanas contraindicated for the user."""
+    if not request.diseases:
+        raise HTTPException(status_code=400, detail="Please select at least one disease.")
+    unsupported = [disease for disease in request.diseases if disease not in VALID_DISEASES]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported disease(s): {', '.join(unsupported)}.")
+    if not 1 <= request.limit <= MAX_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_BATCH_LIMIT}.")
+    recommendation_cache.refresh()
+    suggestions = recommendation_cache.recommender.suggest_many(
+        request.diseases, avoid=request.contraindications, limit=request.limit
+    )
+    if not suggestions:
+        raise HTTPException(status_code=404, detail="No asana suggestions found for the selected diseases.")
+    return {"diseases": list(dict.fromkeys(request.diseases)), "recommendations": suggestions}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolBusy(Exception):
+    """Raised when the password pool already has ``max_pending`` jobs."""
+
+
+class PasswordWorkerPool:
+    """Runs bcrypt hashing/verification on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL while it works, so threads scale across cores
+    without the pickling overhead of a process pool. At most ``max_pending``
+    jobs may be running or queued; further calls fail fast with ``PoolBusy``
+    so the endpoint can answer 503 instead of piling up requests.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolBusy()
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Released when the job finishes (or is cancelled before starting), not when the
+        # caller stops waiting: a disconnected request's hash still occupies a worker
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,414 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from disease_index import DiseaseIndex, normalize_disease
+
+try:
+    from instrumentation import span  # backend1/, put on the path by main.py
+except ImportError:  # the Streamlit app and catalog.py run without metrics
+    from contextlib import nullcontext as span
+
+DISEASE_COLUMNS = ['Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5']
+REASON_COLUMNS = [f"Should Not Perform Reason {j}" for j in range(1, 6)]
+
+
+class NeighborGraph(NamedTuple):
+    """Top-k cosine neighbors per asana as CSR arrays, each row in rank order."""
+    indptr: np.ndarray
+    indices: np.ndarray
+    scores: np.ndarray
+
+    @property
+    def shape(self):
+        size = len(self.indptr) - 1
+        return (size, size)
+
+    def neighbors(self, row: int) -> np.ndarray:
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+
+def _top_k_row(columns: np.ndarray, values: np.ndarray, k: int, size: int):
+    """Orders one sparse similarity row like a stable descending sort and keeps k entries."""
+    if len(values) > k:
+        top = np.argpartition(-values, k - 1)[:k]
+        keep = values >= values[top].min()
+        columns, values = columns[keep], values[keep]
+    order = np.lexsort((columns, -values))[:k]
+    columns, values = columns[order], values[order]
+    if len(columns) < k:
+        # Unstored entries score 0.0 and rank by position after every positive score.
+        present = set(columns.tolist())
+        padding = []
+        for column in range(size):
+            if len(columns) + len(padding) == k:
+                break
+            if column not in present:
+                padding.append(column)
+        columns = np.concatenate([columns, np.asarray(padding, dtype=columns.dtype)])
+        values = np.concatenate([values, np.zeros(len(padding), dtype=values.dtype)])
+    return columns, values
+
+
+def l2_normalize_rows(matrix) -> sparse.csr_matrix:
+    """CSR copy of ``matrix`` with unit-length rows (all-zero rows stay zero)."""
+    matrix = sparse.csr_matrix(matrix, dtype=np.float64, copy=True)
+    squares = np.zeros(matrix.shape[0])
+    np.add.at(squares, np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr)), matrix.data ** 2)
+    norms = np.sqrt(squares)
+    norms[norms == 0] = 1.0
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr))
+    return matrix
+
+
+def cosine_similarity_matrix(feature_vectors) -> np.ndarray:
+    """Dense N x N cosine similarity of the rows of a sparse matrix."""
+    normalized = l2_normalize_rows(feature_vectors)
+    return (normalized @ normalized.T).toarray()
+
+
+def build_neighbor_graph(feature_vectors, top_k: int = 64, block_size: int = 256) -> NeighborGraph:
+    """Builds the top-k cosine neighbor lists block by block.
+
+    Only ``block_size`` rows of the similarity matrix exist at any time, and
+    they stay sparse, so the dense N x N matrix is never materialized.
+    """
+    normalized = l2_normalize_rows(feature_vectors)
+    transposed = normalized.T.tocsr()
+    size = normalized.shape[0]
+    k = min(top_k, size)
+
+    indptr = np.arange(size + 1, dtype=np.int64) * k
+    indices = np.empty(size * k, dtype=np.int32)
+    scores = np.empty(size * k, dtype=np.float32)
+    for start in range(0, size, block_size):
+        block = (normalized[start:start + block_size] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            lo, hi = block.indptr[offset], block.indptr[offset + 1]
+            columns, values = _top_k_row(block.indices[lo:hi], block.data[lo:hi], k, size)
+            row = start + offset
+            indices[row * k:(row + 1) * k] = columns
+            scores[row * k:(row + 1) * k] = values
+    return NeighborGraph(indptr, indices, scores)
+
+
+def _column_values(table, column: str) -> list:
+    values = table[column]
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+class AsanaRecommender:
+    """Answers asana suggestions from plain arrays precomputed at load time.
+
+    The disease -> similarity row lookup for the known diseases, the asana
+    names and the per-asana contraindication lists are all resolved once, so
+    a request only ranks one similarity row with ``numpy.argpartition``.
+    ``similarity`` is either the dense cosine matrix or a ``NeighborGraph``,
+    whose rows are already ranked. ``table`` is the asana DataFrame or a
+    compiled ``catalog.AsanaCatalog``.
+    """
+
+    def __init__(self, table, similarity, diseases: Iterable[str] = ()):
+        self.similarity = similarity
+        index_values = _column_values(table, "Index")
+
+        # Similarity rows are addressed by the "Index" column, not by position.
+        row_of_index: Dict[int, int] = {}
+        for row, idx in enumerate(index_values):
+            row_of_index.setdefault(idx, row)
+
+        # First "Index" of each disease per column, keyed by normalized name so that
+        # spellings differing only in case or spacing count as one disease
+        self._first_index = {}
+        disease_names = []
+        for column in DISEASE_COLUMNS:
+            first = {}
+            for value, idx in zip(_column_values(table, column), index_values):
+                if value and normalize_disease(value) not in first:
+                    first[normalize_disease(value)] = idx
+                    disease_names.append(value)
+            self._first_index[column] = first
+        # The API's disease names resolve to dataset spellings once, at load time
+        self.disease_index = DiseaseIndex(disease_names, aliases=diseases)
+
+        has_name = "Asana Name" in table.columns
+        names = _column_values(table, "Asana Name") if has_name else None
+        reason_values = [_column_values(table, column) for column in REASON_COLUMNS if column in table.columns]
+
+        size = similarity.shape[0]
+        self.names: List[Optional[str]] = [None] * size
+        self.reasons: List[tuple] = [()] * size
+        self.key_codes = np.full(size, -1, dtype=np.int64)
+        codes: Dict[tuple, int] = {}
+        for position in range(size):
+            row = row_of_index.get(position)
+            if row is None:
+                continue
+            name = names[row] if has_name else f"Asana_{position}"
+            reasons = tuple(values[row] for values in reason_values if values[row])
+            self.names[position] = name
+            self.reasons[position] = reasons
+            self.key_codes[position] = codes.setdefault((name, reasons), len(codes))
+
+        self._all_codes = set(codes.values())
+
+        # "Should Not Perform" reason -> asana positions, for filtering by the user's conditions
+        reason_positions: Dict[str, List[int]] = {}
+        for position, reasons in enumerate(self.reasons):
+            for reason in reasons:
+                reason_positions.setdefault(normalize_disease(reason), []).append(position)
+        self.reason_index = DiseaseIndex(reason for reasons in self.reasons for reason in reasons)
+        self._reason_positions = {key: np.asarray(positions) for key, positions in reason_positions.items()}
+
+        self._matches: Dict[str, List[int]] = {}
+        for disease in diseases:
+            self._matches[disease] = self._match_rows(disease)
+
+    def _match_rows(self, name: str) -> List[int]:
+        """Similarity rows of the closest disease match, one per column it appears in."""
+        match = self.disease_index.lookup(name)
+        if match is None:
+            return []
+        key = normalize_disease(match)
+        return [self._first_index[column][key] for column in DISEASE_COLUMNS if key in self._first_index[column]]
+
+    def match_rows(self, name: str) -> List[int]:
+        rows = self._matches.get(name)
+        if rows is None:
+            with span("disease_match"):
+                rows = self._match_rows(name)
+        return rows
+
+    def _ranked_candidates(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the top-k scores (plus ties), ordered like a stable descending sort."""
+        size = scores.shape[0]
+        if k < size:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates = np.flatnonzero(scores >= scores[top].min())
+        else:
+            candidates = np.arange(size)
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+    def _rank(self, row: int, limit: int, seen: Set[int]) -> List[int]:
+        if isinstance(self.similarity, NeighborGraph):
+            ranked = self.similarity.neighbors(row)
+            scores, size, k = None, len(ranked), len(ranked)
+        else:
+            ranked = None
+            scores = np.asarray(self.similarity[row]).ravel()
+            size = scores.shape[0]
+            k = min(size, limit)
+        while True:
+            picked, taken = [], set(seen)
+            candidates = ranked if scores is None else self._ranked_candidates(scores, k)
+            for position in candidates:
+                code = self.key_codes[position]
+                if code < 0 or code in taken:
+                    continue
+                taken.add(code)
+                picked.append(position)
+                if len(picked) == limit:
+                    break
+            if len(picked) == limit or k >= size:
+                break
+            k = min(size, k * 2)
+        # Ranking a row visits every asana, so all of them count as seen afterwards.
+        seen.update(self._all_codes)
+        return picked
+
+    def _score_rows(self, rows: List[int]) -> np.ndarray:
+        """Similarity rows as a dense (len(rows), N) array; unlisted neighbors score 0."""
+        if not isinstance(self.similarity, NeighborGraph):
+            return np.asarray(self.similarity[rows], dtype=np.float32)
+        graph = self.similarity
+        scores = np.zeros((len(rows), graph.shape[0]), dtype=np.float32)
+        for i, row in enumerate(rows):
+            lo, hi = graph.indptr[row], graph.indptr[row + 1]
+            scores[i, graph.indices[lo:hi]] = graph.scores[lo:hi]
+        return scores
+
+    def contraindicated(self, conditions: Iterable[str]) -> np.ndarray:
+        """Mask of the asanas with a "Should Not Perform" reason matching any of ``conditions``.
+
+        A reason matches when it is the closest spelling of a condition or
+        contains all of its words ("Knee Injury" also rules out "Knee or
+        Ankle Injury").
+        """
+        mask = np.zeros(len(self.names), dtype=bool)
+        for condition in conditions:
+            matched = set(self.reason_index.containing(condition))
+            closest = self.reason_index.lookup(condition)
+            if closest is not None:
+                matched.add(closest)
+            for reason in matched:
+                mask[self._reason_positions[normalize_disease(reason)]] = True
+        return mask
+
+    def suggest_many(self, names: Iterable[str], avoid: Iterable[str] = (), limit: int = 20) -> List[dict]:
+        """Suggests up to ``limit`` asanas for several diseases at once.
+
+        Each disease contributes the similarity row ``suggest`` would rank
+        first; all rows are scored in one array and asanas are ranked by
+        their summed similarity, so those that help several conditions come
+        first. Asanas contraindicated for any of the diseases or ``avoid``
+        conditions are left out. Each result lists the diseases for which
+        it is among the top ``limit`` of these asanas, or else the one it
+        scores highest for.
+        """
+        names = list(dict.fromkeys(names))
+        matched = [(name, rows[0]) for name, rows in ((name, self.match_rows(name)) for name in names) if rows]
+        if not matched or limit <= 0:
+            return []
+        with span("disease_match"):
+            contraindicated = self.contraindicated(list(names) + list(avoid))
+        with span("rank"):
+            scores = self._score_rows([row for _, row in matched])
+            total = scores.sum(axis=0)
+
+            eligible = (self.key_codes >= 0) & (total > 0) & ~contraindicated
+            candidates = np.flatnonzero(eligible)
+            ranked = candidates[np.lexsort((candidates, -total[candidates]))]
+            # One entry per (name, reasons), like suggest
+            _, first = np.unique(self.key_codes[ranked], return_index=True)
+            unique = ranked[np.sort(first)]
+            picked = unique[:limit]
+            if not len(picked):
+                return []
+
+            # Each disease's top-``limit`` cut-off among the same candidates, so
+            # ineligible, contraindicated and duplicate asanas do not raise it
+            candidate_scores = scores[:, unique]
+            k = min(limit, len(unique))
+            thresholds = -np.partition(-candidate_scores, k - 1, axis=1)[:, k - 1]
+            picked_scores = candidate_scores[:, :len(picked)]
+            serves = (picked_scores >= thresholds[:, None]) & (picked_scores > 0)
+            # An asana ranked high only by its summed score is credited to its best disease
+            unattributed = np.flatnonzero(~serves.any(axis=0))
+            serves[picked_scores[:, unattributed].argmax(axis=0), unattributed] = True
+        return [
+            {
+                "Asana Name": self.names[position],
+                "Reasons Not to Perform": list(self.reasons[position]),
+                "Diseases": [matched[i][0] for i in np.flatnonzero(serves[:, j])],
+                "Score": round(float(total[position]), 6),
+            }
+            for j, position in enumerate(picked)
+        ]
+
+    def suggest(self, name: str, limit: int = 20, first_match_only: bool = True) -> List[dict]:
+        """Suggests up to ``limit`` asanas per matching disease column.
+
+        With ``first_match_only`` the first column that yields suggestions
+        wins; otherwise every matching column is ranked in turn, skipping
+        asanas that an earlier column already covered.
+        """
+        seen: Set[int] = set()
+        results = []
+        for row in self.match_rows(name):
+            with span("rank"):
+                ranked = self._rank(row, limit, seen)
+            for position in ranked:
+                results.append({
+                    "Asana Name": self.names[position],
+                    "Reasons Not to Perform": list(self.reasons[position]),
+                })
+            if first_match_only and results:
+                break
+        return results
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RecommendationCache:
+    """Memoizes suggestions per disease for one version of the dataset.
+
+    The dataset file is stat-ed at most every ``check_interval`` seconds; when
+    its mtime or size changes it is re-hashed, and a new hash reloads the
+    recommender through ``loader`` and drops every memoized result.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        loader: Callable[[str], AsanaRecommender],
+        diseases: Iterable[str] = (),
+        limit: int = 20,
+        check_interval: float = 1.0,
+        first_match_only: bool = True,
+    ):
+        self.path = path
+        self.loader = loader
+        self.diseases = list(diseases)
+        self.limit = limit
+        self.first_match_only = first_match_only
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stat = self._file_stat()
+        # (dataset hash, recommender, memoized results) are swapped as one unit
+        self._state = (file_digest(path), loader(path), {})
+        self._checked_at = time.monotonic()
+
+    @property
+    def version(self) -> str:
+        return self._state[0]
+
+    @property
+    def recommender(self) -> AsanaRecommender:
+        return self._state[1]
+
+    def _file_stat(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> bool:
+        """Reloads the dataset if the file changed; returns True when it did."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        try:
+            file_stat = self._file_stat()
+        except OSError as e:
+            logging.warning(f"Could not stat '{self.path}', keeping the loaded dataset: {e}")
+            return False
+        if file_stat == self._stat:
+            return False
+        with self._lock:
+            if file_stat == self._stat:
+                return False
+            version = file_digest(self.path)
+            self._stat = file_stat
+            if version == self.version:
+                return False
+            self._state = (version, self.loader(self.path), {})
+        logging.info(f"Dataset '{self.path}' changed; recommendation cache invalidated.")
+        return True
+
+    def get(self, disease: str) -> Tuple[List[dict], str]:
+        """Returns the suggestions for ``disease`` and their ETag."""
+        self.refresh()
+        version, recommender, results = self._state
+        cached = results.get(disease)
+        if cached is None:
+            suggestions = recommender.suggest(disease, limit=self.limit, first_match_only=self.first_match_only)
+            tag = hashlib.sha256(f"{version}:{disease}".encode("utf-8")).hexdigest()[:32]
+            cached = (suggestions, f'"{tag}"')
+            results[disease] = cached
+        return cached
+
+    def warm(self) -> None:
+        for disease in self.diseases:
+            self.get(disease)
@@ -0,0 +1,199 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import faiss
+
+from embedding import EmbeddingConfig, embedder_id, load_embedder
+from index_factory import IndexConfig, build_index, build_params, load_index, read_index_meta, save_index
+from text_store import TextStore, content_hash
+
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "embeddings.json"
+INDEX_FILE = "index.faiss"
+
+
+class IndexSnapshot(NamedTuple):
+    """An immutable view of the loaded model, FAISS index and text data."""
+    model: object
+    index: faiss.Index
+    text_data: Sequence[str]
+    fingerprint: str
+
+
+def load_text_data(data_path: str) -> TextStore:
+    """Opens the text corpus written by ``write_text_store`` (memory-mapped, read-only)."""
+    if data_path.endswith((".pkl", ".pkl.gz")):
+        raise ValueError(f"'{data_path}' is a pickle; convert it with 'python migrate_artifacts.py --data {data_path}'.")
+    return TextStore(data_path)
+
+
+def corpus_fingerprint(text_data: Sequence[str], model_name: str) -> str:
+    """Hashes the corpus together with the embedding model name."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    for text in text_data:
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChatIndex:
+    """Builds the chat retrieval index once and keeps it resident.
+
+    Embeddings are saved to ``cache_dir`` next to a fingerprint of the corpus
+    and model and memory-mapped on later boots. When the fingerprint
+    changes only entries whose text hash is not in the cache are encoded.
+    The FAISS index is built according to ``index_config`` and saved too, so
+    trained IVF/HNSW indexes are reused.
+    """
+
+    def __init__(self, data_path: str, cache_dir: str, model_name: str,
+                 index_config: IndexConfig = IndexConfig(), embedding_config: EmbeddingConfig = EmbeddingConfig()):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.embedding_config = embedding_config
+        # Vectors from different embedding backends are cached separately.
+        self.model_id = embedder_id(model_name, embedding_config)
+        self.index_config = index_config
+        self._model = None
+        self._cached_hashes: List[str] = []
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def get(self) -> IndexSnapshot:
+        """Returns the resident index, building it on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build()
+                snapshot = self._snapshot
+        return snapshot
+
+    def reindex(self, force: bool = False) -> dict:
+        """Reloads the corpus and swaps in a fresh index without a restart."""
+        with self._lock:
+            previous = self._snapshot
+            snapshot = self._build(force=force)
+            self._snapshot = snapshot
+        rebuilt = force or previous is None or previous.fingerprint != snapshot.fingerprint
+        return {
+            "status": "rebuilt" if rebuilt else "unchanged",
+            "fingerprint": snapshot.fingerprint,
+            "entries": len(snapshot.text_data),
+        }
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = load_embedder(self.model_name, self.embedding_config)
+        return self._model
+
+    def _build(self, force: bool = False) -> IndexSnapshot:
+        model = self._get_model()
+        logging.info("Loading text data...")
+        text_data = load_text_data(self.data_path)
+        logging.info(f"Loaded {len(text_data)} text entries successfully.")
+        fingerprint = corpus_fingerprint(text_data, self.model_id)
+
+        embeddings = None if force else self._load_embeddings(fingerprint, len(text_data))
+        if embeddings is None:
+            embeddings, hashes = self._encode(model, text_data, reuse=not force)
+            self._save_embeddings(embeddings, fingerprint, hashes)
+            embeddings = self._load_embeddings(fingerprint, len(text_data))
+
+        index = None if force else self._load_index(fingerprint)
+        if index is None:
+            # Entries emptied by incremental ingestion keep their position but are not searchable.
+            ids = np.array([i for i, text in enumerate(text_data) if text], dtype="int64")
+            if len(ids) == len(text_data):
+                index = build_index(embeddings, self.index_config)
+            else:
+                index = build_index(embeddings[ids], self.index_config, ids=ids)
+            save_index(index, os.path.join(self.cache_dir, INDEX_FILE), self.index_config, fingerprint=fingerprint)
+        return IndexSnapshot(model, index, text_data, fingerprint)
+
+    def _encode(self, model, text_data: Sequence[str], reuse: bool = True):
+        """Embeds the corpus, reusing cached vectors of texts that have not changed."""
+        hashes = [content_hash(text) for text in text_data]
+        cached = {}
+        previous = self._load_embeddings(None, None) if reuse else None
+        if previous is not None:
+            cached = {digest: row for row, digest in enumerate(self._cached_hashes) if digest}
+        missing = [i for i, (text, digest) in enumerate(zip(text_data, hashes)) if text and digest not in cached]
+        logging.info(f"Encoding {len(missing)} of {len(text_data)} text entries (fingerprint changed or no cached embeddings)...")
+        encoded = model.encode([text_data[i] for i in missing], convert_to_numpy=True).astype("float32") if missing else None
+        dim = encoded.shape[1] if encoded is not None else previous.shape[1]
+        embeddings = np.zeros((len(text_data), dim), dtype="float32")
+        if encoded is not None:
+            embeddings[missing] = encoded
+        for i, (text, digest) in enumerate(zip(text_data, hashes)):
+            if text and digest in cached:
+                embeddings[i] = previous[cached[digest]]
+        # Empty entries are not embedded, so they must not match a cached vector later.
+        return embeddings, [digest if text else "" for text, digest in zip(text_data, hashes)]
+
+    def _load_index(self, fingerprint: str) -> Optional[faiss.Index]:
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        try:
+            meta = read_index_meta(path)
+            if meta.get("fingerprint") != fingerprint or build_params(IndexConfig(**meta["config"])) != build_params(self.index_config):
+                return None
+            index = load_index(path, self.index_config)
+        except (OSError, ValueError, KeyError, TypeError, RuntimeError) as e:
+            logging.info(f"No reusable saved index ({e}); building a new one.")
+            return None
+        logging.info(f"Loaded saved FAISS {self.index_config.kind} index from '{path}'.")
+        return index
+
+    def _load_embeddings(self, fingerprint: Optional[str], count: Optional[int]) -> Optional[np.ndarray]:
+        """Memory-maps the cached embeddings; ``None`` arguments skip the corresponding check."""
+        meta_path = os.path.join(self.cache_dir, META_FILE)
+        emb_path = os.path.join(self.cache_dir, EMBEDDINGS_FILE)
+        if not (os.path.exists(meta_path) and os.path.exists(emb_path)):
+            return None
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+                return None
+            if meta.get("model") != self.model_id:
+                return None
+            embeddings = np.load(emb_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable embedding cache: {e}")
+            return None
+        if embeddings.ndim != 2 or (count is not None and embeddings.shape[0] != count):
+            return None
+        self._cached_hashes = meta.get("hashes") or [""] * embeddings.shape[0]
+        if len(self._cached_hashes) != embeddings.shape[0]:
+            return None
+        logging.info(f"Memory-mapped cached embeddings from '{emb_path}'.")
+        return embeddings
+
+    def _save_embeddings(self, embeddings: np.ndarray, fingerprint: str, hashes: List[str]) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        emb_path = os.path.join(self.cache_dir, EMBEDDINGS_FILE)
+        meta_path = os.path.join(self.cache_dir, META_FILE)
+        # Write to temporary files first so a crash never leaves a mismatched pair.
+        with open(emb_path + ".tmp", "wb") as f:
+            np.save(f, embeddings)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({
+                "fingerprint": fingerprint,
+                "model": self.model_id,
+                "count": int(embeddings.shape[0]),
+                "dim": int(embeddings.shape[1]),
+                "hashes": hashes,
+            }, f)
+        os.replace(emb_path + ".tmp", emb_path)
+        os.replace(meta_path + ".tmp", meta_path)
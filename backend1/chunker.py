@@ -0,0 +1,138 @@
+import re
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+# An asana entry starts with its English name, then the Sanskrit name and a
+# "(pronunciation)" line; section titles are written in capitals.
+PRONUNCIATION = re.compile(r"^\(.*\)$")
+SECTION_TITLE = re.compile(r"^[^a-z]*[A-Z]{3,}[^a-z]*$")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"“(A-Z0-9])")
+WORD_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+class ChunkConfig(NamedTuple):
+    max_tokens: int = 256  # including the tokenizer's special tokens
+    overlap: int = 32
+
+
+def split_units(text: str) -> List[str]:
+    """Splits a page into asana entries, section titles and prose sentences."""
+    lines = [line.strip() for line in text.splitlines()]
+    blocks, current = [], []
+    for i, line in enumerate(lines):
+        if not line:
+            if current:
+                blocks.append(current)
+            current = []
+        elif i + 2 < len(lines) and PRONUNCIATION.match(lines[i + 2]):
+            if current:
+                blocks.append(current)
+            current = [line]
+        elif SECTION_TITLE.match(line):
+            if current:
+                blocks.append(current)
+            blocks.append([line])
+            current = []
+        else:
+            current.append(line)
+    if current:
+        blocks.append(current)
+
+    units = []
+    for block in blocks:
+        if len(block) >= 3 and PRONUNCIATION.match(block[2]):
+            units.append("\n".join(block))
+        else:
+            units.extend(s for s in SENTENCE_END.split(" ".join(block)) if s)
+    return units
+
+
+class TokenChunker:
+    """Packs text into overlapping chunks that fit the embedding model's window.
+
+    Chunks are built from whole units (see ``split_units``) so asana entries
+    and sentences are not cut in half; only a unit longer than the window is
+    split at token boundaries. Consecutive chunks of a page share up to
+    ``overlap`` tokens of trailing units. ``tokenizer`` is a Hugging Face
+    fast tokenizer (``SentenceTransformer(...).tokenizer``); without one a
+    word-piece approximation is used to count tokens.
+    """
+
+    def __init__(self, tokenizer=None, config: ChunkConfig = ChunkConfig()):
+        self.tokenizer = tokenizer if getattr(tokenizer, "is_fast", False) else None
+        self.config = config
+        specials = self.tokenizer.num_special_tokens_to_add() if self.tokenizer is not None else 2
+        self.budget = config.max_tokens - specials
+        # Chunks are packed against the budget left after the special tokens
+        if config.overlap < 0 or config.overlap >= self.budget:
+            raise ValueError(f"Chunk overlap must be between 0 and {self.budget - 1} tokens "
+                             f"({config.max_tokens} minus {specials} special tokens, minus one).")
+
+    @property
+    def params(self) -> dict:
+        return {**self.config._asdict(), "tokenizer": getattr(self.tokenizer, "name_or_path", "word-piece")}
+
+    def token_spans(self, texts: Sequence[str]) -> List[np.ndarray]:
+        """Character (start, end) spans of each text's tokens, tokenized in one batch."""
+        if not texts:
+            return []
+        if self.tokenizer is not None:
+            encoded = self.tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True,
+                                     return_attention_mask=False, return_token_type_ids=False)
+            return [np.asarray(offsets, dtype=np.int64).reshape(-1, 2) for offsets in encoded["offset_mapping"]]
+        return [np.array([m.span() for m in WORD_PIECE.finditer(text)], dtype=np.int64).reshape(-1, 2)
+                for text in texts]
+
+    def count_tokens(self, texts: Sequence[str]) -> np.ndarray:
+        return np.array([len(spans) for spans in self.token_spans(texts)], dtype=np.int64)
+
+    def chunk(self, text: str) -> List[str]:
+        return self.chunk_many([text])[0]
+
+    def chunk_many(self, texts: Sequence[str]) -> List[List[str]]:
+        """Chunks every text; all units of the batch go through the tokenizer in one call."""
+        units = [split_units(text) for text in texts]
+        flat = [unit for page in units for unit in page]
+        spans = self.token_spans(flat)
+        chunks, position = [], 0
+        for page in units:
+            chunks.append(self._pack(page, spans[position:position + len(page)]))
+            position += len(page)
+        return chunks
+
+    def _pack(self, units: List[str], spans: List[np.ndarray]) -> List[str]:
+        budget, overlap = self.budget, self.config.overlap
+        chunks: List[str] = []
+        current: List[Tuple[str, int]] = []
+        size = 0
+        for unit, unit_spans in zip(units, spans):
+            count = len(unit_spans)
+            if count > budget:
+                if current:
+                    chunks.append("\n".join(u for u, _ in current))
+                current, size = [], 0
+                chunks.extend(self._windows(unit, unit_spans))
+                continue
+            if current and size + count > budget:
+                chunks.append("\n".join(u for u, _ in current))
+                # Carry trailing units into the next chunk as overlap.
+                carried, carried_size = [], 0
+                for u, n in reversed(current):
+                    if carried_size + n > overlap or carried_size + n + count > budget:
+                        break
+                    carried.insert(0, (u, n))
+                    carried_size += n
+                current, size = carried, carried_size
+            current.append((unit, count))
+            size += count
+        if current:
+            chunks.append("\n".join(u for u, _ in current))
+        return chunks
+
+    def _windows(self, text: str, spans: np.ndarray) -> List[str]:
+        """Cuts an oversized unit into windows of ``budget`` tokens overlapping by ``overlap``."""
+        step = self.budget - self.config.overlap
+        starts = np.arange(0, max(1, len(spans) - self.config.overlap), step)
+        ends = np.minimum(starts + self.budget, len(spans)) - 1
+        return [text[spans[s, 0]:spans[e, 1]] for s, e in zip(starts, ends)]
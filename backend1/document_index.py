@@ -0,0 +1,54 @@
+import hashlib
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Sequence
+
+import numpy as np
+
+from chunker import TokenChunker
+from index_factory import IndexConfig, build_index
+
+
+def document_key(data: bytes) -> str:
+    """Identifies an uploaded document by its contents, whatever its file name."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_pdf_pages(data: bytes) -> Iterator[str]:
+    """Yields the text of each page of an in-memory PDF, one page at a time."""
+    import fitz  # PyMuPDF
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+class DocumentIndex(NamedTuple):
+    """One processed document: its page texts, retrieval chunks and their vector index."""
+    key: str
+    pages: List[str]
+    chunks: List[str]
+    index: object  # faiss index, row i is chunks[i]
+
+    def search(self, query_embedding: np.ndarray, k: int) -> List[str]:
+        """The ``k`` chunks closest to the query, best first."""
+        if not self.chunks:
+            return []
+        query = np.asarray(query_embedding, dtype="float32").reshape(1, -1)
+        _, ids = self.index.search(query, min(k, len(self.chunks)))
+        return [self.chunks[i] for i in ids[0] if i >= 0]
+
+
+def build_document_index(key: str, pages: Iterable[str], encode: Callable[[Sequence[str]], np.ndarray],
+                         chunker: TokenChunker, batch_size: int = 64) -> DocumentIndex:
+    """Chunks pages as they are extracted and embeds the chunks ``batch_size`` at a time."""
+    texts, chunks, pending, vectors = [], [], [], []
+    for text in pages:
+        texts.append(text)
+        pending.extend(chunk for chunk in chunker.chunk(text) if chunk.strip())
+        while len(pending) >= batch_size:
+            batch, pending = pending[:batch_size], pending[batch_size:]
+            vectors.append(np.asarray(encode(batch), dtype="float32"))
+            chunks.extend(batch)
+    if pending:
+        vectors.append(np.asarray(encode(pending), dtype="float32"))
+        chunks.extend(pending)
+    index = build_index(np.vstack(vectors), IndexConfig(kind="flat")) if vectors else None
+    return DocumentIndex(key, texts, chunks, index)
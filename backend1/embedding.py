@@ -0,0 +1,193 @@
+"""Pluggable sentence-embedding backends.
+
+``torch`` runs the SentenceTransformer as usual. ``onnx`` exports it once to
+ONNX (mean pooling and normalization included in the graph) and runs it on
+onnxruntime; ``onnx-int8`` additionally applies dynamic int8 quantization.
+All backends expose the ``encode`` / ``tokenizer`` / ``max_seq_length`` API
+the chat services use.
+
+Usage (pre-export so the first service boot does not pay for it):
+    python embedding.py --backend onnx-int8
+"""
+import os
+import re
+import json
+import logging
+import argparse
+from typing import List, NamedTuple, Sequence, Union
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_META_FILE = "embedding.json"
+
+
+class EmbeddingConfig(NamedTuple):
+    backend: str = "torch"
+    threads: int = 0  # 0 keeps the library default (all cores)
+    onnx_dir: str = "onnx_models"
+
+
+def embedding_config_from_env(prefix: str = "EMBEDDING_") -> EmbeddingConfig:
+    """Reads EMBEDDING_BACKEND, EMBEDDING_THREADS and EMBEDDING_ONNX_DIR."""
+    defaults = EmbeddingConfig()
+    config = EmbeddingConfig(
+        backend=os.getenv(prefix + "BACKEND", defaults.backend).lower(),
+        threads=int(os.getenv(prefix + "THREADS", defaults.threads)),
+        onnx_dir=os.getenv(prefix + "ONNX_DIR", defaults.onnx_dir),
+    )
+    if config.backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{config.backend}'; expected one of {', '.join(EMBEDDING_BACKENDS)}.")
+    return config
+
+
+def embedder_id(model_name: str, config: EmbeddingConfig) -> str:
+    """Names the model and backend; vectors from different ids are not interchangeable."""
+    return model_name if config.backend == "torch" else f"{model_name}#{config.backend}"
+
+
+def onnx_model_path(model_name: str, config: EmbeddingConfig) -> str:
+    directory = os.path.join(config.onnx_dir, re.sub(r"[^\w.-]+", "_", model_name))
+    return os.path.join(directory, "model.int8.onnx" if config.backend == "onnx-int8" else "model.onnx")
+
+
+def export_onnx(model_name: str, config: EmbeddingConfig) -> str:
+    """Exports (and for ``onnx-int8`` quantizes) the model unless already done; returns the .onnx path."""
+    path = onnx_model_path(model_name, config)
+    directory = os.path.dirname(path)
+    fp32_path = os.path.join(directory, "model.onnx")
+    if not os.path.exists(fp32_path):
+        _export_fp32(model_name, directory, fp32_path)
+    if path != fp32_path and not os.path.exists(path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logging.info(f"Quantizing '{fp32_path}' to int8...")
+        quantize_dynamic(fp32_path, path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def _export_fp32(model_name: str, directory: str, path: str) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    modules = list(model)
+    pooling = next((m for m in modules if type(m).__name__ == "Pooling"), None)
+    settings = pooling.get_config_dict() if pooling is not None else {}
+    # sentence-transformers 2.x-5.x store flags, newer versions a single pooling_mode
+    mode = settings.get("pooling_mode") or ("mean" if settings.get("pooling_mode_mean_tokens")
+                                            else "cls" if settings.get("pooling_mode_cls_token") else None)
+    if mode not in ("mean", "cls"):
+        raise ValueError(f"ONNX export supports mean or CLS pooling only; '{model_name}' uses {mode}.")
+    mean = mode == "mean"
+    normalize = any(type(m).__name__ == "Normalize" for m in modules)
+    transformer = modules[0].auto_model.eval()
+
+    class SentenceEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            tokens = self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                      token_type_ids=token_type_ids)[0]
+            if mean:
+                mask = attention_mask.unsqueeze(-1).to(tokens.dtype)
+                pooled = (tokens * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            else:
+                pooled = tokens[:, 0]
+            return torch.nn.functional.normalize(pooled, p=2, dim=1) if normalize else pooled
+
+    os.makedirs(directory, exist_ok=True)
+    sample = model.tokenizer(["export"], return_tensors="pt")
+    inputs = (sample["input_ids"], sample["attention_mask"],
+              sample.get("token_type_ids", torch.zeros_like(sample["input_ids"])))
+    axes = {0: "batch", 1: "sequence"}
+    logging.info(f"Exporting '{model_name}' to ONNX at '{path}'...")
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEncoder(), inputs, path + ".tmp",
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["sentence_embedding"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                          "sentence_embedding": {0: "batch"}},
+            opset_version=17, dynamo=False,
+        )
+    model.tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, ONNX_META_FILE), "w") as f:
+        json.dump({
+            "model": model_name,
+            "max_seq_length": model.max_seq_length,
+            "dimension": int(model.encode(["export"], convert_to_numpy=True).shape[1]),
+        }, f)
+    os.replace(path + ".tmp", path)
+
+
+class OnnxEmbedder:
+    """SentenceTransformer-compatible ``encode`` running an exported model on onnxruntime."""
+
+    def __init__(self, path: str, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        directory = os.path.dirname(path)
+        with open(os.path.join(directory, ONNX_META_FILE), "r") as f:
+            meta = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.max_seq_length = meta["max_seq_length"]
+        self.dimension = meta["dimension"]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts: List[str] = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        # Longest first, like SentenceTransformer, so each batch pads to similar lengths.
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            encoded = self.tokenizer([texts[i] for i in rows], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: np.asarray(value, dtype=np.int64) for name, value in encoded.items()
+                     if name in self._input_names}
+            if "token_type_ids" in self._input_names and "token_type_ids" not in feeds:
+                feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+            embeddings[rows] = self.session.run(None, feeds)[0]
+        return embeddings[0] if single else embeddings
+
+
+def load_embedder(model_name: str, config: EmbeddingConfig = EmbeddingConfig()):
+    """Returns a SentenceTransformer or an ``OnnxEmbedder`` according to ``config``."""
+    if config.backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        if config.threads:
+            import torch
+            torch.set_num_threads(config.threads)
+        return SentenceTransformer(model_name)
+    if config.backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(export_onnx(model_name, config), config.threads)
+    raise ValueError(f"Unknown embedding backend '{config.backend}'; expected one of {', '.join(EMBEDDING_BACKENDS)}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS[1:], default="onnx-int8")
+    parser.add_argument("--onnx-dir", default=EmbeddingConfig().onnx_dir)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(export_onnx(args.model, EmbeddingConfig(backend=args.backend, onnx_dir=args.onnx_dir)))
+
+
+if __name__ == "__main__":
+    main()
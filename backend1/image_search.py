@@ -0,0 +1,218 @@
+import re
+import csv
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import importlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from instrumentation import span
+
+# fetch(prompt, count) -> image URLs; the default scrapes with simple_image_download
+Fetcher = Callable[[str, int], List[str]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case, punctuation and spacing do not change the images found."""
+    return " ".join(re.findall(r"[\w'-]+", prompt.lower()))
+
+
+def scrape_image_urls(prompt: str, count: int) -> List[str]:
+    # Imported on first use; the scraper is not needed to serve anything else
+    from simple_image_download import simple_image_download as simp
+    results = simp.simple_image_download().urls(prompt, count)
+    if isinstance(results, list):
+        return results
+    if isinstance(results, dict):
+        # Use the first key's list of URLs
+        return next(iter(results.values()), [])
+    raise ValueError("No images found")
+
+
+def load_fetcher(spec: Optional[str]) -> Fetcher:
+    """Resolves a ``module:function`` fetcher, e.g. a local stub; the scraper when empty."""
+    if not spec:
+        return scrape_image_urls
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name or "fetch")
+
+
+class ImageURLCache:
+    """Prompt -> image URLs in SQLite, kept for ``ttl`` seconds.
+
+    Beyond ``max_entries`` the least recently used prompts are evicted.
+    ``path`` may be ":memory:" for a per-process cache.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl: float = 7 * 24 * 3600.0, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS image_urls ("
+            "prompt TEXT PRIMARY KEY, urls TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS image_urls_last_used ON image_urls (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls FROM image_urls WHERE prompt = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE image_urls SET last_used = ? WHERE prompt = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM image_urls WHERE prompt = ? AND created >= ?", (key, time.time() - self.ttl)
+            ).fetchone() is not None
+
+    def put(self, key: str, urls: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_urls (prompt, urls, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(urls), now, now),
+            )
+            self._conn.execute("DELETE FROM image_urls WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM image_urls WHERE prompt NOT IN "
+                "(SELECT prompt FROM image_urls ORDER BY last_used DESC LIMIT ?)", (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM image_urls").fetchone()[0]
+
+
+class ImageSearcher:
+    """Cached, coalesced image-URL lookups.
+
+    Fetches run on a small thread pool, never on the caller's thread or
+    event loop. Concurrent requests for the same (normalized) prompt share
+    one fetch; results are cached, empty ones are not. A caller gives up
+    after ``timeout`` seconds, but the fetch itself finishes and is cached
+    for the next request.
+    """
+
+    def __init__(self, fetch: Fetcher, cache: ImageURLCache, timeout: float = 10.0, max_workers: int = 4):
+        self.fetch = fetch
+        self.cache = cache
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="image-fetch")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._prefetch_thread = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def submit(self, prompt: str, count: int) -> Future:
+        """Returns a future of the URLs for ``prompt``, starting a fetch only if none is running."""
+        key = f"{count}:{normalize_prompt(prompt)}"
+        urls = self.cache.get(key)
+        with self._lock:
+            if urls is not None:
+                self.hits += 1
+                future = Future()
+                future.set_result(urls)
+                return future
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            self.misses += 1
+            future = self._inflight[key] = Future()
+        self._executor.submit(self._run, key, prompt, count, future)
+        return future
+
+    def _run(self, key: str, prompt: str, count: int, future: Future) -> None:
+        try:
+            with span("image_fetch"):
+                urls = list(self.fetch(prompt, count) or [])
+            if urls:
+                self.cache.put(key, urls)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(urls)
+
+    def search(self, prompt: str, count: int) -> List[str]:
+        """Blocks for at most ``timeout`` seconds; raises TimeoutError after that."""
+        return self.submit(prompt, count).result(self.timeout)
+
+    async def asearch(self, prompt: str, count: int) -> List[str]:
+        """Awaits the URLs without blocking the event loop; raises TimeoutError after ``timeout`` seconds."""
+        # submit reads the SQLite cache, so it runs on the executor, not on the event loop
+        future = await asyncio.get_running_loop().run_in_executor(None, self.submit, prompt, count)
+        # shield: a caller timing out must not cancel the fetch other callers share
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+
+    def prefetch(self, prompts: Iterable[str], count: int) -> None:
+        """Warms the cache for ``prompts`` one at a time on a background thread."""
+        def run():
+            fetched = 0
+            try:
+                for prompt in prompts:
+                    if f"{count}:{normalize_prompt(prompt)}" in self.cache:
+                        continue
+                    try:
+                        # A hung scrape costs at most ``timeout``; it is cached if it finishes later
+                        self.submit(prompt, count).result(self.timeout)
+                        fetched += 1
+                    except Exception as e:
+                        logging.warning(f"Prefetching images for '{prompt}' failed: {e!r}")
+                logging.info(f"Prefetched images for {fetched} prompts.")
+            finally:
+                self._prefetch_thread = None
+
+        if self._prefetch_thread is None:
+            self._prefetch_thread = threading.Thread(target=run, name="image-prefetch", daemon=True)
+            self._prefetch_thread.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "inflight": len(self._inflight),
+                "size": len(self.cache),
+            }
+
+
+def common_asana_prompts(csv_path: str, limit: int) -> List[str]:
+    """Image prompts for the asanas recommended for the most diseases in the catalog CSV."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    scored = []
+    for row in rows:
+        name = (row.get("Asana Name") or "").strip()
+        diseases = sum(1 for column, value in row.items()
+                       if column and column.startswith("Disease") and value and value.strip().lower() != "null")
+        if name:
+            scored.append((-diseases, name))
+    names = list(dict.fromkeys(name for _, name in sorted(scored)))
+    return [f"{name} yoga pose" for name in names[:limit]]
@@ -0,0 +1,149 @@
+import os
+import json
+import logging
+from typing import NamedTuple
+
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+
+class IndexConfig(NamedTuple):
+    """How to build and search a FAISS index.
+
+    ``nlist``/``nprobe`` apply to the IVF variants, ``pq_m``/``pq_nbits`` to
+    IVF-PQ and ``hnsw_m``/``ef_construction``/``ef_search`` to HNSW.
+    """
+    kind: str = "flat"
+    nlist: int = 64
+    nprobe: int = 8
+    pq_m: int = 48
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 64
+    ef_search: int = 64
+
+
+# Query-time knobs; changing them never requires rebuilding an index.
+SEARCH_PARAMS = ("nprobe", "ef_search")
+
+
+def build_params(config: IndexConfig) -> dict:
+    """The parts of ``config`` that shape the stored index."""
+    return {k: v for k, v in config._asdict().items() if k not in SEARCH_PARAMS}
+
+
+def index_config_from_env(prefix: str = "CHAT_INDEX_") -> IndexConfig:
+    """Reads an ``IndexConfig`` from CHAT_INDEX_TYPE, CHAT_INDEX_NLIST, ... variables."""
+    defaults = IndexConfig()
+    values = {"kind": os.getenv(prefix + "TYPE", defaults.kind).lower()}
+    for field in IndexConfig._fields[1:]:
+        values[field] = int(os.getenv(prefix + field.upper(), getattr(defaults, field)))
+    if values["kind"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{values['kind']}'; expected one of {', '.join(INDEX_TYPES)}.")
+    return IndexConfig(**values)
+
+
+def tune_index(index: faiss.Index, config: IndexConfig) -> faiss.Index:
+    """Applies the query-time knobs (nprobe / efSearch) to a built or loaded index."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = config.ef_search
+    else:
+        try:
+            faiss.extract_index_ivf(index).nprobe = config.nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+    return index
+
+
+def needs_training(config: IndexConfig) -> bool:
+    return config.kind in ("ivf_flat", "ivf_pq")
+
+
+def create_index(d: int, config: IndexConfig, train_count: int) -> faiss.Index:
+    """Creates an empty index of the configured kind, sized for ``train_count`` training vectors."""
+    # k-means wants roughly 39 training points per centroid; shrink nlist for small corpora.
+    nlist = max(1, min(config.nlist, train_count // 39))
+
+    if config.kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif config.kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, nlist, faiss.METRIC_L2)
+    elif config.kind == "ivf_pq":
+        if d % config.pq_m:
+            raise ValueError(f"pq_m={config.pq_m} must divide the embedding dimension {d}.")
+        nbits = min(config.pq_nbits, max(1, int(np.log2(max(2, train_count)))))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(d), d, nlist, config.pq_m, nbits)
+    elif config.kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+    else:
+        raise ValueError(f"Unknown index type '{config.kind}'; expected one of {', '.join(INDEX_TYPES)}.")
+    return index
+
+
+def build_index(embeddings: np.ndarray, config: IndexConfig = IndexConfig(), ids: np.ndarray = None) -> faiss.Index:
+    """Creates, trains and fills an index of the configured kind.
+
+    With ``ids`` searches return those IDs instead of row positions. IVF
+    indexes keep them in their inverted lists; the others are wrapped in an
+    ``IndexIDMap2``.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    count, d = embeddings.shape
+    index = create_index(d, config, count)
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        # An ID map over IVF breaks on remove_ids: the map is compacted but the
+        # inverted lists keep the old positions, shifting every later ID.
+        if not isinstance(index, faiss.IndexIVF):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    logging.info(f"Built FAISS {config.kind} index with {index.ntotal} vectors (d={d}).")
+    return tune_index(index, config)
+
+
+def save_index(index: faiss.Index, path: str, config: IndexConfig, **meta) -> None:
+    """Writes the index in FAISS's native format plus a JSON sidecar with its config."""
+    faiss.write_index(index, path + ".tmp")
+    with open(path + ".json.tmp", "w") as f:
+        json.dump({"config": config._asdict(), **meta}, f)
+    os.replace(path + ".tmp", path)
+    os.replace(path + ".json.tmp", path + ".json")
+
+
+def read_index_meta(path: str) -> dict:
+    with open(path + ".json", "r") as f:
+        return json.load(f)
+
+
+# Map flat codes and IVF inverted lists straight from the file instead of copying them.
+MMAP_FLAGS = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """Reads a native FAISS index memory-mapped, falling back to a regular read.
+
+    Mapped pages live in the OS page cache, so several workers loading the
+    same file share one copy of the vectors.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"FAISS index file '{path}' is missing.")
+    try:
+        return faiss.read_index(path, MMAP_FLAGS)
+    except RuntimeError as e:
+        logging.info(f"Memory-mapped read of '{path}' failed ({e}); reading it into memory.")
+        return faiss.read_index(path)
+
+
+def load_index(path: str, config: IndexConfig = None) -> faiss.Index:
+    """Reads an index written by ``save_index`` and re-applies its search settings."""
+    index = read_index_mmap(path)
+    if config is None:
+        config = IndexConfig(**read_index_meta(path)["config"])
+    return tune_index(index, config)
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import logging
+import itertools
+from collections import defaultdict, deque
+from multiprocessing import get_context
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+from chunker import TokenChunker
+from index_factory import IndexConfig, build_index, build_params, needs_training, save_index
+from text_store import TextStore, TextStoreWriter, content_hash
+
+# 2: IVF indexes hold the chunk IDs themselves; older ones are rebuilt
+MANIFEST_VERSION = 2
+
+
+class Page(NamedTuple):
+    source: str
+    number: int  # 0-based page number within ``source``
+    text: str
+
+
+class IngestStats(NamedTuple):
+    documents: int
+    pages: int
+    chunks: int
+    embedded: int
+    removed: int
+    seconds: float
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+def find_pdfs(paths: Iterable[str]) -> List[str]:
+    """Expands directories into the PDFs they contain, in a stable order."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+        elif os.path.exists(path):
+            found.append(path)
+        else:
+            raise FileNotFoundError(f"PDF file '{path}' not found!")
+    return found
+
+
+def page_count(path: str) -> int:
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def extract_pages(task: Tuple[str, int, int]) -> List[Page]:
+    """Extracts pages ``start``..``stop`` of one PDF; runs in a worker process."""
+    import fitz  # PyMuPDF
+    path, start, stop = task
+    pages = []
+    with fitz.open(path) as doc:
+        for number in range(start, stop):
+            text = doc[number].get_text("text")
+            if text.strip():
+                pages.append(Page(path, number, text))
+    return pages
+
+
+def iter_pages(pdf_paths: Sequence[str], workers: int = 1, pages_per_task: int = 16,
+               max_pending: int = 8) -> Iterator[Page]:
+    """Yields the non-empty pages of ``pdf_paths`` in document order.
+
+    With ``workers > 1`` page ranges are extracted by a process pool. At
+    most ``max_pending`` ranges are in flight, so extraction runs ahead of
+    the consumer by a bounded amount instead of buffering whole books.
+    """
+    tasks = (
+        (path, start, min(start + pages_per_task, count))
+        for path in pdf_paths
+        for count in (page_count(path),)
+        for start in range(0, count, pages_per_task)
+    )
+    if workers <= 1:
+        for task in tasks:
+            yield from extract_pages(task)
+        return
+
+    with get_context().Pool(workers) as pool:
+        pending = deque(pool.apply_async(extract_pages, (task,)) for task in itertools.islice(tasks, max_pending))
+        while pending:
+            pages = pending.popleft().get()
+            for task in itertools.islice(tasks, 1):
+                pending.append(pool.apply_async(extract_pages, (task,)))
+            yield from pages
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IncrementalIndex:
+    """Maintains an ID-mapped index batch by batch.
+
+    A new index collects the first ``train_size`` vectors to train IVF
+    variants before anything is added; an existing one is extended in place.
+    """
+
+    def __init__(self, config: IndexConfig, train_size: int = 10000, index: faiss.Index = None):
+        self.config = config
+        self.train_size = train_size
+        self.index = index
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    def add(self, embeddings: np.ndarray, ids: Sequence[int]) -> None:
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        ids = np.asarray(ids, dtype="int64")
+        if self.index is not None:
+            self.index.add_with_ids(embeddings, ids)
+            return
+        self._pending.append((embeddings, ids))
+        if not needs_training(self.config) or sum(len(e) for e, _ in self._pending) >= self.train_size:
+            self._create()
+
+    def remove(self, ids: Sequence[int]) -> None:
+        ids = np.asarray(ids, dtype="int64")
+        if self.index is None:
+            filtered = []
+            for embeddings, pending_ids in self._pending:
+                keep = ~np.isin(pending_ids, ids)
+                filtered.append((embeddings[keep], pending_ids[keep]))
+            self._pending = filtered
+            return
+        try:
+            self.index.remove_ids(ids)
+        except RuntimeError:
+            # HNSW cannot delete; rebuild the graph from the stored vectors (no re-embedding).
+            base = faiss.downcast_index(self.index.index)
+            vectors = base.reconstruct_n(0, base.ntotal)
+            current = faiss.vector_to_array(self.index.id_map)
+            keep = ~np.isin(current, ids)
+            self.index = None
+            self._pending = [(vectors[keep], current[keep])]
+            self._create()
+
+    def _create(self) -> None:
+        embeddings = np.concatenate([e for e, _ in self._pending])
+        ids = np.concatenate([i for _, i in self._pending])
+        self._pending = []
+        self.index = build_index(embeddings, self.config, ids=ids)
+
+    def finish(self) -> faiss.Index:
+        if self.index is None:
+            if not self._pending:
+                raise ValueError("No text data to process.")
+            self._create()
+        return self.index
+
+
+def manifest_path(index_path: str) -> str:
+    return index_path + ".manifest.json"
+
+
+def load_manifest(index_path: str, data_path: str, model_name: str, config: IndexConfig,
+                  chunking: Optional[dict] = None) -> Optional[dict]:
+    """Returns the manifest of the previous run if its artifacts can be updated in place."""
+    try:
+        with open(manifest_path(index_path), "r") as f:
+            manifest = json.load(f)
+        if (manifest.get("version") != MANIFEST_VERSION or manifest.get("model") != model_name
+                or manifest.get("build") != build_params(config) or manifest.get("chunking") != chunking):
+            return None
+        if len(TextStore(data_path)) != manifest["next_id"]:
+            return None
+    except (OSError, ValueError, KeyError) as e:
+        logging.info(f"No usable manifest ({e}); rebuilding from scratch.")
+        return None
+    return manifest
+
+
+def load_previous_index(index_path: str) -> Optional[faiss.Index]:
+    """Returns the index the manifest describes, or None if it is missing or unreadable."""
+    try:
+        return faiss.read_index(index_path)
+    except RuntimeError as e:
+        logging.warning(f"Could not read the previous index ({e}); rebuilding from scratch.")
+        return None
+
+
+def save_manifest(index_path: str, manifest: dict) -> None:
+    path = manifest_path(index_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def ingest(pdf_paths: Sequence[str], encode: Callable[[List[str]], np.ndarray], index_path: str, data_path: str,
+           config: IndexConfig = IndexConfig(), model_name: str = "", chunker: TokenChunker = None,
+           full: bool = False, workers: int = 1,
+           batch_size: int = 64, max_pending: int = 8, train_size: int = 10000,
+           report_every: float = 5.0) -> IngestStats:
+    """Streams PDF pages through extraction, batched embedding and the index.
+
+    ``encode`` maps a list of texts to a float32 matrix. A manifest next to
+    the index records every page's content hash and the chunk IDs it
+    produced. Unless ``full`` is set, pages whose hash is already in the
+    manifest keep their IDs and vectors, only new or changed pages are
+    embedded, and the vectors of pages that disappeared are removed. Chunk
+    IDs are positions in the text store; removed ones are left empty. Pages
+    are split by ``chunker`` if given, otherwise each page is one chunk.
+    """
+    start = last_report = time.perf_counter()
+    chunking = chunker.params if chunker is not None else None
+    chunk_pages = chunker.chunk_many if chunker is not None else (lambda texts: [[text] for text in texts])
+    manifest = None if full else load_manifest(index_path, data_path, model_name, config, chunking)
+    index = None if manifest is None else load_previous_index(index_path)
+    if index is None:
+        manifest = None
+    available = defaultdict(list)
+    if manifest is None:
+        builder, previous, next_id = IncrementalIndex(config, train_size), None, 0
+    else:
+        builder = IncrementalIndex(config, train_size, index)
+        previous, next_id = TextStore(data_path), manifest["next_id"]
+        for entries in manifest["documents"].values():
+            for _, digest, ids in entries:
+                available[digest].append(ids)
+
+    documents, kept = {}, set()
+    pages = chunks = embedded = 0
+
+    def report(label: str) -> None:
+        elapsed = time.perf_counter() - start
+        logging.info(f"{label}: {pages} pages ({pages / elapsed:.1f} pages/s), {chunks} chunks "
+                     f"({chunks / elapsed:.1f} chunks/s), {embedded} embedded")
+
+    with TextStoreWriter(data_path + ".new") as fresh:
+        for batch in batched(iter_pages(pdf_paths, workers=workers, max_pending=max_pending), batch_size):
+            assigned = []
+            for page in batch:
+                digest = content_hash(page.text)
+                page_ids = available[digest].pop() if available[digest] else None
+                if page_ids is not None:
+                    kept.update(page_ids)
+                assigned.append((page, digest, page_ids))
+            new_chunks = iter(chunk_pages([page.text for page, _, page_ids in assigned if page_ids is None]))
+
+            texts, ids = [], []
+            for page, digest, page_ids in assigned:
+                if page_ids is None:
+                    page_texts = next(new_chunks)
+                    page_ids = list(range(next_id, next_id + len(page_texts)))
+                    next_id += len(page_texts)
+                    texts.extend(page_texts)
+                    ids.extend(page_ids)
+                documents.setdefault(page.source, []).append([page.number, digest, page_ids])
+                chunks += len(page_ids)
+            if texts:
+                builder.add(encode(texts), ids)
+                for text in texts:
+                    fresh.append(text)
+                embedded += len(texts)
+            pages += len(batch)
+            if time.perf_counter() - last_report >= report_every:
+                last_report = time.perf_counter()
+                report("Ingesting")
+    if not chunks:
+        os.remove(fresh.path)
+        raise ValueError("Extracted text is empty. Please check the PDF content.")
+
+    removed = [i for leftovers in available.values() for page_ids in leftovers for i in page_ids]
+    if embedded or removed or manifest is None:
+        if removed:
+            builder.remove(removed)
+        index = builder.finish()
+        with TextStoreWriter(data_path) as writer:
+            for i in range(len(previous) if previous is not None else 0):
+                writer.append(previous[i] if i in kept else "")
+            for text in TextStore(fresh.path):
+                writer.append(text)
+        save_index(index, index_path, config, count=index.ntotal)
+    os.remove(fresh.path)
+    save_manifest(index_path, {
+        "version": MANIFEST_VERSION,
+        "model": model_name,
+        "build": build_params(config),
+        "chunking": chunking,
+        "next_id": next_id,
+        "documents": documents,
+    })
+
+    report("Done")
+    return IngestStats(len(pdf_paths), pages, chunks, embedded, len(removed), time.perf_counter() - start)
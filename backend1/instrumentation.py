@@ -0,0 +1,274 @@
+"""Prometheus-format metrics shared by the FastAPI and Flask services.
+
+Set ``METRICS_ENABLED=1`` to record them. Each service then times every
+request (``http_request_duration_seconds`` by method, route template and
+status, plus ``http_requests_in_flight``), times the hot-path stages
+wrapped in ``span`` (``stage_duration_seconds`` and
+``stage_errors_total`` by stage), and serves all of it, together with the
+``stats()`` of its caches and pools, as text on ``GET /metrics``.
+
+When it is off, ``span`` returns one shared no-op context manager, the
+request middleware is not installed and ``/metrics`` is not routed, so the
+hot paths pay a single flag check.
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+ENABLED = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes", "on")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                    for labels, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Per label set: a count per bucket, the sum and the count of observations."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(counts), total, count)
+                        for labels, (counts, total, count) in sorted(self._values.items())]
+        lines = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def _flatten_stats(prefix: str, stats: dict) -> Iterable[Tuple[str, str, float]]:
+    """(name, labels, value) per numeric entry; one level of nested dicts becomes a ``key`` label."""
+    for name, value in stats.items():
+        if isinstance(value, bool):
+            yield f"{prefix}_{name}", "", float(value)
+        elif isinstance(value, (int, float)):
+            yield f"{prefix}_{name}", "", value
+        elif isinstance(value, dict):
+            for key, inner in value.items():
+                if isinstance(inner, (int, float)):
+                    yield f"{prefix}_{name}", _labels(("key",), (key,)), float(inner)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._stats: List[Tuple[str, Callable[[], dict]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, stats: Callable[[], dict]) -> None:
+        """Exports the numeric entries of ``stats()`` as ``<prefix>_<key>`` on every scrape."""
+        self._stats.append((prefix, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats in self._stats:
+            try:
+                samples = list(_flatten_stats(prefix, stats()))
+            except Exception as e:
+                logging.warning(f"Could not collect {prefix} stats: {e}")
+                continue
+            typed = set()
+            for name, labels, value in samples:
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} untyped")
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to answer HTTP requests.", ("method", "route", "status")))
+REQUESTS_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests being answered."))
+STAGE_SECONDS = registry.register(Histogram("stage_duration_seconds", "Time spent in each hot-path stage.", ("stage",)))
+STAGE_ERRORS = registry.register(Counter("stage_errors_total", "Hot-path stages that raised.", ("stage",)))
+register_stats = registry.register_stats
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.started, self.stage)
+        # Cancellations and closed generators are not errors of the stage
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(self.stage)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(stage: str):
+    """Times the enclosed block as ``stage``; usable with ``with`` and ``async with``."""
+    return _Span(stage) if ENABLED else _NO_SPAN
+
+
+def _route_label(path) -> str:
+    # Route templates, not raw paths, keep the number of series bounded
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the duration, route and status of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            route = _route_label(getattr(scope.get("route"), "path", None))
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], route, str(status[0]))
+
+
+def instrument_fastapi(app) -> None:
+    """Installs the request middleware and ``GET /metrics`` when metrics are enabled."""
+    if not ENABLED:
+        return
+    from starlette.responses import Response
+
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", lambda: Response(registry.render(), media_type=CONTENT_TYPE),
+                      methods=["GET"], include_in_schema=False)
+
+
+def instrument_flask(app) -> None:
+    """Flask counterpart of ``instrument_fastapi``."""
+    if not ENABLED:
+        return
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe(exc):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        route = _route_label(request.url_rule.rule if request.url_rule else None)
+        status = g.pop("metrics_status", 500)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, str(status))
+
+    app.add_url_rule("/metrics", "metrics", lambda: Response(registry.render(), content_type=CONTENT_TYPE))
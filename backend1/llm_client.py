@@ -0,0 +1,244 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import span
+
+# Statuses worth retrying: rate limiting, model loading and gateway hiccups
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The inference API answered with an error or an unexpected payload."""
+
+
+class LLMConnectionError(LLMError):
+    """The inference API could not be reached after all retries."""
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """The delay asked for by a ``Retry-After: <seconds>`` header, if any (HTTP dates are ignored)."""
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def retry_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Honors the server's ``Retry-After`` (up to ``cap``), else backs off exponentially."""
+    if retry_after is not None:
+        return min(cap, retry_after)
+    return backoff_delay(attempt, base, cap)
+
+
+def parse_generated_text(response) -> str:
+    try:
+        result = response.json()
+    except ValueError as e:
+        raise LLMError(f"Inference API returned invalid JSON: {e}") from e
+    if isinstance(result, list) and result and "generated_text" in result[0]:
+        return result[0]["generated_text"].strip()
+    raise LLMError(f"Unexpected inference API response: {result!r}")
+
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """Returns the token text carried by one server-sent event line, if any."""
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if not data or data == "[DONE]":
+        return None
+    event = json.loads(data)
+    token = event.get("token") or {}
+    if token.get("special"):
+        return None
+    return token.get("text") or None
+
+
+class AsyncLLMClient:
+    """Async client for the Hugging Face text-generation inference API.
+
+    All requests share one pooled ``httpx.AsyncClient``, at most
+    ``max_concurrency`` generations run at once, and retryable failures are
+    retried after the server's ``Retry-After`` or with jittered exponential
+    backoff.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        parameters: Optional[dict] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        timeout: float = 30.0,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+    ):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.parameters = parameters
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Created lazily so both are bound to the server's running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
+        payload = {"inputs": prompt}
+        if self.parameters:
+            payload["parameters"] = self.parameters
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def _retry_wait(self, attempt: int, reason, retry_after: Optional[float] = None) -> None:
+        delay = retry_delay(attempt, self.backoff_base, self.backoff_cap, retry_after)
+        logging.warning(f"Inference API attempt {attempt + 1} failed ({reason}); retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def generate(self, prompt: str) -> str:
+        client = self._get_client()
+        payload = self._payload(prompt)
+        async with self._semaphore, span("llm"):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await client.post(self.api_url, json=payload)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise LLMConnectionError(str(e)) from e
+                    await self._retry_wait(attempt, e)
+                    continue
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    await self._retry_wait(attempt, response.status_code, retry_after_seconds(response.headers))
+                    continue
+                if response.status_code != 200:
+                    raise LLMError(f"Inference API response error: {response.status_code} {response.text}")
+                return parse_generated_text(response)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yields generated tokens as they arrive.
+
+        Retries only happen before the first token, so a caller never sees
+        duplicated output.
+        """
+        client = self._get_client()
+        payload = self._payload(prompt, stream=True)
+        async with self._semaphore, span("llm"):
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    async with client.stream("POST", self.api_url, json=payload) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                            reason = response.status_code
+                            retry_after = retry_after_seconds(response.headers)
+                        elif response.status_code != 200:
+                            body = await response.aread()
+                            raise LLMError(f"Inference API response error: {response.status_code} {body!r}")
+                        else:
+                            async for line in response.aiter_lines():
+                                token = parse_stream_line(line)
+                                if token:
+                                    yield token
+                            return
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise LLMConnectionError(str(e)) from e
+                    reason = e
+                await self._retry_wait(attempt, reason, retry_after)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LLMClient:
+    """Blocking counterpart of ``AsyncLLMClient`` for the Flask chatbot.
+
+    Uses one pooled ``requests.Session`` with the same concurrency limit and
+    retry policy.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        parameters: Optional[dict] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 3,
+        timeout: float = 15.0,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+    ):
+        self.api_url = api_url
+        self.parameters = parameters
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def generate(self, prompt: str) -> str:
+        payload = {"inputs": prompt}
+        if self.parameters:
+            payload["parameters"] = self.parameters
+        with self._semaphore, span("llm"):
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+                except requests.exceptions.RequestException as e:
+                    if attempt == self.max_retries:
+                        raise LLMConnectionError(str(e)) from e
+                    reason = e
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        if response.status_code != 200:
+                            raise LLMError(f"Inference API response error: {response.status_code} {response.text}")
+                        return parse_generated_text(response)
+                    reason = response.status_code
+                    retry_after = retry_after_seconds(response.headers)
+                delay = retry_delay(attempt, self.backoff_base, self.backoff_cap, retry_after)
+                logging.warning(f"Inference API attempt {attempt + 1} failed ({reason}); retrying in {delay:.2f}s")
+                time.sleep(delay)
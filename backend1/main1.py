@@ -1,20 +1,29 @@
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"  # Disable parallelism to avoid tokenizers warnings
+import json
+import asyncio
 import logging
-import pickle
-import gzip
 import numpy as np
-import faiss
 from fastapi import FastAPI, HTTPException, Depends, status, Query, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, Column, String, Integer
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from simple_image_download import simple_image_download as simp
-from sentence_transformers import SentenceTransformer
-from langchain.llms import HuggingFaceHub
-from typing import List
+from sqlalchemy.orm import sessionmaker
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+
+from chat_index import ChatIndex
+from embedding import embedding_config_from_env
+from image_search import ImageSearcher, ImageURLCache, common_asana_prompts, load_fetcher
+from index_factory import index_config_from_env
+from instrumentation import instrument_fastapi, register_stats, span
+from llm_client import AsyncLLMClient
+from principal_cache import cached_user_lookup, principal_cache_from_env
+from query_batcher import QueryBatcher, SearchResult, batched_search
+from response_cache import SemanticResponseCache, context_key
+from warmup import Warmup, startup_mode_from_env
 
 # Load environment variables
 load_dotenv()
@@ -44,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# METRICS_ENABLED=1 times requests and hot-path stages and serves them on GET /metrics
+instrument_fastapi(app)
+
 # Authentication Setup (Simplified)
 DATABASE_URL = "sqlite:///./users.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
@@ -66,22 +78,26 @@ def get_db():
 from jose import JWTError, jwt
 from jose.exceptions import ExpiredSignatureError
 
-async def get_current_user(
+principal_cache = principal_cache_from_env()
+user_exists = cached_user_lookup(principal_cache, UserModel, SessionLocal)
+
+# A plain def: FastAPI runs it in the threadpool, so a principal cache miss
+# queries users.db without blocking the event loop
+def get_current_user(
     token: str = Query(None, description="JWT token as query parameter"),
     authorization: str = Header(None),
-    db: Session = Depends(get_db)
 ):
     if token is None and authorization:
         token = authorization.split("Bearer ")[-1].strip()
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("jwt_decode"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
-        db_user = db.query(UserModel).filter(UserModel.username == username).first()
-        if db_user is None:
+        if not user_exists(username):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     except ExpiredSignatureError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is expired")
@@ -92,84 +108,131 @@ async def get_current_user(
 # -------------------------------
 # FAISS & Text Data Setup
 # -------------------------------
-INDEX_PATH = "faiss_index.pkl"  
-DATA_PATH = "text_data.pkl.gz"
+DATA_PATH = "text_data.store"
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", "index_cache")
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 RELEVANCE_THRESHOLD = 1.0
 TOP_K = 3
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
-# Global Variables
-_index = None
-_text_data = None
-_model = None
+# Built once and kept resident; embeddings and the index are cached under INDEX_CACHE_DIR.
+# CHAT_INDEX_TYPE selects flat, ivf_flat, ivf_pq or hnsw (see index_factory.py).
+# EMBEDDING_BACKEND selects torch, onnx or onnx-int8 (see embedding.py).
+chat_index = ChatIndex(DATA_PATH, INDEX_CACHE_DIR, EMBEDDING_MODEL, index_config=index_config_from_env(),
+                       embedding_config=embedding_config_from_env())
+
+# STARTUP_MODE=background (default) loads the model and index on a thread after startup,
+# so the root and health endpoints answer at once; eager blocks startup until they are
+# loaded, lazy leaves them to the first query. /ready reports their state.
+warmup = Warmup(startup_mode_from_env())
+warmup.register("chat_index", chat_index.get, lambda: chat_index.loaded)
 
 def load_model_and_index():
-    """Loads the Sentence Transformer model, text data, and builds a new FAISS index using IndexFlatL2."""
-    global _model, _index, _text_data
-
-    if _model is None:
-        _model = SentenceTransformer(EMBEDDING_MODEL)
-
-    # Load compressed text data (assumed to be a list of strings)
-    if os.path.exists(DATA_PATH):
-        logging.info("Loading compressed text data...")
-        with gzip.open(DATA_PATH, "rb") as f:
-            _text_data = pickle.load(f)
-        logging.info(f"Loaded {len(_text_data)} text entries successfully.")
-    else:
-        raise FileNotFoundError(f"Text data file '{DATA_PATH}' is missing.")
+    """Returns the resident Sentence Transformer model, FAISS index and text data."""
+    snapshot = chat_index.get()
+    return snapshot.model, snapshot.index, snapshot.text_data
 
-    # Compute the embedding dimension from a sample
-    sample_embedding = _model.encode(["sample"], convert_to_numpy=True)
-    d = sample_embedding.shape[1]
-    # Create a new FAISS index using IndexFlatL2 (which doesn't require training)
-    _index = faiss.IndexFlatL2(d)
-    logging.info(f"Created FAISS IndexFlatL2 with dimension {d}.")
+class RetrievedContext(NamedTuple):
+    embedding: Optional[np.ndarray]
+    ids: List[int]
+    texts: List[str]
+    cache_key: str
 
-    # Compute embeddings for all text entries and add them to the index
-    embeddings = _model.encode(_text_data, convert_to_numpy=True)
-    _index.add(embeddings)
-    logging.info("FAISS IndexFlatL2 populated with text data embeddings.")
+def search_batch(queries: List[str]) -> List[SearchResult]:
+    """Encodes a batch of queries and searches them against the current index in one call."""
+    snapshot = chat_index.get()
 
-    return _model, _index, _text_data
+    def encode(texts):
+        return snapshot.model.encode(texts, convert_to_numpy=True)
 
-def search_similar_text_chat(query: str):
-    """Finds the most similar text to a query using FAISS."""
-    try:
-        model, index, text_data = load_model_and_index()
-    except Exception as e:
-        logging.error(f"Error loading model/index: {e}")
-        return []
+    return batched_search(encode, snapshot.index, TOP_K, context=snapshot)(queries)
 
-    # Encode the query into an embedding vector
-    query_embedding = model.encode([query], convert_to_numpy=True).reshape(1, -1)
+# Concurrent queries are encoded and searched together: a batch closes after
+# EMBED_BATCH_SIZE queries or EMBED_BATCH_WAIT_MS after its first one.
+query_batcher = QueryBatcher(
+    search_batch,
+    max_batch=int(os.getenv("EMBED_BATCH_SIZE", "32")),
+    max_wait=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")) / 1000,
+    timeout=float(os.getenv("EMBED_BATCH_TIMEOUT", "30")),
+)
 
+def retrieve_context(query: str) -> RetrievedContext:
+    """Embeds the query and finds the most similar text entries using FAISS."""
     try:
-        distances, indices = index.search(query_embedding, TOP_K)
-        relevant_texts = [
-            text_data[i] for i, d in zip(indices[0], distances[0]) if d <= RELEVANCE_THRESHOLD
-        ]
-        logging.info(f"Retrieved {len(relevant_texts)} relevant texts for query: {query}")
-        return relevant_texts
+        result = query_batcher.submit(query)
     except Exception as e:
-        logging.error(f"Error in FAISS search: {e}")
-        return []
-
-# Instantiate the model using HuggingFaceHub with the specified parameters
-llm = HuggingFaceHub(
-    repo_id="mistralai/Mistral-7B-Instruct-v0.3",
-    model_kwargs={'temperature': 0.6, 'max_length': 500},
-    huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY")
+        logging.error(f"Error embedding or searching the query: {e}")
+        return RetrievedContext(None, [], [], "")
+
+    snapshot = result.context
+    ids = [int(i) for i, d in zip(result.ids, result.distances) if d <= RELEVANCE_THRESHOLD]
+    relevant_texts = [snapshot.text_data[i] for i in ids]
+    logging.info(f"Retrieved {len(relevant_texts)} relevant texts for query: {query}")
+    return RetrievedContext(result.embedding, ids, relevant_texts, context_key(ids, snapshot.fingerprint))
+
+def search_similar_text_chat(query: str):
+    """Finds the most similar text to a query using FAISS."""
+    return retrieve_context(query).texts
+
+# Answers are reused for near-identical questions that retrieve the same context
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    max_distance=float(os.getenv("RESPONSE_CACHE_DISTANCE", "0.1")),
+    db_path=os.getenv("RESPONSE_CACHE_DB") or None,
 )
 
-def query_chatbot(prompt: str) -> str:
-    """Generates a chatbot response based on retrieved text data."""
-    retrieved_text = search_similar_text_chat(prompt)
-    if not retrieved_text:
-        return "Sorry, no relevant response found. Try specifying the name of a yoga pose."
+# -------------------------------
+# Image Search Setup
+# -------------------------------
+IMAGE_COUNT = 3
+ASANA_CSV_PATH = os.getenv(
+    "ASANA_CSV_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "yoga_asanas_and_diseases.csv"),
+)
+IMAGE_PREFETCH_LIMIT = int(os.getenv("IMAGE_PREFETCH_LIMIT", "50"))
+
+# Scraped URLs are cached per prompt in SQLite (IMAGE_CACHE_DB, ":memory:" for per-process);
+# IMAGE_FETCHER=module:function swaps the scraper for another source such as a local stub.
+image_searcher = ImageSearcher(
+    load_fetcher(os.getenv("IMAGE_FETCHER")),
+    ImageURLCache(
+        os.getenv("IMAGE_CACHE_DB", "image_cache.db"),
+        ttl=float(os.getenv("IMAGE_CACHE_TTL", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("IMAGE_CACHE_SIZE", "5000")),
+    ),
+    timeout=float(os.getenv("IMAGE_FETCH_TIMEOUT", "10")),
+    max_workers=int(os.getenv("IMAGE_FETCH_WORKERS", "4")),
+)
+
+register_stats("principal_cache", principal_cache.stats)
+register_stats("query_batcher", query_batcher.stats)
+register_stats("response_cache", response_cache.stats)
+register_stats("image_searcher", image_searcher.stats)
+register_stats("warmup", lambda: {"ready": warmup.ready})
+
+# -------------------------------
+# LLM Client Setup
+# -------------------------------
+HF_API_URL = os.getenv(
+    "HF_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+)
+NO_CONTEXT_RESPONSE = "Sorry, no relevant response found. Try specifying the name of a yoga pose."
+LLM_ERROR_RESPONSE = "I'm experiencing issues with the chatbot model."
+
+# One pooled connection to the inference API, shared by all requests
+llm_client = AsyncLLMClient(
+    HF_API_URL,
+    api_key=os.getenv("HUGGINGFACE_API_KEY"),
+    parameters={"temperature": 0.6, "max_new_tokens": 500, "return_full_text": False},
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+)
 
+def build_prompt(prompt: str, retrieved_text: List[str]) -> str:
     formatted_context = "\n".join([f"{i+1}. {text}" for i, text in enumerate(retrieved_text)])
-    full_prompt = (
+    return (
         "You are an expert in yoga, health, and wellness. "
         "Use the provided context to answer the user's question clearly and concisely.\n\n"
         f"Context:\n{formatted_context}\n\n"
@@ -177,27 +240,94 @@ def query_chatbot(prompt: str) -> str:
         "Provide a structured response including key points."
     )
 
+def retrieve_cached(prompt: str) -> Tuple[RetrievedContext, Optional[str]]:
+    """Retrieves the context and any cached answer for it (blocking; run it in the threadpool)."""
+    context = retrieve_context(prompt)
+    cached = response_cache.lookup(context.embedding, context.cache_key) if context.texts else None
+    return context, cached
+
+async def query_chatbot(prompt: str) -> str:
+    """Generates a chatbot response based on retrieved text data."""
+    context, cached = await run_in_threadpool(retrieve_cached, prompt)
+    if not context.texts:
+        return NO_CONTEXT_RESPONSE
+    if cached is not None:
+        return cached
+
     try:
-        generated_text = llm(full_prompt)
-        return generated_text if generated_text else "I'm experiencing issues with the chatbot model."
+        generated_text = await llm_client.generate(build_prompt(prompt, context.texts))
+        if not generated_text:
+            return LLM_ERROR_RESPONSE
+        await run_in_threadpool(response_cache.store, context.embedding, context.cache_key, generated_text)
+        return generated_text
     except Exception as e:
-        logging.error(f"HuggingFaceHub query error: {e}")
-        return "I'm experiencing issues with the chatbot model."
+        logging.error(f"Inference API query error: {e}")
+        return LLM_ERROR_RESPONSE
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_chatbot(prompt: str) -> AsyncIterator[str]:
+    """Streams the chatbot response as server-sent events, one per token."""
+    context, cached = await run_in_threadpool(retrieve_cached, prompt)
+    if not context.texts:
+        yield sse_event({"token": NO_CONTEXT_RESPONSE})
+    elif cached is not None:
+        yield sse_event({"token": cached})
+    else:
+        try:
+            tokens = []
+            async for token in llm_client.stream(build_prompt(prompt, context.texts)):
+                tokens.append(token)
+                yield sse_event({"token": token})
+            answer = "".join(tokens).strip()
+            if answer:
+                await run_in_threadpool(response_cache.store, context.embedding, context.cache_key, answer)
+        except Exception as e:
+            logging.error(f"Inference API streaming error: {e}")
+            yield sse_event({"detail": LLM_ERROR_RESPONSE}, event="error")
+    yield sse_event({}, event="end")
 
 # -------------------------------
 # API Endpoints
 # -------------------------------
+@app.on_event("startup")
+def warm_chat_index():
+    """Starts loading the model and chat index (see STARTUP_MODE) and prefetching asana images."""
+    warmup.start()
+    if IMAGE_PREFETCH_LIMIT > 0:
+        try:
+            image_searcher.prefetch(common_asana_prompts(ASANA_CSV_PATH, IMAGE_PREFETCH_LIMIT), IMAGE_COUNT)
+        except OSError as e:
+            logging.error(f"Could not read asana names for image prefetch: {e}")
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_client.aclose()
+
 @app.post("/get_response")
-def get_response(data: dict):
+async def get_response(data: dict):
     """API endpoint to get chatbot responses."""
     if not data or "message" not in data:
         raise HTTPException(status_code=400, detail="Please provide a valid question.")
     user_input = data["message"]
-    bot_response = query_chatbot(prompt=user_input)
+    bot_response = await query_chatbot(prompt=user_input)
     return {"response": bot_response}
 
+@app.post("/get_response/stream")
+async def get_response_stream(data: dict):
+    """Streams the chatbot response token by token as server-sent events."""
+    if not data or "message" not in data:
+        raise HTTPException(status_code=400, detail="Please provide a valid question.")
+    return StreamingResponse(
+        stream_chatbot(data["message"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/search-images", response_model=List[str])
-def search_images(prompt: str, current_user: str = Depends(get_current_user)):
+async def search_images(prompt: str, current_user: str = Depends(get_current_user)):
     allowed_keywords = [
         "yoga", "asana", "pose", "ayurveda", "ayurvedic", "pranayama",
         "surya namaskar", "kapalbhati", "bhastrika", "anulom vilom",
@@ -207,32 +337,60 @@ def search_images(prompt: str, current_user: str = Depends(get_current_user)):
             status_code=400,
             detail="Prompt must include one of the allowed keywords."
         )
-    
+
     try:
-        downloader = simp.simple_image_download()
-        results = downloader.urls(prompt, 3)
-        image_urls = []
-        if isinstance(results, list):
-            image_urls = results
-        elif isinstance(results, dict):
-            # Use the first key's list of URLs
-            for key, urls in results.items():
-                image_urls = urls
-                break
-        else:
-            raise ValueError("No images found")
-        if not image_urls:
-            raise HTTPException(status_code=404, detail="No images found for the prompt")
-        return image_urls
+        image_urls = await image_searcher.asearch(prompt, IMAGE_COUNT)
+    except asyncio.TimeoutError:
+        logging.error(f"Image search for '{prompt}' timed out")
+        raise HTTPException(status_code=504, detail="Image search timed out")
     except Exception as e:
         logging.error("Error searching images: " + str(e))
         raise HTTPException(status_code=500, detail="Error searching images")
+    if not image_urls:
+        raise HTTPException(status_code=404, detail="No images found for the prompt")
+    return image_urls
+
+@app.post("/admin/reindex")
+def admin_reindex(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Reloads the text data and swaps in a fresh index without restarting."""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    try:
+        return chat_index.reindex(force=force)
+    except Exception as e:
+        logging.error(f"Error rebuilding chat index: {e}")
+        raise HTTPException(status_code=500, detail="Error rebuilding chat index")
+
+@app.get("/admin/embedding-stats")
+def admin_embedding_stats(x_admin_token: Optional[str] = Header(None)):
+    """Query batching latency percentiles and latency / batch-size histograms."""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return query_batcher.stats()
+
+@app.get("/admin/image-stats")
+def admin_image_stats(x_admin_token: Optional[str] = Header(None)):
+    """Image URL cache hits, misses, coalesced requests and size."""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return image_searcher.stats()
 
 @app.get("/")
 def read_root():
     """Root endpoint."""
     return {"message": "Welcome to the AyurYoga Backend!"}
 
+@app.get("/health")
+def health():
+    """Liveness probe; answers as soon as the app is up."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness probe; 503 until the embedding model and FAISS index are loaded."""
+    state = warmup.status()
+    return JSONResponse(state, status_code=status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE)
+
 # -------------------------------
 # Main: Running the API with Uvicorn
 # -------------------------------
@@ -0,0 +1,88 @@
+"""Converts pickled chat artifacts to the native formats the services load.
+
+Usage:
+    python migrate_artifacts.py --index faiss_index.pkl --data text_data.pkl.gz
+    python migrate_artifacts.py --data ../text_data.pkl --out-dir ..
+
+A pickled FAISS index becomes a native ``.faiss`` file (read memory-mapped
+with ``faiss.read_index(path, IO_FLAG_MMAP)``) and a pickled list of texts
+becomes a ``.store`` file (see text_store.py). Each output is checked
+against its source before the command reports success; the .pkl files are
+left in place. Only run this on artifacts you produced yourself - loading a
+pickle executes whatever code it contains.
+"""
+import os
+import gzip
+import pickle
+import argparse
+
+import numpy as np
+import faiss
+
+from index_factory import read_index_mmap
+from text_store import TextStore, write_text_store
+
+
+def native_path(path: str, out_dir: str, suffix: str) -> str:
+    name = os.path.basename(path)
+    for ext in (".gz", ".pkl"):
+        if name.endswith(ext):
+            name = name[:-len(ext)]
+    return os.path.join(out_dir or os.path.dirname(path) or ".", name + suffix)
+
+
+def load_pickle(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return pickle.load(f)
+
+
+def migrate_index(path: str, out_dir: str = None) -> str:
+    index = load_pickle(path)
+    if not isinstance(index, faiss.Index):
+        raise ValueError(f"'{path}' does not contain a faiss.Index")
+    target = native_path(path, out_dir, ".faiss")
+    faiss.write_index(index, target + ".tmp")
+    os.replace(target + ".tmp", target)
+
+    migrated = read_index_mmap(target)
+    if migrated.ntotal != index.ntotal or migrated.d != index.d:
+        raise ValueError(f"'{target}' does not match '{path}'")
+    if index.ntotal:
+        probe = np.random.default_rng(0).standard_normal((8, index.d)).astype("float32")
+        if not np.array_equal(index.search(probe, 5)[1], migrated.search(probe, 5)[1]):
+            raise ValueError(f"Search results of '{target}' differ from '{path}'")
+    print(f"{path} -> {target} ({type(index).__name__}, {index.ntotal} vectors)")
+    return target
+
+
+def migrate_text_data(path: str, out_dir: str = None) -> str:
+    texts = load_pickle(path)
+    if not isinstance(texts, (list, tuple)) or not all(isinstance(t, str) for t in texts):
+        raise ValueError(f"'{path}' does not contain a list of strings")
+    target = native_path(path, out_dir, ".store")
+    write_text_store(target, texts)
+
+    if list(TextStore(target)) != list(texts):
+        raise ValueError(f"'{target}' does not match '{path}'")
+    print(f"{path} -> {target} ({len(texts)} entries)")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", nargs="*", default=[], help="Pickled FAISS index files")
+    parser.add_argument("--data", nargs="*", default=[], help="Pickled text data files (.pkl or .pkl.gz)")
+    parser.add_argument("--out-dir", help="Where to write the native files (default: next to each input)")
+    args = parser.parse_args()
+    if not args.index and not args.data:
+        parser.error("nothing to migrate; pass --index and/or --data")
+
+    for path in args.index:
+        migrate_index(path, args.out_dir)
+    for path in args.data:
+        migrate_text_data(path, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
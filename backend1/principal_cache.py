@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from sqlalchemy import event
+
+from instrumentation import span
+
+
+class PrincipalCache:
+    """Bounded LRU of usernames already verified against the database.
+
+    Entries expire after ``ttl`` seconds and are dropped explicitly when a
+    user row is updated or deleted through the ORM (see ``cached_user_lookup``).
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, username: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            verified_at = self._entries.get(username)
+            if verified_at is not None and now - verified_at < self.ttl:
+                self._entries.move_to_end(username)
+                self.hits += 1
+                return True
+            self._entries.pop(username, None)
+            self.misses += 1
+            return False
+
+    def add(self, username: str) -> None:
+        with self._lock:
+            self._entries[username] = time.monotonic()
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+def principal_cache_from_env() -> PrincipalCache:
+    return PrincipalCache(
+        maxsize=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("AUTH_CACHE_TTL", "300")),
+    )
+
+
+def cached_user_lookup(cache: PrincipalCache, user_model, session_factory) -> Callable[[str], bool]:
+    """Returns ``user_exists(username)`` for ``user_model``, answered from ``cache`` when possible.
+
+    Also keeps ``cache`` in step with the ORM: updating any user row clears
+    it and deleting one drops that username.
+    """
+
+    @event.listens_for(user_model, "after_update")
+    def _user_updated(mapper, connection, target):
+        # The username itself may have changed, so drop everything
+        cache.clear()
+
+    @event.listens_for(user_model, "after_delete")
+    def _user_deleted(mapper, connection, target):
+        cache.invalidate(target.username)
+
+    def user_exists(username: str) -> bool:
+        """Checks the principal cache first and only queries users.db on a miss."""
+        if cache.check(username):
+            return True
+        db = session_factory()
+        try:
+            with span("db_lookup"):
+                db_user = db.query(user_model).filter(user_model.username == username).first()
+        finally:
+            db.close()
+        if db_user is None:
+            return False
+        cache.add(username)
+        return True
+
+    return user_exists
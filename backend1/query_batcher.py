@@ -0,0 +1,138 @@
+import time
+import queue
+import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Callable, Generic, List, NamedTuple, Optional, Sequence, TypeVar
+
+import numpy as np
+
+from instrumentation import span
+
+T = TypeVar("T")
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class SearchResult(NamedTuple):
+    """One query's row of a batched encode + ``index.search``."""
+    embedding: np.ndarray
+    distances: np.ndarray
+    ids: np.ndarray
+    context: object = None  # whatever the batch function attaches, e.g. the index snapshot
+
+
+def batched_search(encode: Callable[[List[str]], np.ndarray], index, k: int, context: object = None) -> Callable:
+    """Returns a batch function that encodes all queries and runs one ``index.search``."""
+    def run(queries: List[str]) -> List[SearchResult]:
+        with span("embed"):
+            embeddings = np.asarray(encode(queries), dtype="float32").reshape(len(queries), -1)
+        with span("faiss_search"):
+            distances, ids = index.search(embeddings, k)
+        return [SearchResult(embeddings[i], distances[i], ids[i], context) for i in range(len(queries))]
+    return run
+
+
+class QueryBatcher(Generic[T]):
+    """Groups concurrent queries into batches for one worker thread.
+
+    A batch is processed as soon as ``max_batch`` queries are waiting or
+    ``max_wait`` seconds after its first query arrived, whichever comes
+    first. ``process`` receives the list of queries and returns one result
+    per query; each caller of ``submit`` blocks until its own result is
+    ready, or raises TimeoutError after ``timeout`` seconds. An exception
+    from ``process``, or a result count that does not match the batch, is
+    raised in every caller of that batch.
+    """
+
+    def __init__(self, process: Callable[[List[str]], Sequence[T]], max_batch: int = 32,
+                 max_wait: float = 0.005, history: int = 10000, timeout: float = 30.0):
+        self.process = process
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._queue: "queue.Queue" = queue.Queue()
+        self._latencies = deque(maxlen=history)
+        self._latency_buckets = Counter()
+        self._batch_sizes = Counter()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, query: str, timeout: Optional[float] = None) -> T:
+        """Blocks for at most ``timeout`` seconds (default: the batcher's ``timeout``)."""
+        self._ensure_started()
+        future: Future = Future()
+        started = time.perf_counter()
+        self._queue.put((query, future))
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        finally:
+            self._record_latency(time.perf_counter() - started)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+            try:
+                results = self.process([query for query, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"expected {len(batch)} results, got {len(results)}")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logging.error(f"Query batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _record_latency(self, seconds: float) -> None:
+        ms = seconds * 1000
+        bucket = next((f"le_{b}" for b in LATENCY_BUCKETS_MS if ms <= b), "inf")
+        with self._stats_lock:
+            self._latencies.append(ms)
+            self._latency_buckets[bucket] += 1
+
+    def stats(self) -> dict:
+        """Latency percentiles (ms, over recent requests) and latency / batch-size histograms."""
+        with self._stats_lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            latency_buckets = {f"le_{b}": self._latency_buckets[f"le_{b}"] for b in LATENCY_BUCKETS_MS}
+            latency_buckets["inf"] = self._latency_buckets["inf"]
+        batches = sum(batch_sizes.values())
+        queries = sum(size * count for size, count in batch_sizes.items())
+        return {
+            "queries": queries,
+            "batches": batches,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                "p99": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            },
+            "latency_histogram_ms": latency_buckets,
+            "batch_size_histogram": batch_sizes,
+        }
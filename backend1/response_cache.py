@@ -0,0 +1,155 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def context_key(context_ids: Sequence[int], namespace: str = "") -> str:
+    """Identifies the retrieved context; answers are only reused for an identical one."""
+    return namespace + ":" + ",".join(str(int(i)) for i in context_ids)
+
+
+class MemoryStore:
+    """In-process LRU storage for ``SemanticResponseCache``."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._by_key = {}
+        self._next_id = 0
+
+    def _remove(self, entry_id: int) -> None:
+        key = self._entries.pop(entry_id)[0]
+        ids = self._by_key[key]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_key[key]
+
+    def candidates(self, key: str, oldest: float) -> List[Tuple[int, np.ndarray, str]]:
+        found = []
+        for entry_id in list(self._by_key.get(key, ())):
+            _, embedding, answer, created = self._entries[entry_id]
+            if created < oldest:
+                self._remove(entry_id)
+            else:
+                found.append((entry_id, embedding, answer))
+        return found
+
+    def touch(self, entry_id: int) -> None:
+        self._entries.move_to_end(entry_id)
+
+    def add(self, key: str, embedding: np.ndarray, answer: str, now: float, oldest: float, max_entries: int) -> None:
+        # Bounded by max_entries; expired entries go when their key is looked up (``oldest``)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (key, embedding, answer, now)
+        self._by_key.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """On-disk storage for ``SemanticResponseCache``, shareable between workers."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, context TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "answer TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_context ON responses (context)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._conn.commit()
+
+    def candidates(self, key: str, oldest: float) -> List[Tuple[int, np.ndarray, str]]:
+        rows = self._conn.execute(
+            "SELECT id, embedding, answer FROM responses WHERE context = ? AND created >= ?", (key, oldest)
+        ).fetchall()
+        return [(entry_id, np.frombuffer(blob, dtype=np.float32), answer) for entry_id, blob, answer in rows]
+
+    def touch(self, entry_id: int) -> None:
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE id = ?", (time.time(), entry_id))
+        self._conn.commit()
+
+    def add(self, key: str, embedding: np.ndarray, answer: str, now: float, oldest: float, max_entries: int) -> None:
+        self._conn.execute(
+            "INSERT INTO responses (context, embedding, answer, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, embedding.tobytes(), answer, now, now),
+        )
+        # Expired rows are never returned; drop them so the file does not keep growing
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (oldest,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE id NOT IN "
+            "(SELECT id FROM responses ORDER BY last_used DESC LIMIT ?)", (max_entries,)
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class SemanticResponseCache:
+    """Reuses chatbot answers for queries that mean the same thing.
+
+    A cached answer is returned when the new query embedding lies within
+    ``max_distance`` (squared L2, like the FAISS index) of a cached query
+    and the retrieved context IDs are identical. Entries expire after
+    ``ttl`` seconds and the least recently used ones are evicted beyond
+    ``max_entries``. Pass ``db_path`` to keep the cache in SQLite.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, max_distance: float = 0.1,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._store = SQLiteStore(db_path) if db_path else MemoryStore()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, embedding: np.ndarray, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            best, best_distance = None, self.max_distance
+            for entry_id, cached, answer in self._store.candidates(key, time.time() - self.ttl):
+                distance = float(np.sum((cached - query) ** 2))
+                if distance <= best_distance:
+                    best, best_distance = (entry_id, answer), distance
+            if best is None:
+                self.misses += 1
+                return None
+            self._store.touch(best[0])
+            self.hits += 1
+            return best[1]
+
+    def store(self, embedding: np.ndarray, key: str, answer: str) -> None:
+        if not self.enabled:
+            return
+        vector = np.array(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            now = time.time()
+            self._store.add(key, vector, answer, now, now - self.ttl, self.max_entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._store),
+            }
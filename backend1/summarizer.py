@@ -0,0 +1,173 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+from chunker import TokenChunker
+from text_store import content_hash
+
+# summarize(texts, max_length, min_length) -> one summary per text
+SummarizeBatch = Callable[[List[str], int, int], List[str]]
+
+
+class SummaryConfig(NamedTuple):
+    max_length: int = 500  # tokens in the final summary, as the single-call path
+    min_length: int = 100
+    chunk_max_length: int = 150  # tokens per partial summary
+    chunk_min_length: int = 40
+    passthrough_tokens: int = 60  # chunks this short are kept as they are
+    batch_size: int = 8
+    workers: int = 1  # batches summarized concurrently
+    max_levels: int = 8
+
+
+def pipeline_summarize_batch(summarizer, batch_size: int = 8) -> SummarizeBatch:
+    """Wraps a transformers summarization pipeline as a ``SummarizeBatch``."""
+    def run(texts: List[str], max_length: int, min_length: int) -> List[str]:
+        results = summarizer(texts, max_length=max_length, min_length=min_length, do_sample=False,
+                             truncation=True, batch_size=batch_size)
+        return [result["summary_text"] for result in results]
+    return run
+
+
+def seq2seq_summarize_batch(model_name: str, batch_size: int = 8) -> SummarizeBatch:
+    """A ``SummarizeBatch`` calling ``generate`` on a seq2seq model directly (no pipeline).
+
+    Uses the model's own generation settings, like the summarization
+    pipeline; its tokenizer is exposed as ``.tokenizer``.
+    """
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+    window = getattr(model.config, "max_position_embeddings", 1024)
+
+    def run(texts: List[str], max_length: int, min_length: int) -> List[str]:
+        summaries = []
+        for start in range(0, len(texts), batch_size):
+            encoded = tokenizer(texts[start:start + batch_size], truncation=True, max_length=window,
+                                padding=True, return_tensors="pt")
+            with torch.no_grad():
+                output = model.generate(**encoded, max_length=max_length, min_length=min_length, do_sample=False)
+            summaries.extend(tokenizer.batch_decode(output, skip_special_tokens=True))
+        return summaries
+
+    run.tokenizer = tokenizer
+    return run
+
+
+class MapReduceSummarizer:
+    """Summarizes documents longer than the model's input window.
+
+    Map: every page is chunked to the window (``chunker``) and the chunks
+    are summarized in batches of ``batch_size``, up to ``workers`` batches
+    at a time. Reduce: the partial summaries are joined, re-chunked and
+    summarized again until they fit one window, which gets the final
+    summary. Chunks are cut per page, so editing a page only changes that
+    page's chunks; partial summaries are cached by chunk content (LRU,
+    ``cache_size`` entries) and unchanged chunks are not summarized again.
+    """
+
+    def __init__(self, summarize: SummarizeBatch, chunker: TokenChunker, config: SummaryConfig = SummaryConfig(),
+                 cache_size: int = 4096):
+        self.summarize_batch = summarize
+        self.chunker = chunker
+        self.config = config
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lengths(self, tokens: int, max_length: int, min_length: int):
+        max_length = max(1, min(max_length, tokens))
+        return max_length, min(min_length, max_length // 2)
+
+    def _key(self, chunk: str, max_length: int, min_length: int) -> str:
+        return f"{max_length}:{min_length}:{content_hash(chunk)}"
+
+    def _summarize_chunks(self, chunks: List[str]) -> List[str]:
+        """One partial summary per chunk, from the cache or the model."""
+        config = self.config
+        tokens = self.chunker.count_tokens(chunks)
+        lengths = [self._lengths(int(count), config.chunk_max_length, config.chunk_min_length) for count in tokens]
+        summaries: List[Optional[str]] = [None] * len(chunks)
+        todo = []
+        with self._lock:
+            for i, (chunk, count) in enumerate(zip(chunks, tokens)):
+                if count <= config.passthrough_tokens:
+                    summaries[i] = chunk
+                    continue
+                key = self._key(chunk, *lengths[i])
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    summaries[i] = cached
+                else:
+                    self.misses += 1
+                    todo.append(i)
+
+        # A batch shares one length limit, so only chunks with the same limits are batched;
+        # sorted by token count they also pad little.
+        todo.sort(key=lambda i: (lengths[i], tokens[i]))
+        batches = []
+        for i in todo:
+            if batches and len(batches[-1]) < config.batch_size and lengths[batches[-1][0]] == lengths[i]:
+                batches[-1].append(i)
+            else:
+                batches.append([i])
+
+        def run(batch: List[int]) -> List[str]:
+            return self.summarize_batch([chunks[i] for i in batch], *lengths[batch[0]])
+
+        if config.workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=config.workers) as pool:
+                results = list(pool.map(run, batches))
+        else:
+            results = [run(batch) for batch in batches]
+
+        with self._lock:
+            for batch, batch_summaries in zip(batches, results):
+                for i, summary in zip(batch, batch_summaries):
+                    summaries[i] = summary
+                    self._cache[self._key(chunks[i], *lengths[i])] = summary
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summaries
+
+    def summarize(self, pages: Sequence[str]) -> str:
+        """Summary of a document given as its page texts."""
+        config = self.config
+        chunks = [chunk for page in self.chunker.chunk_many(list(pages)) for chunk in page if chunk.strip()]
+        for level in range(config.max_levels):
+            if len(chunks) <= 1:
+                break
+            partials = self._summarize_chunks(chunks)
+            logging.info(f"Summary level {level}: {len(chunks)} chunks -> {len(partials)} partial summaries")
+            reduced = [chunk for chunk in self.chunker.chunk("\n".join(partials)) if chunk.strip()]
+            if len(reduced) >= len(chunks):
+                logging.warning("Partial summaries no longer shrink; summarizing the first window only.")
+                chunks = reduced[:1]
+                break
+            chunks = reduced
+        if len(chunks) > 1:
+            logging.warning(f"Summary still spans {len(chunks)} windows after {config.max_levels} levels; "
+                            "summarizing the first one.")
+        if not chunks:
+            return ""
+        tokens = int(self.chunker.count_tokens(chunks[:1])[0])
+        max_length, min_length = self._lengths(tokens, config.max_length, config.min_length)
+        return self.summarize_batch(chunks[:1], max_length, min_length)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+            }
@@ -0,0 +1,114 @@
+import os
+import mmap
+import array
+import hashlib
+import shutil
+import operator
+from typing import Iterable, Iterator
+
+import numpy as np
+
+MAGIC = b"AYTXT001"
+HEADER_SIZE = len(MAGIC) + 8
+
+
+def content_hash(text: str) -> str:
+    """Short, stable digest used to recognise unchanged texts between runs."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class TextStoreWriter:
+    """Streams texts into a text store file without keeping them in memory.
+
+    Texts go to a temporary blob file as they arrive; ``close`` prepends the
+    header and offset table and moves the finished store into place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._blob_path = path + ".blob.tmp"
+        self._blob = open(self._blob_path, "wb")
+        self._offsets = array.array("Q", [0])
+
+    def append(self, text: str) -> int:
+        """Adds one text and returns its position in the store."""
+        data = text.encode("utf-8")
+        self._blob.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        return len(self._offsets) - 2
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def close(self) -> int:
+        self._blob.close()
+        offsets = np.frombuffer(self._offsets, dtype=np.uint64).astype("<u8")
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(self)).astype("<u8").tobytes())
+            f.write(offsets.tobytes())
+            with open(self._blob_path, "rb") as blob:
+                shutil.copyfileobj(blob, f)
+        os.remove(self._blob_path)
+        os.replace(self.path + ".tmp", self.path)
+        return len(self)
+
+    def abort(self) -> None:
+        self._blob.close()
+        for path in (self._blob_path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self) -> "TextStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_text_store(path: str, texts: Iterable[str]) -> int:
+    """Writes texts as one memory-mappable file: header, uint64 offsets, UTF-8 blob."""
+    with TextStoreWriter(path) as writer:
+        for text in texts:
+            writer.append(text)
+    return len(writer)
+
+
+class TextStore:
+    """Read-only, memory-mapped view of a file written by ``write_text_store``.
+
+    Worker processes opening the same file share its page-cached copy, and
+    entries are only decoded when accessed.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Text store '{path}' is missing.")
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"'{path}' is not a text store file.")
+        count = int(np.frombuffer(self._mmap, dtype="<u8", count=1, offset=len(MAGIC))[0])
+        self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=HEADER_SIZE)
+        self._blob_start = HEADER_SIZE + 8 * (count + 1)
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("text store index out of range")
+        start = self._blob_start + int(self._offsets[i])
+        end = self._blob_start + int(self._offsets[i + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,85 @@
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+STARTUP_MODES = ("background", "eager", "lazy")
+
+
+class Component(NamedTuple):
+    load: Callable[[], object]
+    loaded: Callable[[], bool]
+
+
+class Warmup:
+    """Loads heavy components (models, indexes) without holding up startup.
+
+    In ``background`` mode ``start`` loads every registered component on a
+    daemon thread, so the service answers health checks at once; ``eager``
+    loads them before returning, and ``lazy`` leaves each one to be loaded
+    by its first use. ``status`` drives the readiness probe.
+    """
+
+    def __init__(self, mode: str = "background"):
+        if mode not in STARTUP_MODES:
+            raise ValueError(f"Unknown startup mode '{mode}'; expected one of {', '.join(STARTUP_MODES)}.")
+        self.mode = mode
+        self._components: Dict[str, Component] = {}
+        self._errors: Dict[str, str] = {}
+        self._loading: Optional[str] = None
+        self._seconds: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, load: Callable[[], object], loaded: Callable[[], bool]) -> None:
+        self._components[name] = Component(load, loaded)
+
+    def start(self) -> None:
+        if self.mode == "eager":
+            self._run()
+        elif self.mode == "background" and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        for name, component in self._components.items():
+            self._loading = name
+            started = time.perf_counter()
+            try:
+                component.load()
+                self._errors.pop(name, None)
+            except Exception as e:
+                logging.error(f"Warm-up of {name} failed: {e}")
+                self._errors[name] = str(e)
+            self._seconds[name] = round(time.perf_counter() - started, 3)
+        self._loading = None
+
+    @property
+    def ready(self) -> bool:
+        return all(component.loaded() for component in self._components.values())
+
+    def status(self) -> dict:
+        components = {}
+        for name, component in self._components.items():
+            if component.loaded():
+                state = "ready"
+            elif name in self._errors:
+                state = "failed"
+            elif self._loading == name:
+                state = "loading"
+            else:
+                state = "pending"
+            components[name] = {"state": state}
+            if name in self._errors and state != "ready":
+                components[name]["error"] = self._errors[name]
+            if name in self._seconds:
+                components[name]["load_seconds"] = self._seconds[name]
+        return {
+            "ready": all(c["state"] == "ready" for c in components.values()),
+            "mode": self.mode,
+            "components": components,
+        }
+
+
+def startup_mode_from_env(default: str = "background") -> str:
+    return os.getenv("STARTUP_MODE", default).lower()
@@ -0,0 +1,100 @@
+"""Recall-vs-latency benchmark for the chat knowledge-base index types.
+
+Usage:
+    python benchmarks/ann_recall.py --embeddings backend1/index_cache/embeddings.npy
+    python benchmarks/ann_recall.py --data backend1/text_data.store --k 3 --queries 500
+
+Every index built by backend1/index_factory.py (IVF-Flat, IVF-PQ, HNSW) is
+compared against exact Flat search on the same corpus: recall@k against the
+Flat results, and single-query latency (mean/p50/p99) for each nprobe or
+efSearch setting. Without --embeddings the corpus is encoded with the
+SentenceTransformer model first.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend1"))
+
+from index_factory import IndexConfig, build_index, tune_index
+from chat_index import load_text_data
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def load_embeddings(args) -> np.ndarray:
+    if args.embeddings:
+        return np.load(args.embeddings).astype("float32")
+    from sentence_transformers import SentenceTransformer
+    text_data = load_text_data(args.data)
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    return model.encode(list(text_data), convert_to_numpy=True, batch_size=64).astype("float32")
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = np.empty_like(truth)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    latencies_us = np.array(latencies) * 1e6
+    return {
+        "recall": float(recall),
+        "mean_us": float(latencies_us.mean()),
+        "p50_us": float(np.percentile(latencies_us, 50)),
+        "p99_us": float(np.percentile(latencies_us, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join("backend1", "text_data.store"))
+    parser.add_argument("--embeddings", help="Precomputed corpus embeddings (.npy) to skip encoding")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 8, 16])
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[16, 32, 64, 128])
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    embeddings = load_embeddings(args)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(embeddings), size=min(args.queries, len(embeddings)), replace=False)
+    queries = np.ascontiguousarray(embeddings[picks])
+
+    flat = build_index(embeddings, IndexConfig(kind="flat"))
+    _, truth = flat.search(queries, args.k)
+
+    runs = [("flat", "-", IndexConfig(kind="flat"))]
+    runs += [("ivf_flat", f"nprobe={n}", IndexConfig(kind="ivf_flat", nprobe=n)) for n in args.nprobe]
+    runs += [("ivf_pq", f"nprobe={n}", IndexConfig(kind="ivf_pq", nprobe=n)) for n in args.nprobe]
+    runs += [("hnsw", f"efSearch={e}", IndexConfig(kind="hnsw", ef_search=e)) for e in args.ef_search]
+
+    print(f"corpus={len(embeddings)} d={embeddings.shape[1]} queries={len(queries)} k={args.k}")
+    print(f"{'index':<10}{'setting':<14}{'build s':>9}{'recall':>9}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    results, built = [], {}
+    for kind, setting, config in runs:
+        if kind not in built:
+            start = time.perf_counter()
+            built[kind] = (build_index(embeddings, config), time.perf_counter() - start)
+        index, build_seconds = built[kind]
+        tune_index(index, config)
+        row = {"index": kind, "setting": setting, "build_s": build_seconds, **measure(index, queries, truth, args.k)}
+        results.append(row)
+        print(f"{kind:<10}{setting:<14}{build_seconds:>9.2f}{row['recall']:>9.3f}"
+              f"{row['mean_us']:>10.1f}{row['p50_us']:>10.1f}{row['p99_us']:>10.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"corpus": len(embeddings), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
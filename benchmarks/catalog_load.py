@@ -0,0 +1,89 @@
+"""Boot cost of the recommender: parsing the CSV vs the compiled catalog.
+
+Usage:
+    python benchmarks/catalog_load.py --rows 0 5000 20000
+
+Row count 0 is the shipped CSV; larger counts replicate its rows (with
+renamed asanas) into a temporary CSV. For each size the CSV is compiled
+with catalog.py, then a fresh interpreter loads the recommender either
+way. It reports the time to load the table and TF-IDF matrix (imports
+included), the total including the neighbor graph and recommender, the
+peak RSS (Linux) and whether pandas / scikit-learn were imported.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+BACKEND = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+CSV_PATH = os.path.join(BACKEND, "yoga_asanas_and_diseases.csv")
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+sys.path.insert(0, {backend!r})
+from catalog import load_features
+from recommendation import AsanaRecommender, build_neighbor_graph
+table, features = load_features({csv!r}, {catalog!r})
+loaded = time.perf_counter()
+recommender = AsanaRecommender(table, build_neighbor_graph(features), diseases=["Anxiety", "Stress"])
+with open("/proc/self/status") as f:  # VmHWM, unlike ru_maxrss, starts over at exec
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(json.dumps({{
+    "load_s": loaded - start,
+    "total_s": time.perf_counter() - start,
+    "peak_rss_mb": peak_kb / 1024,
+    "pandas": "pandas" in sys.modules,
+    "sklearn": "sklearn" in sys.modules,
+}}))
+"""
+
+
+def synthetic_csv(rows: int, directory: str) -> str:
+    import pandas as pd
+    base = pd.read_csv(CSV_PATH)
+    copies = -(-rows // len(base))
+    df = pd.concat([base] * copies, ignore_index=True).iloc[:rows].copy()
+    df["Index"] = range(len(df))
+    df["Asana Name"] = [f"{name} {i}" for i, name in enumerate(df["Asana Name"])]
+    path = os.path.join(directory, f"asanas_{rows}.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def probe(csv_path: str, catalog_dir) -> dict:
+    code = PROBE.format(backend=BACKEND, csv=csv_path, catalog=catalog_dir)
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="*", default=[0, 5000, 20000])
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND)
+    from catalog import compile_catalog
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            csv_path = synthetic_csv(rows, tmp) if rows else CSV_PATH
+            catalog_dir = os.path.join(tmp, f"catalog_{rows}")
+            meta = compile_catalog(csv_path, catalog_dir)
+            for source, directory in (("csv", None), ("catalog", catalog_dir)):
+                row = {"rows": meta["rows"], "source": source, **probe(csv_path, directory)}
+                results.append(row)
+                print(f"rows={row['rows']:>6} {source:<8} load={row['load_s']:.2f}s total={row['total_s']:.2f}s "
+                      f"peak_rss={row['peak_rss_mb']:.0f}MB pandas={row['pandas']} sklearn={row['sklearn']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Retrieval hit-rate and prompt size: page chunks vs token-aware chunks.
+
+Usage:
+    python benchmarks/chunking.py
+    python benchmarks/chunking.py --data backend1/text_data.store --k 3 --sizes 128 256 --overlap 32
+
+Queries are generated from the asana entries in the corpus ("<pose name>:
+<modification>"); a query is a hit when one of the top-k retrieved chunks
+contains that entry's name and modification lines. For each scheme the
+report shows the number of chunks, how many exceed the model's window (and
+are silently truncated when embedded), hit@k, and the context tokens that
+the top-k chunks would add to the LLM prompt.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend1"))
+
+from chunker import PRONUNCIATION, ChunkConfig, TokenChunker, split_units
+from index_factory import IndexConfig, build_index
+from text_store import TextStore
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def make_queries(pages, limit: int, seed: int = 0):
+    """(query, required substrings) pairs for asana entries that list a modification."""
+    queries = []
+    for page in pages:
+        for unit in split_units(page):
+            lines = unit.split("\n")
+            if len(lines) < 3 or not PRONUNCIATION.match(lines[2]):
+                continue
+            modification = next((line for line in lines if line.startswith("Modification:")), None)
+            if modification:
+                queries.append((f"{lines[0]}: {modification[len('Modification:'):].strip()}", (lines[0], modification)))
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(queries), size=min(limit, len(queries)), replace=False)
+    return [queries[i] for i in sorted(picks)]
+
+
+def evaluate(name, chunks, model, counter, queries, k, window):
+    start = time.perf_counter()
+    embeddings = model.encode(chunks, convert_to_numpy=True, batch_size=64).astype("float32")
+    index = build_index(embeddings, IndexConfig(kind="flat"))
+    index_seconds = time.perf_counter() - start
+
+    query_embeddings = model.encode([q for q, _ in queries], convert_to_numpy=True, batch_size=64).astype("float32")
+    _, found = index.search(query_embeddings, k)
+    chunk_tokens = counter.count_tokens(chunks)
+    hits, context = [], []
+    for (_, required), ids in zip(queries, found):
+        hits.append(any(all(part in chunks[i] for part in required) for i in ids if i >= 0))
+        context.append(int(chunk_tokens[ids[ids >= 0]].sum()))
+    context = np.array(context)
+    return {
+        "scheme": name,
+        "chunks": len(chunks),
+        "truncated": int((chunk_tokens > window).sum()),
+        "hit_rate": float(np.mean(hits)),
+        "context_tokens_mean": float(context.mean()),
+        "context_tokens_p95": float(np.percentile(context, 95)),
+        "index_s": index_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join("backend1", "text_data.store"))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[128, 256], help="Chunk sizes in tokens")
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    pages = [text for text in TextStore(args.data) if text]
+    queries = make_queries(pages, args.queries)
+    counter = TokenChunker(model.tokenizer)
+    window = model.max_seq_length - 2
+
+    schemes = [("page", pages)]
+    for size in args.sizes:
+        chunker = TokenChunker(model.tokenizer, ChunkConfig(size, args.overlap))
+        start = time.perf_counter()
+        chunks = [chunk for page_chunks in chunker.chunk_many(pages) for chunk in page_chunks]
+        print(f"chunked {len(pages)} pages into {len(chunks)} chunks of <= {size} tokens "
+              f"in {time.perf_counter() - start:.2f}s")
+        schemes.append((f"tokens={size}/{args.overlap}", chunks))
+
+    print(f"pages={len(pages)} queries={len(queries)} k={args.k} window={window}")
+    print(f"{'scheme':<16}{'chunks':>8}{'truncated':>11}{'hit@k':>8}{'ctx tok':>9}{'ctx p95':>9}{'index s':>9}")
+    results = []
+    for name, chunks in schemes:
+        row = evaluate(name, chunks, model, counter, queries, args.k, window)
+        results.append(row)
+        print(f"{name:<16}{row['chunks']:>8}{row['truncated']:>11}{row['hit_rate']:>8.3f}"
+              f"{row['context_tokens_mean']:>9.0f}{row['context_tokens_p95']:>9.0f}{row['index_s']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"pages": len(pages), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Disease-name matching: difflib scan vs the trigram DiseaseIndex.
+
+Usage:
+    python benchmarks/disease_matching.py --sizes 0 1000 5000 --lookups 200
+
+Size 0 is the catalog's own disease names; other sizes add synthetic
+condition names. Queries are the API's diseases plus misspelled and
+differently-spaced variants. For each catalog size it reports the mean
+lookup time of ``difflib.get_close_matches`` (over the five disease
+columns, as the recommender used to) and of ``DiseaseIndex.lookup``, and
+how often the two pick the same name.
+"""
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import pandas as pd
+from disease_index import DiseaseIndex
+from recommendation import DISEASE_COLUMNS
+
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "yoga_asanas_and_diseases.csv")
+WORDS = ["chronic", "acute", "joint", "nerve", "lung", "heart", "liver", "skin", "sleep", "blood",
+         "pain", "disorder", "syndrome", "deficiency", "inflammation", "injury", "problems", "issues"]
+
+
+def synthetic_names(count: int, rng: random.Random):
+    return [" ".join(rng.sample(WORDS, 3)).title() + f" {i}" for i in range(count)]
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    return (name[:i] + name[i + 1:]) if rng.random() < 0.5 else name.replace(" ", "")
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[0, 1000, 5000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    df = pd.read_csv(args.csv)
+    columns = {column: [v for v in dict.fromkeys(df[column].fillna("").tolist()) if v] for column in DISEASE_COLUMNS}
+    catalog = list(dict.fromkeys(v for values in columns.values() for v in values))
+    for size in args.sizes:
+        extra = synthetic_names(size, rng)
+        # Spread the synthetic names over the columns like the real ones
+        sized = {column: values + extra[i::len(DISEASE_COLUMNS)] for i, (column, values) in enumerate(columns.items())}
+        names = catalog + extra
+        pool = catalog + rng.sample(extra, min(len(extra), 50))
+        queries = [misspell(rng.choice(pool), rng) if rng.random() < 0.7 else rng.choice(pool)
+                   for _ in range(args.lookups)]
+
+        start = time.perf_counter()
+        index = DiseaseIndex(names)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def scan(query):
+            found = [m[0] for m in (difflib.get_close_matches(query, values, n=1) for values in sized.values()) if m]
+            return max(found, key=lambda m: difflib.SequenceMatcher(None, query, m).ratio()) if found else None
+
+        scanned, scan_us = timed(scan, queries)
+        indexed, index_us = timed(index.lookup, queries)
+        agree = sum(a == b for a, b in zip(scanned, indexed)) / len(queries)
+        print(f"names={len(names):>6} build={build_ms:7.1f}ms  difflib={scan_us:10.1f}us  "
+              f"index={index_us:7.1f}us  speedup={scan_us / index_us:7.0f}x  same_pick={agree:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Accuracy and throughput of the embedding backends (torch, onnx, onnx-int8).
+
+Usage:
+    python benchmarks/embedding_backends.py
+    python benchmarks/embedding_backends.py --backends torch onnx-int8 --threads 4 --k 3 --json out.json
+
+Accuracy: the corpus and generated queries (see chunking.py) are embedded by
+every backend; each backend's top-k results are compared with the torch
+backend's (recall@k), together with the cosine similarity of its corpus
+vectors to the torch ones. Throughput: texts/s encoding the corpus at each
+batch size, and single-query latency.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend1"))
+
+from chunking import make_queries
+from embedding import EMBEDDING_BACKENDS, EmbeddingConfig, load_embedder
+from index_factory import IndexConfig, build_index
+from text_store import TextStore
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def throughput(model, texts, batch_size: int) -> float:
+    model.encode(texts[:batch_size], convert_to_numpy=True, batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def single_query_ms(model, queries) -> np.ndarray:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode([query], convert_to_numpy=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join("backend1", "text_data.store"))
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", nargs="*", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="Threads per backend (0 = library default)")
+    parser.add_argument("--onnx-dir", default=EmbeddingConfig().onnx_dir)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[1, 8, 32, 64])
+    parser.add_argument("--throughput-texts", type=int, default=512, help="Corpus texts encoded per throughput run")
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    corpus = [text for text in TextStore(args.data) if text]
+    queries = [query for query, _ in make_queries(corpus, args.queries)]
+    sample = corpus[:args.throughput_texts]
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    results, reference = [], None
+    print(f"corpus={len(corpus)} queries={len(queries)} k={args.k} threads={args.threads or 'default'}")
+    for backend in backends:
+        model = load_embedder(args.model, EmbeddingConfig(backend=backend, threads=args.threads, onnx_dir=args.onnx_dir))
+        corpus_vectors = np.asarray(model.encode(corpus, convert_to_numpy=True, batch_size=64), dtype="float32")
+        query_vectors = np.asarray(model.encode(queries, convert_to_numpy=True, batch_size=64), dtype="float32")
+        _, found = build_index(corpus_vectors, IndexConfig(kind="flat")).search(query_vectors, args.k)
+        if reference is None:
+            reference = (corpus_vectors, found)
+        reference_vectors, reference_found = reference
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, reference_found)])
+        cosine = np.sum(corpus_vectors * reference_vectors, axis=1) / (
+            np.linalg.norm(corpus_vectors, axis=1) * np.linalg.norm(reference_vectors, axis=1))
+
+        row = {
+            "backend": backend,
+            "recall_vs_torch": float(recall),
+            "cosine_min": float(cosine.min()),
+            "cosine_mean": float(cosine.mean()),
+            "texts_per_s": {str(b): throughput(model, sample, b) for b in args.batch_sizes},
+        }
+        latencies = single_query_ms(model, queries[:100])
+        row["query_ms_p50"] = float(np.percentile(latencies, 50))
+        row["query_ms_p99"] = float(np.percentile(latencies, 99))
+        results.append(row)
+
+        rates = "  ".join(f"b{b}={rate:.0f}/s" for b, rate in row["texts_per_s"].items())
+        print(f"{backend:<10} recall@{args.k}={row['recall_vs_torch']:.3f} cos_min={row['cosine_min']:.4f} "
+              f"query p50={row['query_ms_p50']:.1f}ms p99={row['query_ms_p99']:.1f}ms  {rates}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"corpus": len(corpus), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Import-time profile of the services (what a cold start pays before serving).
+
+Usage:
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --target backend1/main1.py --top 20 --json imports.json
+
+Each target is imported in a fresh interpreter under ``python -X importtime``
+(with its directory on sys.path, its working directory and SECRET_KEY set
+if missing). The report lists the total import time, the slowest direct
+imports of the target (cumulative) and the modules with the most self time.
+Run it before and after a change to see how much a cold start moved.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DEFAULT_TARGETS = [
+    os.path.join("backend1", "main1.py"),
+    "chatbot.py",
+    os.path.join("backend", "main.py"),
+]
+
+
+def parse_importtime(stderr: str):
+    """Yields (depth, module, self_us, cumulative_us) from ``-X importtime`` output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        name = parts[2][1:]  # one separating space, then two per nesting level
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        yield depth, name.strip(), int(parts[0]), int(parts[1])
+
+
+def profile(target: str, top: int) -> dict:
+    path = os.path.join(ROOT, target)
+    directory, module = os.path.dirname(path), os.path.splitext(os.path.basename(path))[0]
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "import-profile")
+    code = f"import sys; sys.path.insert(0, {directory!r}); import {module}"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory, env=env,
+                               capture_output=True, text=True)
+    rows = list(parse_importtime(completed.stderr))
+    target_row = next((row for row in rows if row[0] == 0 and row[1] == module), None)
+    # Children are reported before their parent, so the target's direct imports are the
+    # depth-1 rows that precede its own row (and follow the previous top-level import).
+    end = rows.index(target_row) if target_row else len(rows)
+    start = max((i + 1 for i, row in enumerate(rows[:end]) if row[0] == 0), default=0)
+    direct = sorted((row for row in rows[start:end] if row[0] == 1), key=lambda row: -row[3])
+    by_self = sorted(rows, key=lambda row: -row[2])
+    return {
+        "target": target,
+        "ok": completed.returncode == 0,
+        "error": next((line for line in reversed(completed.stderr.splitlines())
+                       if line.strip() and not line.startswith("import time:")), None) if completed.returncode else None,
+        "total_ms": (target_row[3] if target_row else sum(row[3] for row in rows if row[0] == 0)) / 1000,
+        "modules": len(rows),
+        "direct_imports_ms": [{"module": name, "ms": cum / 1000} for _, name, _, cum in direct[:top]],
+        "self_time_ms": [{"module": name, "ms": own / 1000} for _, name, own, _ in by_self[:top]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", help="Service module(s) to profile, relative to the repo root")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    results = [profile(target, args.top) for target in args.target or DEFAULT_TARGETS]
+    for result in results:
+        status = "ok" if result["ok"] else f"FAILED: {result['error']}"
+        print(f"\n{result['target']}: {result['total_ms']:.0f} ms, {result['modules']} modules ({status})")
+        print("  slowest direct imports (cumulative):")
+        for row in result["direct_imports_ms"]:
+            print(f"    {row['ms']:>9.1f} ms  {row['module']}")
+        print("  most self time:")
+        for row in result["self_time_ms"]:
+            print(f"    {row['ms']:>9.1f} ms  {row['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Boots the three services locally and load-tests their main endpoints.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 1 8 32 --requests 200 --json load.json
+    python benchmarks/load_test.py --scenarios recommend search_images --image-latency 0.5
+
+backend/main.py and backend1/main1.py run under uvicorn and chatbot.py
+under the Flask server, all in one temporary working directory (a fresh
+users.db plus links to the catalog, text store and FAISS index), so the
+checked-in databases are left alone. The inference API is replaced by
+stub_inference.py (``--llm-latency``, ``--token-delay``) and the image
+scraper by stub_images.py (``--image-latency``). Only the services the
+chosen scenarios need are started.
+
+Each scenario sends ``--requests`` requests at every ``--concurrency``
+level (that many clients, each sending its next request when the last one
+is answered) after ``--warmup`` unrecorded ones, and reports throughput and
+p50/p95/p99 latency. ``--json`` writes the results with the commit and
+machine they ran on; compare two runs with results.py.
+"""
+import os
+import sys
+import glob
+import time
+import socket
+import asyncio
+import argparse
+import itertools
+import subprocess
+import tempfile
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple
+
+import httpx
+import numpy as np
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.normpath(os.path.join(BENCHMARKS, ".."))
+BACKEND = os.path.join(ROOT, "backend")
+BACKEND1 = os.path.join(ROOT, "backend1")
+sys.path.insert(0, BENCHMARKS)
+
+import stub_inference
+from results import save_results
+
+PASSWORD = "load-test-password"
+DISEASES = [
+    'Anxiety', 'Digestive Issues', 'Poor Posture', 'Insomnia',
+    'Asthma', 'Fatigue', 'Back Pain', 'Sciatica', 'Depression', 'Stress',
+    'Endocrine Problems (Diabetes/Infertility/Thyroid)', 'Respiratory Diseases',
+    'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
+]
+QUESTIONS = [
+    "What are the benefits of Surya Namaskar?",
+    "How do I practice Anulom Vilom pranayama?",
+    "Which asanas help with lower back pain?",
+    "What is the correct way to do Trikonasana?",
+    "Which yoga poses improve sleep?",
+    "How should beginners practice Sirsasana?",
+    "What are the contraindications of Halasana?",
+    "Which breathing exercises reduce stress?",
+]
+ASANAS = ["Tadasana", "Vrikshasana", "Trikonasana", "Bhujangasana", "Dhanurasana",
+          "Balasana", "Sukhasana", "Halasana", "Ustrasana", "Padmasana"]
+
+
+class Service(NamedTuple):
+    command: List[str]
+    ready_path: str
+
+
+class Scenario(NamedTuple):
+    service: str
+    method: str
+    path: str
+    request: Callable[[int, dict], dict]  # (request number, session) -> httpx request arguments
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "register": Scenario("backend", "POST", "/register/",
+                         lambda i, s: {"json": {"username": f"{s['prefix']}-{i}", "password": PASSWORD}}),
+    "login": Scenario("backend", "POST", "/login/",
+                      lambda i, s: {"json": {"username": s["username"], "password": PASSWORD}}),
+    "recommend": Scenario("backend", "GET", "/recommend/",
+                          lambda i, s: {"params": {"disease": DISEASES[i % len(DISEASES)], "token": s["token"]}}),
+    "chat_fastapi": Scenario("chat", "POST", "/get_response",
+                             lambda i, s: {"json": {"message": QUESTIONS[i % len(QUESTIONS)]}}),
+    "chat_flask": Scenario("chatbot", "POST", "/get_response",
+                           lambda i, s: {"json": {"message": QUESTIONS[i % len(QUESTIONS)]}}),
+    "search_images": Scenario("chat", "GET", "/search-images",
+                              lambda i, s: {"params": {"prompt": f"{ASANAS[i % s['prompts']]} yoga pose",
+                                                       "token": s["token"]}}),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def services(ports: Dict[str, int], workers: int) -> Dict[str, Service]:
+    def uvicorn(app: str, app_dir: str, port: int) -> List[str]:
+        return [sys.executable, "-m", "uvicorn", app, "--app-dir", app_dir, "--host", "127.0.0.1",
+                "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return {
+        "backend": Service(uvicorn("main:app", BACKEND, ports["backend"]), "/"),
+        "chat": Service(uvicorn("main1:app", BACKEND1, ports["chat"]), "/ready"),
+        "chatbot": Service([sys.executable, "-m", "flask", "--app", os.path.join(ROOT, "chatbot.py"), "run",
+                            "--host", "127.0.0.1", "--port", str(ports["chatbot"])], "/ready"),
+    }
+
+
+def prepare_workdir(workdir: str) -> None:
+    """Links the read-only data files the services open relative to their working directory."""
+    sources = [os.path.join(BACKEND, "yoga_asanas_and_diseases.csv"), os.path.join(BACKEND, "asana_catalog")]
+    sources += glob.glob(os.path.join(BACKEND1, "text_data.store*")) + glob.glob(os.path.join(BACKEND1, "faiss_index.faiss*"))
+    for source in sources:
+        os.symlink(source, os.path.join(workdir, os.path.basename(source)))
+
+
+def service_env(args, stub_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SECRET_KEY": os.getenv("SECRET_KEY", "load-test-secret"),
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "HF_API_URL": stub_url,
+        "HUGGINGFACE_API_KEY": "stub",
+        "IMAGE_FETCHER": "stub_images:fetch",
+        "STUB_IMAGE_LATENCY": str(args.image_latency),
+        "IMAGE_CACHE_DB": ":memory:",
+        "IMAGE_PREFETCH_LIMIT": "0",
+        "INDEX_CACHE_DIR": os.getenv("INDEX_CACHE_DIR", os.path.join(BACKEND1, "index_cache")),
+        "PYTHONPATH": os.pathsep.join(filter(None, [BENCHMARKS, os.getenv("PYTHONPATH")])),
+    })
+    if args.metrics_dir:
+        env["METRICS_ENABLED"] = "1"
+    return env
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float, log_path: str) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s; see {log_path}")
+
+
+async def run_level(client: httpx.AsyncClient, base_url: str, scenario: Scenario, session: dict,
+                    requests: int, concurrency: int, counter) -> dict:
+    latencies, statuses = [], Counter()
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            arguments = scenario.request(next(counter), session)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, base_url + scenario.path, **arguments)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    seconds = time.perf_counter() - started
+    latencies = np.array(latencies)
+    return {
+        "requests": requests,
+        "seconds": seconds,
+        "throughput_rps": requests / seconds,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "errors": sum(count for status, count in statuses.items() if not status.startswith(("2", "3"))),
+        "statuses": dict(statuses),
+    }
+
+
+async def run_scenarios(args, urls: Dict[str, str]) -> List[dict]:
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        session = {"prefix": f"load-{os.getpid()}", "username": f"load-{os.getpid()}-user",
+                   "prompts": max(1, min(args.image_prompts, len(ASANAS)))}
+        if "backend" in urls:
+            credentials = {"username": session["username"], "password": PASSWORD}
+            (await client.post(urls["backend"] + "/register/", json=credentials)).raise_for_status()
+            response = await client.post(urls["backend"] + "/login/", json=credentials)
+            response.raise_for_status()
+            session["token"] = response.json()["access_token"]
+
+        results = []
+        for name in args.scenarios:
+            scenario = SCENARIOS[name]
+            base_url = urls[scenario.service]
+            if args.warmup:
+                await run_level(client, base_url, scenario, session, args.warmup, min(args.warmup, 4), counter)
+            for concurrency in args.concurrency:
+                row = {"name": f"{name}@c{concurrency}", "scenario": name, "concurrency": concurrency}
+                row.update(await run_level(client, base_url, scenario, session, args.requests, concurrency, counter))
+                results.append(row)
+                print(f"{name:<14} c={concurrency:<4} {row['throughput_rps']:8.1f} req/s  p50={row['p50_ms']:8.1f}ms "
+                      f"p95={row['p95_ms']:8.1f}ms  p99={row['p99_ms']:8.1f}ms  errors={row['errors']}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="Unrecorded requests before each scenario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub inference API latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub delay between streamed tokens")
+    parser.add_argument("--image-latency", type=float, default=0.2, help="Stub image fetch latency in seconds")
+    parser.add_argument("--image-prompts", type=int, default=len(ASANAS), help="Distinct /search-images prompts")
+    parser.add_argument("--bcrypt-rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes per FastAPI service")
+    parser.add_argument("--boot-timeout", type=float, default=600.0, help="Seconds to wait for a service to be ready")
+    parser.add_argument("--metrics-dir", help="Enable METRICS_ENABLED and save each service's /metrics here")
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    stub = stub_inference.serve(port=0, latency=args.llm_latency, token_delay=args.token_delay)
+    stub_url = f"http://127.0.0.1:{stub.server_port}/models/stub"
+    needed = {SCENARIOS[name].service for name in args.scenarios}
+    if "search_images" in args.scenarios:
+        needed.add("backend")  # /search-images needs a token from the auth backend
+    ports = {name: free_port() for name in ("backend", "chat", "chatbot")}
+    definitions = services(ports, args.workers)
+
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="ayuryoga-load-") as workdir:
+        prepare_workdir(workdir)
+        env = service_env(args, stub_url)
+        urls = {}
+        try:
+            for name in ("backend", "chat", "chatbot"):
+                if name not in needed:
+                    continue
+                log_path = os.path.join(workdir, f"{name}.log")
+                with open(log_path, "w") as log:
+                    process = subprocess.Popen(definitions[name].command, cwd=workdir, env=env,
+                                               stdout=log, stderr=subprocess.STDOUT)
+                processes.append(process)
+                urls[name] = f"http://127.0.0.1:{ports[name]}"
+                started = time.perf_counter()
+                wait_ready(urls[name] + definitions[name].ready_path, process, args.boot_timeout, log_path)
+                print(f"{name} ready on {urls[name]} after {time.perf_counter() - started:.1f}s")
+
+            results = asyncio.run(run_scenarios(args, urls))
+
+            if args.metrics_dir:
+                os.makedirs(args.metrics_dir, exist_ok=True)
+                for name, url in urls.items():
+                    with open(os.path.join(args.metrics_dir, f"{name}.prom"), "w") as f:
+                        f.write(httpx.get(url + "/metrics", timeout=10).text)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            stub.shutdown()
+
+    if args.json:
+        params = {key: value for key, value in vars(args).items() if key not in ("json", "metrics_dir")}
+        save_results(args.json, "load_test", params, results)
+
+
+if __name__ == "__main__":
+    main()
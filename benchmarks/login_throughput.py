@@ -0,0 +1,52 @@
+"""Measures bcrypt login throughput through the backend's password pool.
+
+Usage:
+    python benchmarks/login_throughput.py --rounds 12 --logins 64
+
+For each worker count it verifies ``--logins`` passwords concurrently and
+reports logins per second overall and per core.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from passlib.context import CryptContext
+from password_pool import PasswordWorkerPool
+
+
+async def run_logins(pool: PasswordWorkerPool, context: CryptContext, hashed: str, logins: int) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[pool.run(context.verify, "benchmark-password", hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", "12")))
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="*", help="Worker counts to try (default: 1 and all cores)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, cores})
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("benchmark-password")
+
+    print(f"bcrypt rounds={args.rounds}, logins={args.logins}, cores={cores}")
+    for workers in worker_counts:
+        pool = PasswordWorkerPool(workers, max_pending=args.logins)
+        elapsed = asyncio.run(run_logins(pool, context, hashed, args.logins))
+        pool.shutdown()
+        throughput = args.logins / elapsed
+        per_core = throughput / min(workers, cores)
+        print(f"workers={workers:>3}  {throughput:8.1f} logins/s  {per_core:8.1f} logins/s/core")
+
+
+if __name__ == "__main__":
+    main()
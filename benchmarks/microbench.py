@@ -0,0 +1,149 @@
+"""Microbenchmarks of the request hot paths: asana suggestions, query embedding and FAISS search.
+
+Usage:
+    python benchmarks/microbench.py --repeat 2000 --json micro.json
+    python benchmarks/microbench.py --only suggest --similarity sparse
+
+suggest: ``AsanaRecommender.suggest`` (what ``suggest_asanas`` calls per
+request, cache bypassed), ``RecommendationCache.get`` (what ``/recommend/``
+calls) and ``suggest_many`` for three diseases, built from the compiled
+catalog like backend/main.py. embed: encoding one query and a batch of
+``--batch-size`` queries with the configured EMBEDDING_BACKEND. faiss:
+``index.search`` of the chat index for one query and for a batch. Each
+operation reports the mean and p50/p99 latency in microseconds and
+operations per second; ``--json`` writes them with the commit and machine
+they ran on (compare two runs with results.py).
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+BACKEND = os.path.join(ROOT, "backend")
+BACKEND1 = os.path.join(ROOT, "backend1")
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)), BACKEND, BACKEND1]
+
+from results import save_results
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DISEASES = [
+    'Anxiety', 'Digestive Issues', 'Poor Posture', 'Insomnia',
+    'Asthma', 'Fatigue', 'Back Pain', 'Sciatica', 'Depression', 'Stress',
+    'Endocrine Problems (Diabetes/Infertility/Thyroid)', 'Respiratory Diseases',
+    'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
+]
+
+
+def time_op(name: str, fn, repeat: int, warmup: int = 10) -> dict:
+    """Calls ``fn(i)`` ``repeat`` times and summarizes the per-call latency."""
+    for i in range(warmup):
+        fn(i)
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter_ns()
+        fn(i)
+        latencies[i] = (time.perf_counter_ns() - started) / 1000
+    row = {
+        "name": name,
+        "repeat": repeat,
+        "mean_us": float(latencies.mean()),
+        "p50_us": float(np.percentile(latencies, 50)),
+        "p99_us": float(np.percentile(latencies, 99)),
+        "ops_per_s": float(1e6 / latencies.mean()),
+    }
+    print(f"{name:<24} mean={row['mean_us']:10.1f}us  p50={row['p50_us']:10.1f}us  p99={row['p99_us']:10.1f}us  "
+          f"{row['ops_per_s']:10.1f} ops/s")
+    return row
+
+
+def bench_suggest(args) -> list:
+    from catalog import load_features
+    from recommendation import AsanaRecommender, RecommendationCache, build_neighbor_graph, cosine_similarity_matrix
+
+    csv_path = os.path.join(BACKEND, "yoga_asanas_and_diseases.csv")
+
+    def load(path):
+        table, features = load_features(path, os.path.join(BACKEND, "asana_catalog"))
+        if args.similarity == "sparse":
+            similarity = build_neighbor_graph(features, top_k=args.top_k)
+        else:
+            similarity = cosine_similarity_matrix(features)
+        return AsanaRecommender(table, similarity, diseases=DISEASES)
+
+    started = time.perf_counter()
+    recommender = load(csv_path)
+    print(f"recommender loaded in {time.perf_counter() - started:.2f}s ({args.similarity} similarity)")
+    cache = RecommendationCache(csv_path, lambda path: recommender, diseases=DISEASES)
+    cache.warm()
+    groups = [DISEASES[i:i + 3] for i in range(0, len(DISEASES), 3)]
+    return [
+        time_op("suggest", lambda i: recommender.suggest(DISEASES[i % len(DISEASES)], limit=20), args.repeat),
+        time_op("recommendation_cache_get", lambda i: cache.get(DISEASES[i % len(DISEASES)]), args.repeat),
+        time_op("suggest_many_3", lambda i: recommender.suggest_many(groups[i % len(groups)], limit=20), args.repeat),
+    ]
+
+
+def query_texts(limit: int) -> list:
+    from chunking import make_queries
+    from text_store import TextStore
+    corpus = [text for text in TextStore(os.path.join(BACKEND1, "text_data.store")) if text]
+    return [query for query, _ in make_queries(corpus, limit)]
+
+
+def bench_embed(args, model, queries) -> list:
+    batch = queries[:args.batch_size]
+    return [
+        time_op("embed_1", lambda i: model.encode([queries[i % len(queries)]], convert_to_numpy=True), args.repeat),
+        time_op(f"embed_{len(batch)}", lambda i: model.encode(batch, convert_to_numpy=True),
+                max(1, args.repeat // len(batch))),
+    ]
+
+
+def bench_faiss(args, vectors) -> list:
+    from index_factory import index_config_from_env, read_index_mmap, tune_index
+
+    index = tune_index(read_index_mmap(os.path.join(BACKEND1, "faiss_index.faiss")), index_config_from_env())
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    batch = vectors[:args.batch_size]
+    print(f"faiss index: {index.ntotal} vectors, d={index.d}")
+    return [
+        time_op("faiss_search_1", lambda i: index.search(vectors[i % len(vectors)][None, :], args.k), args.repeat),
+        time_op(f"faiss_search_{len(batch)}", lambda i: index.search(batch, args.k), args.repeat),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", default=["suggest", "embed", "faiss"], choices=["suggest", "embed", "faiss"])
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--similarity", choices=["dense", "sparse"], default=os.getenv("SIMILARITY_MODE", "dense"))
+    parser.add_argument("--top-k", type=int, default=int(os.getenv("SIMILARITY_TOP_K", "64")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if "suggest" in args.only:
+        results += bench_suggest(args)
+    if "embed" in args.only or "faiss" in args.only:
+        from embedding import embedding_config_from_env, load_embedder
+        model = load_embedder(EMBEDDING_MODEL, embedding_config_from_env())
+        queries = query_texts(args.queries)
+        if "embed" in args.only:
+            results += bench_embed(args, model, queries)
+        if "faiss" in args.only:
+            results += bench_faiss(args, model.encode(queries, convert_to_numpy=True))
+
+    if args.json:
+        params = {key: value for key, value in vars(args).items() if key != "json"}
+        params["embedding_backend"] = os.getenv("EMBEDDING_BACKEND", "torch")
+        save_results(args.json, "microbench", params, results)
+
+
+if __name__ == "__main__":
+    main()
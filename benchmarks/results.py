@@ -0,0 +1,99 @@
+"""Result files of load_test.py and microbench.py, and a diff between two of them.
+
+Usage:
+    python benchmarks/results.py before.json after.json --threshold 10
+
+Each file records the commit, machine and parameters of the run next to its
+results, so runs on two commits can be compared. Rows are matched by
+``name``; latencies (``*_ms``, ``*_us``, ``seconds``) and ``errors`` are
+better lower, rates (``*_rps``, ``*_per_s``) better higher. A change for the
+worse of more than ``--threshold`` percent is flagged and makes the exit
+status 1.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+LOWER_IS_BETTER = ("_ms", "_us", "seconds", "errors")
+HIGHER_IS_BETTER = ("_rps", "_per_s")
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_metadata() -> dict:
+    return {
+        "commit": _git("rev-parse", "HEAD") or None,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_results(path: str, benchmark: str, params: dict, results: list) -> None:
+    with open(path, "w") as f:
+        json.dump({"benchmark": benchmark, "meta": run_metadata(), "params": params, "results": results}, f, indent=2)
+
+
+def _direction(field: str) -> int:
+    if field.endswith(HIGHER_IS_BETTER):
+        return 1
+    if field.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float) -> list:
+    """(name, field, old, new, change %, regressed) for every numeric field present in both runs."""
+    before = {row["name"]: row for row in old["results"]}
+    rows = []
+    for row in new["results"]:
+        previous = before.get(row["name"])
+        if previous is None:
+            continue
+        for field, value in row.items():
+            reference = previous.get(field)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(reference, (int, float)):
+                continue
+            direction = _direction(field)
+            if direction == 0:
+                continue
+            change = (value - reference) / reference * 100 if reference else 0.0
+            rows.append((row["name"], field, reference, value, change, -direction * change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change counted as a regression")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{(old['meta']['commit'] or '?')[:10]} -> {(new['meta']['commit'] or '?')[:10]}  ({new['benchmark']})")
+    rows = compare(old, new, args.threshold)
+    for name, field, reference, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<32} {field:<14} {reference:12.3f} -> {value:12.3f}  {change:+7.1f}%{flag}")
+    regressions = sum(regressed for *_, regressed in rows)
+    print(f"{regressions} regression(s) beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
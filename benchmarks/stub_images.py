@@ -0,0 +1,23 @@
+"""Local stand-in for the image scraper behind /search-images.
+
+Point the chat backend at it with IMAGE_FETCHER=stub_images:fetch (with
+benchmarks/ on PYTHONPATH). Each fetch sleeps STUB_IMAGE_LATENCY seconds
+(default 0.2) and returns ``count`` deterministic URLs for the prompt.
+"""
+import os
+import time
+import threading
+from urllib.parse import quote
+
+LATENCY = float(os.getenv("STUB_IMAGE_LATENCY", "0.2"))
+
+fetches = 0
+_lock = threading.Lock()
+
+
+def fetch(prompt: str, count: int):
+    global fetches
+    with _lock:
+        fetches += 1
+    time.sleep(LATENCY)
+    return [f"https://images.example/{quote(prompt)}/{i}.jpg" for i in range(count)]
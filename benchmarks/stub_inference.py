@@ -0,0 +1,122 @@
+"""Local stand-in for the Hugging Face text-generation inference API.
+
+Usage:
+    python benchmarks/stub_inference.py --port 8090 --latency 0.2 --token-delay 0.01
+
+Point the services at it with HF_API_URL=http://127.0.0.1:8090/models/stub.
+A POST with {"inputs": ...} answers [{"generated_text": ...}] after
+``--latency`` seconds; with "stream": true it sends server-sent events, one
+token every ``--token-delay`` seconds. ``--fail-every N`` answers every Nth
+request with 503 to exercise client retries, with a ``Retry-After`` header
+when ``--retry-after`` is given.
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ANSWER = "Yoga improves flexibility, strength and breathing. Practice regularly and mindfully."
+
+
+class StubInferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    token_delay = 0.0
+    fail_every = 0
+    retry_after = None
+    requests_seen = 0
+    connections_seen = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        cls = type(self)
+        with cls.lock:
+            cls.connections_seen += 1
+
+    def _send_json(self, status: int, body, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        cls = type(self)
+        with cls.lock:
+            cls.requests_seen += 1
+            failing = cls.fail_every and cls.requests_seen % cls.fail_every == 0
+        if failing:
+            headers = {"Retry-After": f"{cls.retry_after:g}"} if cls.retry_after is not None else None
+            self._send_json(503, {"error": "Model is currently loading"}, headers)
+            return
+        if "inputs" not in payload:
+            self._send_json(400, {"error": "Missing inputs"})
+            return
+
+        time.sleep(cls.latency)
+        parameters = payload.get("parameters") or {}
+        text = STUB_ANSWER if parameters.get("return_full_text") is False else payload["inputs"] + " " + STUB_ANSWER
+        if not payload.get("stream"):
+            self._send_json(200, [{"generated_text": text}])
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = STUB_ANSWER.split(" ")
+        for i, word in enumerate(words):
+            event = {"token": {"id": i, "text": word if i == 0 else " " + word, "special": False}, "generated_text": None}
+            if i == len(words) - 1:
+                event["generated_text"] = STUB_ANSWER
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(cls.token_delay)
+        self.close_connection = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8090, latency: float = 0.0,
+          token_delay: float = 0.0, fail_every: int = 0, retry_after: float = None) -> ThreadingHTTPServer:
+    """Starts the stub in a background thread and returns the server.
+
+    ``server.RequestHandlerClass`` counts ``requests_seen`` and
+    ``connections_seen``.
+    """
+    handler = type("ConfiguredStubHandler", (StubInferenceHandler,), {
+        "latency": latency, "token_delay": token_delay, "fail_every": fail_every, "retry_after": retry_after,
+        "requests_seen": 0, "connections_seen": 0, "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with 503")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with those 503s")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency, args.token_delay, args.fail_every, args.retry_after)
+    print(f"Stub inference API listening on http://{args.host}:{server.server_port}/models/stub")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Wall-clock time and peak memory: single-call vs map-reduce summarization.
+
+Usage:
+    python benchmarks/summarization.py --pages 40 --workers 1 2
+    python benchmarks/summarization.py --model facebook/bart-large-cnn --json summaries.json
+
+The document is the first ``--pages`` entries of the chatbot text store.
+"single" passes the whole text to the model in one call, as app.py did
+(everything past the model's window is truncated); "map_reduce" runs
+``MapReduceSummarizer`` with each ``--workers`` count. Every run is a fresh
+interpreter, so peak RSS (Linux VmHWM) covers one mode only. Map-reduce
+runs then edit one page and summarize again to show the per-chunk cache.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(ROOT, "backend1"))
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) / 1024
+
+
+def run_mode(args) -> dict:
+    from chunker import ChunkConfig, TokenChunker
+    from summarizer import MapReduceSummarizer, SummaryConfig, seq2seq_summarize_batch
+    from text_store import TextStore
+
+    pages = [text for text in TextStore(args.data) if text.strip()][:args.pages]
+    summarize = seq2seq_summarize_batch(args.model, args.batch_size)
+    chunker = TokenChunker(summarize.tokenizer, ChunkConfig(args.window, 64))
+    config = SummaryConfig(batch_size=args.batch_size, workers=args.workers)
+    total_tokens = int(chunker.count_tokens(["\n".join(pages)])[0])
+    row = {"mode": args.run, "workers": args.workers, "pages": len(pages), "document_tokens": total_tokens}
+
+    start = time.perf_counter()
+    if args.run == "single":
+        summary = summarize(["\n".join(pages)], config.max_length, config.min_length)[0]
+        row["tokens_read"] = min(total_tokens, args.window)
+    else:
+        summarizer = MapReduceSummarizer(summarize, chunker, config)
+        summary = summarizer.summarize(pages)
+        row["tokens_read"] = total_tokens
+    row["seconds"] = time.perf_counter() - start
+    row["summary_chars"] = len(summary)
+
+    if args.run == "map_reduce":
+        edited = list(pages)
+        edited[len(edited) // 2] += "\nThis page was edited after the first summary."
+        before = summarizer.stats()["misses"]
+        start = time.perf_counter()
+        summarizer.summarize(edited)
+        row["edited_seconds"] = time.perf_counter() - start
+        row["edited_chunks_summarized"] = summarizer.stats()["misses"] - before
+    row["peak_rss_mb"] = peak_rss_mb()
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default=os.path.join(ROOT, "backend1", "text_data.store"))
+    parser.add_argument("--model", default="facebook/bart-large-cnn")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--window", type=int, default=1024, help="Model input window in tokens")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2])
+    parser.add_argument("--json", help="Write the results to this file as JSON")
+    parser.add_argument("--run", choices=["single", "map_reduce"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        args.workers = args.workers[0]
+        print(json.dumps(run_mode(args)))
+        return
+
+    common = ["--data", args.data, "--model", args.model, "--pages", str(args.pages),
+              "--window", str(args.window), "--batch-size", str(args.batch_size)]
+    runs = [("single", 1)] + [("map_reduce", workers) for workers in args.workers]
+    results = []
+    for mode, workers in runs:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run", mode,
+                                    "--workers", str(workers)] + common, capture_output=True, text=True, check=True)
+        row = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(row)
+        line = (f"{mode:<10} workers={workers} {row['seconds']:7.1f}s peak_rss={row['peak_rss_mb']:6.0f}MB "
+                f"read {row['tokens_read']}/{row['document_tokens']} tokens")
+        if "edited_seconds" in row:
+            line += f"  after editing one page: {row['edited_seconds']:.1f}s, {row['edited_chunks_summarized']} chunks"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
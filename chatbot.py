@@ -1,22 +1,34 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import requests
-import faiss
-import pickle
-import numpy as np
-from sentence_transformers import SentenceTransformer
 import os
+import sys
 from dotenv import load_dotenv  
 import logging
+import threading
+
+# The LLM client, response cache and index helpers are shared with the FastAPI chat backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend1"))
+from llm_client import LLMClient, LLMConnectionError, LLMError
+from response_cache import SemanticResponseCache, context_key
+from chat_index import corpus_fingerprint
+from embedding import embedder_id, embedding_config_from_env, load_embedder
+from index_factory import index_config_from_env, read_index_mmap, tune_index
+from instrumentation import instrument_flask, register_stats
+from query_batcher import QueryBatcher, batched_search
+from text_store import TextStore
+from warmup import Warmup, startup_mode_from_env
 
 # Load environment variables
 load_dotenv()
 HF_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 
-HF_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+HF_API_URL = os.getenv(
+    "HF_API_URL", "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.3"
+)
 
-INDEX_PATH = "faiss_index.pkl"
-DATA_PATH = "text_data.pkl"
+# Native files written by process_pdf.py (convert old .pkl files with backend1/migrate_artifacts.py)
+INDEX_PATH = "faiss_index.faiss"
+DATA_PATH = "text_data.store"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 RELEVANCE_THRESHOLD = 1.0
@@ -25,49 +37,109 @@ TOP_K = 3  # Number of results to retrieve
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Load SentenceTransformer model
-model = SentenceTransformer(EMBEDDING_MODEL)
-
-# Load FAISS index & text data with error handling
-try:
-    if os.path.exists(INDEX_PATH) and os.path.exists(DATA_PATH):
-        with open(INDEX_PATH, "rb") as f:
-            index = pickle.load(f)
-        with open(DATA_PATH, "rb") as f:
-            text_data = pickle.load(f)
-
-        if not isinstance(index, faiss.IndexFlatL2):
-            raise ValueError("Loaded FAISS index is not a valid IndexFlatL2 object")
-        logging.info("FAISS index and text data loaded successfully!")
-    else:
-        raise FileNotFoundError("FAISS index or text data file is missing.")
-except Exception as e:
-    logging.error(f"Error loading FAISS index or text data: {e}")
-    index, text_data = None, []
+# The embedding model, FAISS index and text data are loaded by load_resources(): in a
+# background warm-up thread at startup (STARTUP_MODE=background, the default), before
+# serving (eager) or on the first query (lazy). "/" and "/health" answer right away,
+# "/ready" reports when retrieval can be served.
+model = None
+index = None
+text_data = []
+# Digest of the loaded text store and embedding model; namespaces cached answers,
+# since after a re-ingest the same chunk ids point to different text
+index_fingerprint = ""
+_resources_lock = threading.Lock()
+
+def load_embedding_model():
+    """Loads the embedding model (EMBEDDING_BACKEND=torch, onnx or onnx-int8; it must match the one used by process_pdf.py)."""
+    global model
+    with _resources_lock:
+        if model is None:
+            model = load_embedder(EMBEDDING_MODEL, embedding_config_from_env())
+    return model
+
+def load_search_index():
+    """Loads the FAISS index and text data; raises if either file is missing."""
+    global index, text_data, index_fingerprint
+    with _resources_lock:
+        if index is None:
+            if not (os.path.exists(INDEX_PATH) and os.path.exists(DATA_PATH)):
+                raise FileNotFoundError("FAISS index or text data file is missing.")
+            # Both files are memory-mapped, so every worker shares one page-cached copy
+            loaded = read_index_mmap(INDEX_PATH)
+            text_data = TextStore(DATA_PATH)
+            index_fingerprint = corpus_fingerprint(text_data, embedder_id(EMBEDDING_MODEL, embedding_config_from_env()))
+            # Any index type is accepted; nprobe/efSearch come from CHAT_INDEX_NPROBE/CHAT_INDEX_EF_SEARCH
+            tune_index(loaded, index_config_from_env())
+            index = loaded
+            logging.info("FAISS index and text data loaded successfully!")
+    return index
+
+def load_resources():
+    load_search_index()
+    load_embedding_model()
+
+def search_batch(queries):
+    load_resources()
+    return batched_search(lambda texts: model.encode(texts, convert_to_numpy=True), index, TOP_K)(queries)
+
+# Concurrent queries share one model.encode and index.search call; a batch closes
+# after EMBED_BATCH_SIZE queries or EMBED_BATCH_WAIT_MS after its first one.
+query_batcher = QueryBatcher(
+    search_batch,
+    max_batch=int(os.getenv("EMBED_BATCH_SIZE", "32")),
+    max_wait=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")) / 1000,
+    timeout=float(os.getenv("EMBED_BATCH_TIMEOUT", "30")),
+)
+
+warmup = Warmup(startup_mode_from_env())
+warmup.register("faiss_index", load_search_index, lambda: index is not None)
+warmup.register("embedding_model", load_embedding_model, lambda: model is not None)
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# One pooled session to the inference API, with retries and a concurrency limit
+llm_client = LLMClient(
+    HF_API_URL,
+    api_key=HF_API_KEY,
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "15")),
+)
 
 # Flask App Initialization
 app = Flask(__name__)
 CORS(app)
-
-def search_similar_text(query):
-    """Search for similar text using FAISS."""
-    if index is None:
-        logging.error("FAISS index is not loaded.")
-        return []
-
-    query_embedding = model.encode([query], convert_to_numpy=True)
-
-    # Ensure query_embedding has correct shape (1, d)
-    query_embedding = np.array(query_embedding).reshape(1, -1)
-
+# METRICS_ENABLED=1 times requests and hot-path stages and serves them on GET /metrics
+instrument_flask(app)
+
+# Answers are reused for near-identical questions that retrieve the same context
+response_cache = SemanticResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+    max_distance=float(os.getenv("RESPONSE_CACHE_DISTANCE", "0.1")),
+    db_path=os.getenv("RESPONSE_CACHE_DB") or None,
+)
+
+register_stats("query_batcher", query_batcher.stats)
+register_stats("response_cache", response_cache.stats)
+register_stats("warmup", lambda: {"ready": warmup.ready})
+
+def retrieve_context(query):
+    """Returns the query embedding and the ids and texts of similar entries."""
     try:
-        distances, indices = index.search(query_embedding, TOP_K)
-        relevant_texts = [text_data[i] for i, d in zip(indices[0], distances[0]) if d <= RELEVANCE_THRESHOLD]
+        # Encoded and searched together with any concurrent queries
+        result = query_batcher.submit(query)
+        ids = [int(i) for i, d in zip(result.ids, result.distances) if d <= RELEVANCE_THRESHOLD]
+        relevant_texts = [text_data[i] for i in ids]
         logging.info(f"Retrieved {len(relevant_texts)} relevant texts for query: {query}")
-        return relevant_texts
+        return result.embedding, ids, relevant_texts
     except Exception as e:
         logging.error(f"Error in FAISS search: {e}")
-        return []
+        return None, [], []
+
+def search_similar_text(query):
+    """Search for similar text using FAISS."""
+    return retrieve_context(query)[2]
 
 def query_huggingface(prompt):
     """Query Hugging Face model with relevant context."""
@@ -75,13 +147,16 @@ def query_huggingface(prompt):
         logging.error("Hugging Face API key is missing.")
         return "Sorry, I can't process your request right now."
 
-    headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-    
-    retrieved_text = search_similar_text(prompt)
+    query_embedding, context_ids, retrieved_text = retrieve_context(prompt)
     
     if not retrieved_text:
         return "Sorry, no relevant response found."
 
+    cache_key = context_key(context_ids, index_fingerprint)
+    cached = response_cache.lookup(query_embedding, cache_key)
+    if cached is not None:
+        return cached
+
     formatted_context = "\n".join([f"{i+1}. {text}" for i, text in enumerate(retrieved_text)])
 
     full_prompt = (
@@ -92,24 +167,38 @@ def query_huggingface(prompt):
         "Provide a structured response including key points."
     )
 
-    payload = {"inputs": full_prompt}
     try:
-        response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=15)
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and result and "generated_text" in result[0]:
-                generated_text = result[0]["generated_text"].strip()
-                return generated_text if generated_text else "Sorry, I couldn't generate a response."
-        logging.error(f"Hugging Face API response error: {response.status_code} {response.text}")
-        return "I'm experiencing technical difficulties. Please try again later."
-    except requests.exceptions.RequestException as e:
+        generated_text = llm_client.generate(full_prompt)
+        if not generated_text:
+            return "Sorry, I couldn't generate a response."
+        response_cache.store(query_embedding, cache_key, generated_text)
+        return generated_text
+    except LLMConnectionError as e:
         logging.error(f"Request error to Hugging Face API: {e}")
         return "I'm experiencing connectivity issues. Please try again later."
+    except LLMError as e:
+        logging.error(f"Hugging Face API response error: {e}")
+        return "I'm experiencing technical difficulties. Please try again later."
 
 @app.route("/")
 def home():
     return "Welcome to your Yoga Chatbot! Ask me anything about yoga, health, and wellness."
 
+@app.route("/health")
+def health():
+    return jsonify({"status": "ok"})
+
+@app.route("/ready")
+def ready():
+    status = warmup.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route("/admin/embedding-stats")
+def embedding_stats():
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Not allowed"}), 403
+    return jsonify(query_batcher.stats())
+
 @app.route("/get_response", methods=["POST"])
 def get_response():
     data = request.get_json()
@@ -120,5 +209,8 @@ def get_response():
     bot_response = query_huggingface(user_input)
     return jsonify({"response": bot_response})
 
+# Flask has no startup event, so the warm-up starts when the module is loaded
+warmup.start()
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001)
@@ -1,56 +1,61 @@
-import fitz  # PyMuPDF
-import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import pickle
+import argparse
+import logging
 import os
+import sys
+
+# The index factory is shared with the FastAPI chat backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend1"))
+from chunker import ChunkConfig, TokenChunker
+from embedding import embedder_id, embedding_config_from_env, load_embedder
+from index_factory import index_config_from_env
+from ingest import find_pdfs, ingest
 
 PDF_PATH = "2100-Asanas.pdf"
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-INDEX_PATH = "faiss_index.pkl"
-DATA_PATH = "text_data.pkl"
-
-# Load Sentence Transformer model
-model = SentenceTransformer(EMBEDDING_MODEL)
-
-def extract_text_from_pdf(pdf_path):
-    """Extracts text from PDF and returns a list of text chunks."""
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"Error: PDF file '{pdf_path}' not found!")
-
-    doc = fitz.open(pdf_path)
-    text_chunks = [page.get_text("text") for page in doc if page.get_text("text").strip()]
-    
-    if not text_chunks:
-        raise ValueError("Error: Extracted text is empty. Please check the PDF content.")
-
-    return text_chunks
-
-def create_embeddings(text_chunks):
-    """Generates embeddings and stores them in FAISS for fast retrieval."""
-    if not text_chunks:
-        raise ValueError("Error: No text data to process.")
-
-    embeddings = model.encode(text_chunks, convert_to_numpy=True)
-
-    # Ensure embeddings are 2D
-    embeddings = np.array(embeddings).astype('float32')
-
-    # Create FAISS index
-    index = faiss.IndexFlatL2(embeddings.shape[1])  
-    index.add(embeddings)
-
-    # Save index and text data
-    with open(INDEX_PATH, "wb") as f:
-        pickle.dump(index, f)
-    with open(DATA_PATH, "wb") as f:
-        pickle.dump(text_chunks, f)
-
-    print(f"✅ Embeddings created and stored in FAISS!")
-
-# Run extraction & embedding
-try:
-    text_data = extract_text_from_pdf(PDF_PATH)
-    create_embeddings(text_data)
-except Exception as e:
-    print(f"❌ Error: {e}")
+INDEX_PATH = "faiss_index.faiss"
+DATA_PATH = "text_data.store"
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the chatbot's FAISS index and text store from PDFs.")
+    parser.add_argument("paths", nargs="*", default=[PDF_PATH], help="PDF files or directories of PDFs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Page extraction processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="Pages embedded per model call")
+    parser.add_argument("--max-pending", type=int, default=8, help="Page ranges extracted ahead of embedding")
+    parser.add_argument("--chunk-tokens", type=int, help="Tokens per chunk (default: the model's window, 0 = one chunk per page)")
+    parser.add_argument("--chunk-overlap", type=int, default=32, help="Tokens shared by consecutive chunks")
+    parser.add_argument("--full", action="store_true", help="Re-embed everything instead of only changed pages")
+    parser.add_argument("--index-out", default=INDEX_PATH)
+    parser.add_argument("--data-out", default=DATA_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Load the embedding model (EMBEDDING_BACKEND=torch, onnx or onnx-int8, EMBEDDING_THREADS)
+    embedding_config = embedding_config_from_env()
+    model = load_embedder(EMBEDDING_MODEL, embedding_config)
+
+    # Chunks sized to the model's window (all-MiniLM-L6-v2 truncates after 256 tokens)
+    chunk_tokens = model.max_seq_length if args.chunk_tokens is None else args.chunk_tokens
+    chunker = TokenChunker(model.tokenizer, ChunkConfig(chunk_tokens, args.chunk_overlap)) if chunk_tokens else None
+
+    def encode(texts):
+        return np.asarray(model.encode(texts, convert_to_numpy=True, batch_size=args.batch_size), dtype="float32")
+
+    try:
+        pdfs = find_pdfs(args.paths)
+        if not pdfs:
+            raise FileNotFoundError(f"No PDF files found in {', '.join(args.paths)}")
+        # CHAT_INDEX_TYPE selects flat, ivf_flat, ivf_pq or hnsw
+        stats = ingest(pdfs, encode, args.index_out, args.data_out, config=index_config_from_env(),
+                       model_name=embedder_id(EMBEDDING_MODEL, embedding_config), chunker=chunker,
+                       full=args.full, workers=args.workers, batch_size=args.batch_size,
+                       max_pending=args.max_pending)
+        print(f"✅ Embeddings created and stored in FAISS! {stats.documents} PDFs, {stats.pages} pages, "
+              f"{stats.chunks} chunks ({stats.embedded} embedded, {stats.removed} removed) in {stats.seconds:.1f}s "
+              f"({stats.pages_per_second:.1f} pages/s, {stats.chunks_per_second:.1f} chunks/s)")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,18 @@
+import os
+import sys
 import streamlit as st
-import pandas as pd
-import difflib
-from joblib import dump
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-# Load dataset
-df = pd.read_csv('yoga_asanas_and_diseases.csv')
+# The recommendation engine lives with the FastAPI backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from audit_log import AuditLog
+from catalog import load_features
+from recommendation import AsanaRecommender, RecommendationCache, build_neighbor_graph, cosine_similarity_matrix
 
-# Fill NaN values with empty strings
-selected_features = [
-    'Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5',
-    'Should Not Perform Reason 1', 'Should Not Perform Reason 2',
-    'Should Not Perform 3', 'Should Not Perform 4', 'Should Not Perform 5'
-]
-for feature in selected_features:
-    df[feature] = df[feature].fillna('')
-
-# Combine features into a single string for vectorization
-combined_features = (df['Disease 1'] + ' ' +
-                     df['Disease 2'] + ' ' +
-                     df['Disease 3'] + ' ' +
-                     df['Disease 4'] + ' ' +
-                     df['Disease 5'] + ' ' +
-                     df['Should Not Perform Reason 1'] + ' ' +
-                     df['Should Not Perform Reason 2'] + ' ' +
-                     df['Should Not Perform 3'] + ' ' +
-                     df['Should Not Perform 4'] + ' ' +
-                     df['Should Not Perform 5'])
-
-# Vectorize combined features
-vectorizer = TfidfVectorizer()
-feature_vectors = vectorizer.fit_transform(combined_features)
-similarity = cosine_similarity(feature_vectors)
+CSV_PATH = 'yoga_asanas_and_diseases.csv'
+# Compiled from the CSV with backend/catalog.py; used while it matches the CSV
+CATALOG_PATH = os.getenv("ASANA_CATALOG", "asana_catalog")
+# Append-only JSON-lines log of the suggestions shown; off unless set
+SUGGESTION_LOG = os.getenv("SUGGESTION_LOG", "")
 
 # List of diseases for the dropdown menu
 diseases = [
@@ -42,47 +22,41 @@ diseases = [
     'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
 ]
 
-# Function to suggest asanas
-def suggest_asanas(name):
-    suggested_facilities = set()
-    results = []
+def load_recommender(csv_path):
+    # Load the compiled catalog (see backend/catalog.py), or parse the CSV if it is missing or stale
+    table, feature_vectors = load_features(csv_path, CATALOG_PATH)
 
-    for column in ['Disease 1', 'Disease 2', 'Disease 3', 'Disease 4', 'Disease 5']:
-        close_match = None
-        find_close_match = difflib.get_close_matches(name, df[column].tolist())
-        if find_close_match:
-            close_match = find_close_match[0]
-            index_of_the_disease = df[df[column] == close_match]['Index'].values
-            if len(index_of_the_disease) > 0:
-                similarity_score = list(enumerate(similarity[index_of_the_disease[0]]))
-                sorted_similar_asanas = sorted(similarity_score, key=lambda x: x[1], reverse=True)
-                i = 1
-                for x in sorted_similar_asanas:
-                    index = x[0]
-                    asana_info = df[df['Index'] == index]
-                    if not asana_info.empty:
-                        asana_name = asana_info['Asana Name'].values[0]
-                        reasons = []
-                        for j in range(1, 6):
-                            column_name = f'Should Not Perform Reason {j}'
-                            if column_name in asana_info.columns:
-                                reason = asana_info[column_name].values[0]
-                                if reason:
-                                    reasons.append(reason)
+    # SIMILARITY_MODE=sparse keeps only top-k neighbors per asana
+    if os.getenv("SIMILARITY_MODE", "dense") == "sparse":
+        similarity = build_neighbor_graph(feature_vectors, top_k=int(os.getenv("SIMILARITY_TOP_K", "64")))
+    else:
+        similarity = cosine_similarity_matrix(feature_vectors)
 
-                        asana_details = (asana_name, *reasons)
-                        if asana_details not in suggested_facilities:
-                            suggested_facilities.add(asana_details)
-                            if i <= 20:
-                                results.append(
-                                    {
-                                        "Asana Name": asana_name,
-                                        "Reasons Not to Perform": reasons
-                                    }
-                                )
-                                i += 1
+    # Disease matches and per-asana contraindications are resolved once here
+    return AsanaRecommender(table, similarity, diseases=diseases)
+
+# Streamlit reruns this script on every interaction; the recommender is built once per
+# process and shared by all sessions. Results are memoized per disease, and the dataset
+# is reloaded (dropping them) when the CSV changes on disk.
+@st.cache_resource
+def get_recommendation_cache():
+    cache = RecommendationCache(CSV_PATH, load_recommender, diseases=diseases, limit=20, first_match_only=False)
+    cache.warm()
+    return cache
+
+@st.cache_resource
+def get_suggestion_log():
+    return AuditLog(SUGGESTION_LOG) if SUGGESTION_LOG else None
+
+# Function to suggest asanas
+def suggest_asanas(name):
+    cache = get_recommendation_cache()
+    results, _ = cache.get(name)
 
-    dump(suggested_facilities, 'suggested_facilities')
+    log = get_suggestion_log()
+    if log is not None:
+        # Written by a background thread; the click does not wait for the disk
+        log.record({"disease": name, "dataset": cache.version, "asanas": [r["Asana Name"] for r in results]})
     return results
 
 # Streamlit UI
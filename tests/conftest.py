@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# The services import their modules flat, the way they are run
+sys.path[:0] = [os.path.join(ROOT, "backend1"), os.path.join(ROOT, "backend"), os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,31 @@
+import pytest
+
+from chunker import ChunkConfig, TokenChunker, split_units
+
+
+def test_overlap_must_leave_room_after_special_tokens():
+    # The word-piece fallback reserves 2 special tokens: a budget of 8 for max_tokens=10
+    for overlap in (8, 9):
+        with pytest.raises(ValueError, match="overlap"):
+            TokenChunker(config=ChunkConfig(max_tokens=10, overlap=overlap))
+    with pytest.raises(ValueError, match="overlap"):
+        TokenChunker(config=ChunkConfig(max_tokens=10, overlap=-1))
+    assert TokenChunker(config=ChunkConfig(max_tokens=10, overlap=7)).budget == 8
+
+
+def test_largest_overlap_still_advances_through_long_units():
+    chunker = TokenChunker(config=ChunkConfig(max_tokens=10, overlap=7))
+    text = " ".join(f"w{i}" for i in range(30))
+    chunks = chunker.chunk(text)
+    assert all(n <= chunker.budget for n in chunker.count_tokens(chunks))
+    assert chunks[0].startswith("w0") and chunks[-1].endswith("w29")
+    assert len(chunks) == 23  # one new token per window
+
+
+def test_chunks_fit_the_budget_and_overlap():
+    chunker = TokenChunker(config=ChunkConfig(max_tokens=12, overlap=4))
+    text = "Breathe in slowly. Hold it. Breathe out slowly. Relax the shoulders. Repeat five times."
+    chunks = chunker.chunk(text)
+    assert len(chunks) > 1
+    assert all(n <= chunker.budget for n in chunker.count_tokens(chunks))
+    assert set(split_units(text)) <= {unit for chunk in chunks for unit in chunk.split("\n")}
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+import stub_images
+from image_search import ImageSearcher, ImageURLCache
+
+
+@pytest.fixture
+def fetch(monkeypatch):
+    monkeypatch.setattr(stub_images, "LATENCY", 0.05)
+    monkeypatch.setattr(stub_images, "fetches", 0)
+    return stub_images.fetch
+
+
+def test_repeated_and_normalized_prompts_hit_the_cache(fetch):
+    searcher = ImageSearcher(fetch, ImageURLCache())
+    urls = searcher.search("Downward Dog Pose", 3)
+    assert len(urls) == 3
+    assert searcher.search("Downward Dog Pose", 3) == urls
+    assert searcher.search("  downward DOG   pose! ", 3) == urls
+    assert stub_images.fetches == 1
+    stats = searcher.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_count_is_part_of_the_key(fetch):
+    searcher = ImageSearcher(fetch, ImageURLCache())
+    searcher.search("tree pose", 2)
+    assert len(searcher.search("tree pose", 4)) == 4
+    assert stub_images.fetches == 2
+
+
+def test_entries_expire_after_ttl(fetch):
+    searcher = ImageSearcher(fetch, ImageURLCache(ttl=0.2))
+    searcher.search("cobra pose", 2)
+    searcher.search("cobra pose", 2)
+    assert stub_images.fetches == 1
+    time.sleep(0.3)
+    assert "2:cobra pose" not in searcher.cache
+    searcher.search("cobra pose", 2)
+    assert stub_images.fetches == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ImageURLCache(max_entries=2)
+    cache.put("a", ["a.jpg"])
+    time.sleep(0.01)
+    cache.put("b", ["b.jpg"])
+    time.sleep(0.01)
+    assert cache.get("a") == ["a.jpg"]
+    time.sleep(0.01)
+    cache.put("c", ["c.jpg"])
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a.jpg"]
+    assert cache.get("c") == ["c.jpg"]
+
+
+def test_concurrent_callers_share_one_fetch(fetch, monkeypatch):
+    monkeypatch.setattr(stub_images, "LATENCY", 0.3)
+    searcher = ImageSearcher(fetch, ImageURLCache(), max_workers=4)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(searcher.search("Warrior Pose", 2))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8 and all(urls == results[0] for urls in results)
+    assert stub_images.fetches == 1
+    stats = searcher.stats()
+    assert stats["misses"] + stats["coalesced"] + stats["hits"] == 8
+    assert stats["misses"] == 1
+
+
+def test_concurrent_async_callers_share_one_fetch(fetch):
+    searcher = ImageSearcher(fetch, ImageURLCache())
+
+    async def main():
+        return await asyncio.gather(*(searcher.asearch("bridge pose", 2) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert all(urls == results[0] for urls in results)
+    assert stub_images.fetches == 1
+
+
+def test_timed_out_fetch_is_still_cached(fetch, monkeypatch):
+    monkeypatch.setattr(stub_images, "LATENCY", 0.3)
+    searcher = ImageSearcher(fetch, ImageURLCache(), timeout=0.05)
+    with pytest.raises(FutureTimeout):
+        searcher.search("lotus pose", 2)
+    deadline = time.time() + 5
+    while "2:lotus pose" not in searcher.cache and time.time() < deadline:
+        time.sleep(0.02)
+    assert searcher.search("lotus pose", 2) == [f"https://images.example/lotus%20pose/{i}.jpg" for i in range(2)]
+    assert stub_images.fetches == 1
+    assert searcher.stats()["hits"] == 1
+
+
+def test_asearch_timeout_does_not_cancel_the_fetch(fetch, monkeypatch):
+    monkeypatch.setattr(stub_images, "LATENCY", 0.3)
+    searcher = ImageSearcher(fetch, ImageURLCache(), timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(searcher.asearch("child pose", 2))
+    deadline = time.time() + 5
+    while "2:child pose" not in searcher.cache and time.time() < deadline:
+        time.sleep(0.02)
+    assert "2:child pose" in searcher.cache
+    assert stub_images.fetches == 1
+
+
+def test_prefetch_gives_up_on_a_hung_fetch_and_can_restart(monkeypatch):
+    release = threading.Event()
+
+    def hanging(prompt, count):
+        if prompt == "stuck":
+            release.wait(5)
+        return [f"{prompt}.jpg"]
+
+    searcher = ImageSearcher(hanging, ImageURLCache(), timeout=0.1)
+    searcher.prefetch(["stuck", "mountain pose"], 1)
+    deadline = time.time() + 5
+    while searcher._prefetch_thread is not None and time.time() < deadline:
+        time.sleep(0.02)
+    assert searcher._prefetch_thread is None
+    assert "1:mountain pose" in searcher.cache
+
+    searcher.prefetch(["plank pose"], 1)
+    deadline = time.time() + 5
+    while "1:plank pose" not in searcher.cache and time.time() < deadline:
+        time.sleep(0.02)
+    assert "1:plank pose" in searcher.cache
+    release.set()
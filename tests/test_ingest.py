@@ -0,0 +1,104 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+import ingest as ingest_module
+from index_factory import IndexConfig, build_index, load_index, tune_index
+from ingest import IncrementalIndex, Page, ingest
+from text_store import TextStore
+
+DIM = 16
+CONFIGS = {
+    "flat": IndexConfig(kind="flat"),
+    "ivf_flat": IndexConfig(kind="ivf_flat", nlist=4, nprobe=4),
+    "ivf_pq": IndexConfig(kind="ivf_pq", nlist=4, nprobe=4, pq_m=16, pq_nbits=8),
+    "hnsw": IndexConfig(kind="hnsw", hnsw_m=16, ef_construction=64, ef_search=64),
+}
+
+
+def encode(texts):
+    """A fixed random vector per text, so a text's stored vector is found by searching for it again."""
+    rows = []
+    for text in texts:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        rows.append(np.random.default_rng(seed).standard_normal(DIM))
+    return np.asarray(rows, dtype="float32")
+
+
+@pytest.fixture
+def library(monkeypatch):
+    """PDF path -> page texts, read by ingest in place of PyMuPDF."""
+    documents = {}
+    monkeypatch.setattr(ingest_module, "page_count", lambda path: len(documents[path]))
+    monkeypatch.setattr(ingest_module, "extract_pages", lambda task: [
+        Page(task[0], number, documents[task[0]][number]) for number in range(task[1], task[2])
+    ])
+    return documents
+
+
+def assert_index_matches_store(index_path, data_path, config):
+    index = load_index(index_path, config)
+    store = TextStore(data_path)
+    live = {i: text for i, text in enumerate(store) if text}
+    assert index.ntotal == len(live)
+    ids = np.array(sorted(live))
+    _, found = index.search(encode([live[i] for i in ids]), 1)
+    np.testing.assert_array_equal(found[:, 0], ids)
+
+
+@pytest.mark.parametrize("kind", sorted(CONFIGS))
+def test_incremental_ingest_adds_changes_and_removes_pages(kind, library, tmp_path):
+    config = CONFIGS[kind]
+    index_path, data_path = str(tmp_path / "index.faiss"), str(tmp_path / "text.store")
+    library["a.pdf"] = [f"a page {i}" for i in range(120)]
+    library["b.pdf"] = [f"b page {i}" for i in range(80)]
+
+    stats = ingest(["a.pdf", "b.pdf"], encode, index_path, data_path, config, model_name="m", batch_size=32)
+    assert (stats.pages, stats.embedded, stats.removed) == (200, 200, 0)
+    assert_index_matches_store(index_path, data_path, config)
+
+    library["a.pdf"][3] = "a page 3, revised"
+    library["a.pdf"][90] = "a page 90, revised"
+    del library["a.pdf"][40]
+    library["c.pdf"] = [f"c page {i}" for i in range(10)]
+    stats = ingest(["a.pdf", "c.pdf"], encode, index_path, data_path, config, model_name="m", batch_size=32)
+    assert stats.embedded == 12
+    assert stats.removed == 80 + 3
+    assert_index_matches_store(index_path, data_path, config)
+
+    stats = ingest(["a.pdf", "c.pdf"], encode, index_path, data_path, config, model_name="m", batch_size=32)
+    assert (stats.embedded, stats.removed) == (0, 0)
+    assert_index_matches_store(index_path, data_path, config)
+
+
+@pytest.mark.parametrize("kind", sorted(CONFIGS))
+def test_removed_ids_do_not_shift_the_others(kind):
+    config = CONFIGS[kind]
+    vectors = encode([f"row {i}" for i in range(200)])
+    builder = IncrementalIndex(config, train_size=200)
+    builder.add(vectors, np.arange(200))
+    builder.remove([3])
+    index = tune_index(builder.finish(), config)
+    _, found = index.search(vectors[[10, 50, 150]], 1)
+    assert found[:, 0].tolist() == [10, 50, 150]
+    assert index.ntotal == 199
+
+
+def test_unreadable_index_falls_back_to_a_full_rebuild(library, tmp_path):
+    index_path, data_path = str(tmp_path / "index.faiss"), str(tmp_path / "text.store")
+    library["a.pdf"] = [f"a page {i}" for i in range(20)]
+    ingest(["a.pdf"], encode, index_path, data_path, model_name="m")
+    with open(index_path, "wb") as f:
+        f.write(b"not an index")
+    stats = ingest(["a.pdf"], encode, index_path, data_path, model_name="m")
+    assert stats.embedded == 20
+    assert_index_matches_store(index_path, data_path, IndexConfig())
+
+
+def test_build_index_with_ids_returns_them():
+    vectors = encode([f"row {i}" for i in range(100)])
+    ids = np.arange(100) * 7
+    for config in CONFIGS.values():
+        _, found = tune_index(build_index(vectors, config, ids=ids), config).search(vectors[:5], 1)
+        assert found[:, 0].tolist() == ids[:5].tolist()
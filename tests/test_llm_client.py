@@ -0,0 +1,135 @@
+import time
+import asyncio
+
+import pytest
+
+import stub_inference
+from llm_client import AsyncLLMClient, LLMClient, LLMError, parse_stream_line, retry_delay
+
+
+@pytest.fixture
+def stub(request):
+    options = getattr(request, "param", {})
+    server = stub_inference.serve(port=0, **options)
+    server.url = f"http://127.0.0.1:{server.server_port}/models/stub"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def run(client, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def collect(client, prompt):
+    async def tokens():
+        return [token async for token in client.stream(prompt)]
+    return run(client, tokens())
+
+
+def test_retry_after_is_honored_up_to_the_cap():
+    assert retry_delay(0, 0.001, 8.0, retry_after=0.3) == 0.3
+    assert retry_delay(0, 0.001, 8.0, retry_after=60) == 8.0
+    assert retry_delay(5, 0.001, 8.0) <= 0.032
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 2, "retry_after": 0.3}], indirect=True)
+def test_async_generate_retries_503_after_retry_after(stub):
+    client = AsyncLLMClient(stub.url, parameters={"return_full_text": False}, backoff_base=0.001)
+
+    async def twice():
+        first = await client.generate("hello")
+        started = time.perf_counter()
+        second = await client.generate("hello")
+        return first, second, time.perf_counter() - started
+
+    first, second, elapsed = run(client, twice())
+    assert first == second == stub_inference.STUB_ANSWER
+    assert stub.RequestHandlerClass.requests_seen == 3
+    assert elapsed >= 0.3
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 2, "retry_after": 0.3}], indirect=True)
+def test_sync_generate_retries_503_after_retry_after(stub):
+    client = LLMClient(stub.url, parameters={"return_full_text": False}, backoff_base=0.001)
+    assert client.generate("hello") == stub_inference.STUB_ANSWER
+    started = time.perf_counter()
+    assert client.generate("hello") == stub_inference.STUB_ANSWER
+    assert time.perf_counter() - started >= 0.3
+    assert stub.RequestHandlerClass.requests_seen == 3
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 1}], indirect=True)
+def test_async_generate_gives_up_after_max_retries(stub):
+    client = AsyncLLMClient(stub.url, max_retries=2, backoff_base=0.001)
+    with pytest.raises(LLMError, match="503"):
+        run(client, client.generate("hello"))
+    assert stub.RequestHandlerClass.requests_seen == 3
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 1}], indirect=True)
+def test_sync_generate_gives_up_after_max_retries(stub):
+    client = LLMClient(stub.url, max_retries=2, backoff_base=0.001)
+    with pytest.raises(LLMError, match="503"):
+        client.generate("hello")
+    assert stub.RequestHandlerClass.requests_seen == 3
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 1}], indirect=True)
+def test_stream_gives_up_after_max_retries(stub):
+    client = AsyncLLMClient(stub.url, max_retries=1, backoff_base=0.001)
+    with pytest.raises(LLMError, match="503"):
+        collect(client, "hello")
+    assert stub.RequestHandlerClass.requests_seen == 2
+
+
+def test_stream_parses_server_sent_events(stub):
+    client = AsyncLLMClient(stub.url)
+    tokens = collect(client, "hello")
+    assert len(tokens) == len(stub_inference.STUB_ANSWER.split(" "))
+    assert "".join(tokens) == stub_inference.STUB_ANSWER
+
+
+@pytest.mark.parametrize("stub", [{"fail_every": 2, "retry_after": 0}], indirect=True)
+def test_stream_retries_before_the_first_token(stub):
+    client = AsyncLLMClient(stub.url, parameters={"return_full_text": False}, backoff_base=0.001)
+
+    async def generate_then_stream():
+        await client.generate("hello")
+        return [token async for token in client.stream("hello")]
+
+    assert "".join(run(client, generate_then_stream())) == stub_inference.STUB_ANSWER
+    assert stub.RequestHandlerClass.requests_seen == 3
+
+
+def test_parse_stream_line_skips_comments_special_tokens_and_done():
+    assert parse_stream_line('data: {"token": {"text": " pose", "special": false}}') == " pose"
+    assert parse_stream_line('data: {"token": {"text": "</s>", "special": true}}') is None
+    assert parse_stream_line("data: [DONE]") is None
+    assert parse_stream_line(": keep-alive") is None
+    assert parse_stream_line("") is None
+
+
+def test_async_client_reuses_one_connection(stub):
+    client = AsyncLLMClient(stub.url)
+
+    async def sequential():
+        return [await client.generate(f"question {i}") for i in range(5)]
+
+    answers = run(client, sequential())
+    assert len(answers) == 5
+    assert stub.RequestHandlerClass.requests_seen == 5
+    assert stub.RequestHandlerClass.connections_seen == 1
+
+
+def test_sync_client_reuses_one_connection(stub):
+    client = LLMClient(stub.url)
+    for i in range(5):
+        client.generate(f"question {i}")
+    assert stub.RequestHandlerClass.requests_seen == 5
+    assert stub.RequestHandlerClass.connections_seen == 1
@@ -0,0 +1,55 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from password_pool import PasswordWorkerPool, PoolBusy
+
+
+def test_jobs_run_and_release_their_slot():
+    pool = PasswordWorkerPool(workers=2, max_pending=2)
+
+    async def main():
+        return await asyncio.gather(pool.run(pow, 2, 10), pool.run(pow, 3, 2))
+
+    assert asyncio.run(main()) == [1024, 9]
+    assert pool.pending == 0
+
+
+def test_calls_beyond_max_pending_fail_fast():
+    pool = PasswordWorkerPool(workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def main():
+        jobs = [asyncio.ensure_future(pool.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolBusy):
+            await pool.run(release.wait, 5)
+        release.set()
+        await asyncio.gather(*jobs)
+
+    asyncio.run(main())
+    assert pool.pending == 0
+
+
+def test_a_cancelled_caller_keeps_its_slot_until_the_job_finishes():
+    pool = PasswordWorkerPool(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run(release.wait, 5), 0.05)
+        # The hash is still running, so the pool is still full
+        assert pool.pending == 1
+        with pytest.raises(PoolBusy):
+            await pool.run(time.sleep, 0)
+        release.set()
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.pending == 0
+        assert await pool.run(pow, 2, 3) == 8
+
+    asyncio.run(main())
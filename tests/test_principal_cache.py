@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, Column, String, Integer
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from principal_cache import PrincipalCache, cached_user_lookup
+
+
+@pytest.fixture
+def users():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base = declarative_base()
+
+    class UserModel(Base):
+        __tablename__ = "users"
+        id = Column(Integer, primary_key=True)
+        username = Column(String, unique=True, nullable=False)
+        hashed_password = Column(String, nullable=False)
+
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all([UserModel(username="asha", hashed_password="x"), UserModel(username="ravi", hashed_password="x")])
+        db.commit()
+    return UserModel, session_factory
+
+
+def test_repeated_lookups_hit_the_cache(users):
+    model, session_factory = users
+    cache = PrincipalCache()
+    user_exists = cached_user_lookup(cache, model, session_factory)
+    assert user_exists("asha")
+    assert user_exists("asha")
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_unknown_users_are_not_cached(users):
+    model, session_factory = users
+    cache = PrincipalCache()
+    user_exists = cached_user_lookup(cache, model, session_factory)
+    assert not user_exists("nobody")
+    assert not user_exists("nobody")
+    assert cache.stats() == {"hits": 0, "misses": 2, "size": 0}
+
+
+def test_entries_expire_after_ttl(users):
+    model, session_factory = users
+    cache = PrincipalCache(ttl=0.1)
+    user_exists = cached_user_lookup(cache, model, session_factory)
+    user_exists("asha")
+    assert cache.check("asha")
+    time.sleep(0.15)
+    assert not cache.check("asha")
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PrincipalCache(maxsize=2)
+    cache.add("a")
+    cache.add("b")
+    assert cache.check("a")
+    cache.add("c")
+    assert not cache.check("b")
+    assert cache.check("a") and cache.check("c")
+
+
+def test_deleting_a_user_invalidates_it(users):
+    model, session_factory = users
+    cache = PrincipalCache()
+    user_exists = cached_user_lookup(cache, model, session_factory)
+    assert user_exists("asha") and user_exists("ravi")
+    with session_factory() as db:
+        db.delete(db.query(model).filter(model.username == "asha").one())
+        db.commit()
+    assert not user_exists("asha")
+    assert cache.check("ravi")
+
+
+def test_renaming_a_user_clears_the_cache(users):
+    model, session_factory = users
+    cache = PrincipalCache()
+    user_exists = cached_user_lookup(cache, model, session_factory)
+    assert user_exists("asha") and user_exists("ravi")
+    with session_factory() as db:
+        db.query(model).filter(model.username == "asha").one().username = "asha2"
+        db.commit()
+    assert cache.stats()["size"] == 0
+    assert not user_exists("asha")
+    assert user_exists("asha2")
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+import pytest
+
+from query_batcher import QueryBatcher, batched_search
+
+
+def test_concurrent_queries_are_batched():
+    batches = []
+
+    def process(queries):
+        batches.append(list(queries))
+        return [query.upper() for query in queries]
+
+    batcher = QueryBatcher(process, max_batch=8, max_wait=0.2)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(batcher.submit, [f"q{i}" for i in range(8)]))
+    assert results == [f"Q{i}" for i in range(8)]
+    assert sum(len(batch) for batch in batches) == 8
+    assert len(batches) < 8
+    assert batcher.stats()["queries"] == 8
+
+
+def test_a_failing_batch_raises_in_every_caller():
+    def process(queries):
+        raise RuntimeError("index unavailable")
+
+    batcher = QueryBatcher(process, max_batch=4, max_wait=0.1)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.submit, f"q{i}") for i in range(4)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="index unavailable"):
+            future.result()
+
+
+def test_a_short_result_list_fails_the_whole_batch():
+    batcher = QueryBatcher(lambda queries: queries[:1], max_batch=4, max_wait=0.1)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.submit, f"q{i}") for i in range(4)]
+    for future in futures:
+        with pytest.raises(ValueError, match="expected"):
+            future.result(timeout=5)
+    # The worker keeps serving later batches
+    batcher.process = lambda queries: queries
+    assert batcher.submit("next") == "next"
+
+
+def test_submit_times_out_by_default():
+    release = threading.Event()
+
+    def process(queries):
+        release.wait(5)
+        return queries
+
+    batcher = QueryBatcher(process, timeout=0.1)
+    with pytest.raises(FutureTimeout):
+        batcher.submit("stuck")
+    release.set()
+
+
+def test_batched_search_returns_one_row_per_query():
+    import faiss
+
+    index = faiss.IndexFlatL2(2)
+    index.add(np.array([[0, 0], [1, 1], [5, 5]], dtype="float32"))
+    encode = lambda queries: np.array([[float(len(q)), float(len(q))] for q in queries])
+    results = batched_search(encode, index, k=1, context="snapshot")(["a", "", "abcde"])
+    assert [int(result.ids[0]) for result in results] == [1, 0, 2]
+    assert all(result.context == "snapshot" for result in results)
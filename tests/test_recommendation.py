@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from catalog import load_features
+from recommendation import AsanaRecommender, build_neighbor_graph, cosine_similarity_matrix
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+DISEASES = [
+    'Anxiety', 'Digestive Issues', 'Poor Posture', 'Insomnia',
+    'Asthma', 'Fatigue', 'Back Pain', 'Sciatica', 'Depression', 'Stress',
+    'Endocrine Problems (Diabetes/Infertility/Thyroid)', 'Respiratory Diseases',
+    'Muscular/Skeletal Problems', 'Urinary Issues', 'Nervous System (Brain Fever/Mental Disease)'
+]
+
+
+@pytest.fixture(scope="module", params=["dense", "sparse"])
+def recommender(request):
+    table, features = load_features(os.path.join(BACKEND, "yoga_asanas_and_diseases.csv"),
+                                    os.path.join(BACKEND, "asana_catalog"))
+    if request.param == "sparse":
+        similarity = build_neighbor_graph(features, top_k=64)
+    else:
+        similarity = cosine_similarity_matrix(features)
+    return AsanaRecommender(table, similarity, diseases=DISEASES)
+
+
+@pytest.mark.parametrize("disease", DISEASES)
+def test_every_suggestion_for_one_disease_lists_it(recommender, disease):
+    results = recommender.suggest_many([disease], limit=20)
+    assert results
+    assert all(item["Diseases"] == [disease] for item in results)
+
+
+@pytest.mark.parametrize("group", [DISEASES[i:i + 3] for i in range(0, len(DISEASES), 3)])
+def test_every_suggestion_lists_a_requested_disease(recommender, group):
+    for limit in (1, 5, 20):
+        results = recommender.suggest_many(group, limit=limit)
+        assert len(results) <= limit
+        assert all(item["Diseases"] and set(item["Diseases"]) <= set(group) for item in results)
+
+
+def test_contraindicated_asanas_are_left_out(recommender):
+    def knee(item):
+        return any("knee" in reason.lower() for reason in item["Reasons Not to Perform"])
+
+    assert any(knee(item) for item in recommender.suggest_many(["Back Pain"], limit=50))
+    assert not any(knee(item) for item in recommender.suggest_many(["Back Pain"], avoid=["Knee Injury"], limit=50))
+
+
+def test_unknown_diseases_suggest_nothing(recommender):
+    assert recommender.suggest_many(["Not A Condition At All Xyz"], limit=20) == []
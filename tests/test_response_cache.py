@@ -0,0 +1,85 @@
+import time
+import sqlite3
+
+import numpy as np
+import pytest
+
+from response_cache import SemanticResponseCache, context_key
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        db_path = str(tmp_path / "responses.db") if request.param == "sqlite" else None
+        return SemanticResponseCache(db_path=db_path, **kwargs)
+    return make
+
+
+def vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_near_queries_with_the_same_context_reuse_the_answer(make_cache):
+    cache = make_cache(max_distance=0.1)
+    key = context_key([4, 7], "fp")
+    cache.store(vector(1, 0, 0), key, "answer")
+    assert cache.lookup(vector(1, 0.2, 0), key) == "answer"  # squared distance 0.04
+    assert cache.lookup(vector(1, 0.4, 0), key) is None  # 0.16
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_the_closest_cached_query_wins(make_cache):
+    cache = make_cache(max_distance=1.0)
+    key = context_key([1])
+    cache.store(vector(0, 0), key, "far")
+    cache.store(vector(1, 0), key, "near")
+    assert cache.lookup(vector(0.9, 0), key) == "near"
+
+
+def test_a_different_context_misses(make_cache):
+    cache = make_cache()
+    cache.store(vector(1, 0), context_key([4, 7], "fp"), "answer")
+    assert cache.lookup(vector(1, 0), context_key([4, 8], "fp")) is None
+    assert cache.lookup(vector(1, 0), context_key([4, 7], "other index")) is None
+
+
+def test_entries_expire_after_ttl(make_cache):
+    cache = make_cache(ttl=0.1)
+    key = context_key([1])
+    cache.store(vector(1, 0), key, "answer")
+    assert cache.lookup(vector(1, 0), key) == "answer"
+    time.sleep(0.15)
+    assert cache.lookup(vector(1, 0), key) is None
+
+
+def test_least_recently_used_entries_are_evicted(make_cache):
+    cache = make_cache(max_entries=2)
+    cache.store(vector(1, 0), context_key([1]), "one")
+    time.sleep(0.01)
+    cache.store(vector(1, 0), context_key([2]), "two")
+    time.sleep(0.01)
+    assert cache.lookup(vector(1, 0), context_key([1])) == "one"
+    time.sleep(0.01)
+    cache.store(vector(1, 0), context_key([3]), "three")
+    assert cache.stats()["size"] == 2
+    assert cache.lookup(vector(1, 0), context_key([2])) is None
+    assert cache.lookup(vector(1, 0), context_key([1])) == "one"
+
+
+def test_disabled_cache_stores_nothing(make_cache):
+    cache = make_cache(max_entries=0)
+    cache.store(vector(1, 0), context_key([1]), "answer")
+    assert cache.lookup(vector(1, 0), context_key([1])) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_sqlite_cache_is_shared_and_drops_expired_rows(tmp_path):
+    path = str(tmp_path / "responses.db")
+    writer = SemanticResponseCache(ttl=0.1, db_path=path)
+    reader = SemanticResponseCache(ttl=0.1, db_path=path)
+    writer.store(vector(1, 0), context_key([1]), "old")
+    assert reader.lookup(vector(1, 0), context_key([1])) == "old"
+    time.sleep(0.15)
+    writer.store(vector(0, 1), context_key([2]), "new")
+    with sqlite3.connect(path) as conn:
+        assert [row[0] for row in conn.execute("SELECT answer FROM responses")] == ["new"]